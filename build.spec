@@ -70,7 +70,6 @@ excludes = [
     'sphinx',
     'bz2',
     'lzma',
-    'sqlite3',
     'tkinter',
     'tkinter.test',
     'tkinter.ttk.test',
@@ -1,11 +1,18 @@
 """配置管理模块"""
 import os
-from typing import Dict, Any, Optional
+import time
+from typing import Dict, Any, List, Optional, Set
 import yaml
-import json
 from sys import platform
-from path_utils import get_resource_path, ensure_path_exists, get_background_list
-from image_processor import update_dll_gui_settings, update_style_config, clear_cache
+from path_utils import get_base_path, get_resource_path, ensure_path_exists, get_background_list, get_asset_catalog
+from image_processor import update_dll_gui_settings, update_style_config, clear_cache, invalidate_asset
+from utils.config_snapshot import ConfigSnapshot
+from utils.settings_store import SettingsStore
+from utils.style_model import StyleModel
+from utils import startup_profiler
+
+# YAML 解析结果快照，源文件没变时启动跳过解析
+CONFIG_SNAPSHOT = ConfigSnapshot(os.path.join(get_base_path(), "config", ".config_snapshot.pickle"))
 
 class StyleConfig:
     """样式配置类"""
@@ -23,8 +30,7 @@ class StyleConfig:
         try:
             filepath = get_resource_path(os.path.join("config", "defaultstyle.yml"))
             if filepath:
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    return yaml.safe_load(f) or {}
+                return CONFIG_SNAPSHOT.load(filepath)
             else:
                 print(f"警告：默认样式文件不存在: {filepath}")
                 return None
@@ -36,6 +42,7 @@ class ConfigLoader:
     """配置加载器"""
     
     def __init__(self):
+        st = time.perf_counter()
         self.AUTO_PASTE_IMAGE = True
         self.AUTO_SEND_IMAGE = True
         self.ASSETS_PATH = get_resource_path("assets")
@@ -58,6 +65,11 @@ class ConfigLoader:
         
         # 样式配置
         self.style_configs = {}
+        # 样式数据版本号，style_configs 变化后递增，StyleModel 按版本缓存
+        self.style_version = 0
+        self._style_models: Dict[str, StyleModel] = {}
+        # 上次应用时的 (样式名, 版本号)，未变化时不需要重建静态图层
+        self._applied_style = None
         self.current_style = "default"
         self.style = StyleConfig()
 
@@ -70,7 +82,17 @@ class ConfigLoader:
         self.mahoshojo = self._load_config("chara_meta")
         self.keymap = self._load_config("keymap")
         self.process_whitelist = self._load_config("process_whitelist")
+        self.output_encoders = (self._load_yaml_file("process_whitelist.yml") or {}).get("encoders") or {}
         self.gui_settings = self._load_config("settings")
+        self.settings_store = SettingsStore(
+            os.path.join(get_base_path(), "config", "settings.yml"),
+            self.gui_settings, self._persisted_settings,
+            on_saved=CONFIG_SNAPSHOT.forget,
+        )
+        # 只把变化的键推送给DLL
+        self.settings_store.subscribe(update_dll_gui_settings)
+        if not self._persisted_settings:
+            self.save_gui_settings()
 
         # 确保enabled只有在display为True时才可能为True
         sm = self.gui_settings["sentiment_matching"]
@@ -84,25 +106,42 @@ class ConfigLoader:
         # 加载样式配置
         self._load_style_configs()
         
-        # 加载psd信息
+        # psd信息：启动时只记录PSD角色的文件，首次用到时再解析
         self.psd_meta = {}
+        self._psd_files = {}
         self.psd_surface_cache = {}
         self._load_psd_if_needed()
 
+        CONFIG_SNAPSHOT.save()
+        print(f"配置加载用时: {(time.perf_counter() - st) * 1000:.0f}ms，{CONFIG_SNAPSHOT.report()}")
+
     def _load_psd_if_needed(self):
-        """遍历角色，遇到 emotion_count==0 就去读同名 psd"""
-        from utils.psd_utils import inspect_psd
-        for chara_id, meta in self.mahoshojo.items():
-            if meta.get("emotion_count", 0) == 0:          # PSD 模式
-                psd_file = os.path.join(self.ASSETS_PATH, "chara", chara_id, f"{chara_id}.psd")
-                if os.path.isfile(psd_file):
-                    self.psd_meta[chara_id] = inspect_psd(psd_file)
-                else:
-                    print(f"[WARN] PSD文件不存在: {psd_file}")
+        """遍历角色，遇到 emotion_count==0 就记录同名 psd（解析推迟到 get_psd_info）"""
+        for chara_id in self.mahoshojo:
+            self._find_psd_file(chara_id)
+
+    def _find_psd_file(self, chara_id):
+        """PSD 模式的角色记录其 PSD 文件路径"""
+        self._psd_files.pop(chara_id, None)
+        meta = self.mahoshojo.get(chara_id)
+        if meta is None or meta.get("emotion_count", 0) != 0:
+            return
+        psd_file = os.path.join(self.ASSETS_PATH, "chara", chara_id, f"{chara_id}.psd")
+        if os.path.isfile(psd_file):
+            self._psd_files[chara_id] = psd_file
+        else:
+            print(f"[WARN] PSD文件不存在: {psd_file}")
 
     def get_psd_info(self, chara_id):
-        """外部统一入口：返回该角色的 PSD 解析 dict，没有就返回 None"""
-        return self.psd_meta.get(chara_id)
+        """外部统一入口：返回该角色的 PSD 解析 dict，没有就返回 None（首次调用时解析）"""
+        psd_info = self.psd_meta.get(chara_id)
+        if psd_info is None and chara_id in self._psd_files:
+            from utils.psd_utils import inspect_psd
+            try:
+                psd_info = self.psd_meta[chara_id] = inspect_psd(self._psd_files[chara_id])
+            except Exception as e:
+                print(f"[WARN] PSD文件解析失败: {self._psd_files.pop(chara_id)}: {e}")
+        return psd_info
 
     def _get_current_character_from_layers(self):
         """从角色图层组件获取当前角色（第一个非固定角色的图层）"""
@@ -122,14 +161,23 @@ class ConfigLoader:
         # 如果没有找到角色组件，返回默认角色
         return self.character_list[1] if len(self.character_list) > 1 else self.character_list[0]
 
+    def mark_style_changed(self):
+        """style_configs 被修改后调用，使缓存的 StyleModel 失效"""
+        self.style_version += 1
+        self._style_models.clear()
+
+    def get_style_model(self, style_name: str | None = None) -> StyleModel:
+        """获取样式的不可变快照，同一版本内复用"""
+        style_name = style_name or self.current_style
+        model = self._style_models.get(style_name)
+        if model is None or model.version != self.style_version:
+            model = StyleModel(style_name, self.style_configs.get(style_name, {}), self.style_version)
+            self._style_models[style_name] = model
+        return model
+
     def get_sorted_preview_components(self):
-        """获取排序后的图片组件列表（按图层顺序）"""
-        import copy
-        style = copy.deepcopy(self.style_configs[self.current_style])
-        if style and 'image_components' in style:
-            components = style["image_components"]
-            return sorted(components, key=lambda x: x.get("layer", 0))
-        return []
+        """获取排序后的图片组件视图列表（按图层顺序），写入只影响本次渲染"""
+        return self.get_style_model().preview_components()
     
     def apply_style(self, style_name: str):
         """应用指定的样式配置"""
@@ -138,7 +186,10 @@ class ConfigLoader:
 
             self.current_style = style_name
 
-            clear_cache()
+            # 切换样式或样式数据变化时组件不同，静态图层需要重建；只改颜色等字段不清理
+            if self._applied_style != (style_name, self.style_version):
+                self._applied_style = (style_name, self.style_version)
+                clear_cache("layers")
 
             # 更新样式对象
             for key, value in style_data.items():
@@ -164,6 +215,7 @@ class ConfigLoader:
                 style_data["image_components"] = self.style_configs[style_name].get("image_components", [])
             
             self.style_configs[style_name] = style_data
+            self.mark_style_changed()
             
             # 如果更新的是当前样式，立即应用
             if self.current_style == style_name:
@@ -182,6 +234,7 @@ class ConfigLoader:
             self._save_yaml_file("styles.yml", styles_data)
         
         self.style_configs = styles_data
+        self.mark_style_changed()
         self.current_style = self.gui_settings.get("last_style","default")
         
         # 应用当前样式
@@ -235,14 +288,12 @@ class ConfigLoader:
         elif config_type == "settings":
             # 处理settings配置，确保所有字段都存在
             default_settings = self._get_default_setting("settings")
+            # 文件中的内容作为脏检查基准，文件缺少的键首次保存时写入
+            self._persisted_settings = config or {}
             if config:
                 # 递归合并默认值和文件配置
                 default_settings |= config
-                config = default_settings
-            else:
-                config = default_settings
-                self.gui_settings = config
-                self.save_gui_settings()
+            config = default_settings
         
         return config
     
@@ -259,6 +310,21 @@ class ConfigLoader:
                     "pixel_reduction_enabled": True,
                     "pixel_reduction_ratio": 40
                 },
+                "psd_warmup": {
+                    "enabled": True,
+                    "memory_budget_mb": 256,
+                    "time_budget_s": 30
+                },
+                "sentiment_cache": {
+                    "enabled": True,
+                    "ttl_days": 30,
+                    "memory_entries": 512,
+                    "disk_entries": 20000
+                },
+                "startup_warmup": {
+                    "enabled": True,
+                    "emoji_count": 16
+                },
                 "quick_characters": {
                     "character_1": "ema",
                     "character_2": "hiro", 
@@ -336,8 +402,7 @@ class ConfigLoader:
             return None
         
         try:
-            with open(filepath, 'r', encoding="utf-8") as fp:
-                return yaml.safe_load(fp) or {}
+            return CONFIG_SNAPSHOT.load(filepath)
         except Exception as e:
             print(f"加载配置文件 {filename} 失败: {e}")
             return None
@@ -349,11 +414,52 @@ class ConfigLoader:
             
             with open(filepath, 'w', encoding='utf-8') as f:
                 yaml.dump(data, f, allow_unicode=True, default_flow_style=False)
+            CONFIG_SNAPSHOT.forget(filepath)
+            return True
+        except Exception as e:
+            print(f"保存配置文件 {filename} 失败: {e}")
+            return False
+
+    def _save_yaml_key(self, filename: str, key: str, value: Any) -> bool:
+        """只替换文件中一个顶层键的内容，其余部分（包括注释）原样保留"""
+        try:
+            filepath = ensure_path_exists(get_resource_path(os.path.join("config", filename)))
+            try:
+                with open(filepath, 'r', encoding='utf-8') as f:
+                    lines = f.read().splitlines(keepends=True)
+            except FileNotFoundError:
+                lines = []
+
+            block = yaml.dump({key: value}, allow_unicode=True, default_flow_style=False)
+            start = next((i for i, line in enumerate(lines) if line.startswith(f"{key}:")), None)
+            if start is None:
+                if lines and not lines[-1].endswith("\n"):
+                    lines[-1] += "\n"
+                lines.append(block)
+            else:
+                # 顶层键的内容是其后缩进的行和顶格的列表项
+                end = start + 1
+                while end < len(lines) and lines[end].startswith((" ", "\t", "- ")):
+                    end += 1
+                lines[start:end] = [block]
+
+            with open(filepath, 'w', encoding='utf-8') as f:
+                f.writelines(lines)
+            CONFIG_SNAPSHOT.forget(filepath)
             return True
         except Exception as e:
             print(f"保存配置文件 {filename} 失败: {e}")
             return False
 
+    def get_output_encoder(self, process_name: str | None = None) -> Dict[str, Any]:
+        """按前台进程获取输出编码设置，进程没有单独配置时使用 default"""
+        encoder = dict(self.output_encoders.get("default") or {})
+        if process_name:
+            for name, options in self.output_encoders.items():
+                if name.lower() == process_name.lower() and options:
+                    encoder |= options
+        return encoder
+
     def get_character(self, index: str | None = None, full_name: bool = False) -> str:
         """获取角色名称"""
         if index is not None:
@@ -425,28 +531,112 @@ class ConfigLoader:
         if sorted(processes) == sorted(current_processes):
             return False
         
-        # 更新当前平台的白名单
-        existing_data[self.platform] = processes
+        # 只改写当前平台的列表，保留文件中 encoders 等部分的说明注释
         CONFIGS.process_whitelist = processes
-
-        # 保存回文件
-        return self._save_yaml_file("process_whitelist.yml", existing_data)
+        return self._save_yaml_key("process_whitelist.yml", self.platform, processes)
         
     def save_gui_settings(self):
-        """保存GUI设置到settings.yml"""
-        # 加载现有配置
-        existing_data = self._load_yaml_file("settings.yml") or {}
-        
-        # 没有变化就返回个False
-        if json.dumps(existing_data, sort_keys=True) == json.dumps(self.gui_settings, sort_keys=True):
-            return False
-        
-        # 新设置到现有数据中
-        existing_data |= self.gui_settings
-        
-        update_dll_gui_settings(self.gui_settings)
-        # 保存回文件
-        return self._save_yaml_file("settings.yml", existing_data)
+        """提交GUI设置：变化的键推送给DLL，防抖后在后台写入settings.yml；没有变化返回False"""
+        return bool(self.settings_store.commit())
+
+    def watch_roots(self) -> List[str]:
+        """热重载监视的目录：配置目录和素材目录"""
+        return [path for path in (os.path.join(get_base_path(), "config"), self.ASSETS_PATH) if path]
+
+    def poll_roots(self) -> List[str]:
+        """
+        退回定时扫描时监视的目录：配置目录和会进入缓存的素材分类目录
+        emoji 目录有数千个文件且很少改动，扫描模式下不监视
+        """
+        roots = [os.path.join(get_base_path(), "config")]
+        if self.ASSETS_PATH:
+            roots += [os.path.join(self.ASSETS_PATH, name) for name in ("background", "chara", "shader", "fonts")]
+        return roots
+
+    def reload_changed_files(self, paths) -> Set[str]:
+        """
+        按变化的文件重新加载配置并精确清理依赖它的缓存
+        返回受影响的部分：characters / styles / whitelist / backgrounds / psd / assets
+        """
+        config_dir = os.path.normcase(os.path.join(get_base_path(), "config"))
+        assets_dir = os.path.normcase(self.ASSETS_PATH) if self.ASSETS_PATH else None
+        affected = set()
+
+        for path in sorted(paths):
+            normalized = os.path.normcase(os.path.abspath(path))
+            if os.path.dirname(normalized) == config_dir:
+                affected |= self._reload_config_file(os.path.basename(normalized))
+            elif assets_dir and normalized.startswith(assets_dir + os.sep):
+                # 相对路径保留原始大小写，DLL的路径缓存区分大小写
+                affected |= self._reload_asset(os.path.relpath(os.path.abspath(path), self.ASSETS_PATH))
+
+        if affected:
+            print(f"热重载: {', '.join(sorted(affected))}")
+            if affected - {"characters", "styles", "whitelist"}:
+                # 变化的素材在后台补全哈希和尺寸
+                get_asset_catalog().scan_async()
+        return affected
+
+    def _reload_config_file(self, filename: str) -> Set[str]:
+        """配置文件变化；内容与内存中一致（如程序自己保存的）时不做任何事"""
+        if filename == "chara_meta.yml":
+            mahoshojo = self._load_config("chara_meta")
+            if not mahoshojo or mahoshojo == self.mahoshojo:
+                return set()
+            changed = {chara_id for chara_id in mahoshojo.keys() | self.mahoshojo.keys()
+                       if mahoshojo.get(chara_id) != self.mahoshojo.get(chara_id)}
+            self.mahoshojo = mahoshojo
+            self.character_list = list(mahoshojo.keys())
+            for chara_id in changed:
+                self._reload_psd_meta(chara_id)
+            clear_cache("layers")
+            self.update_bracket_color_from_character()
+            return {"characters"}
+
+        if filename == "styles.yml":
+            styles_data = self._load_yaml_file("styles.yml")
+            if not styles_data or styles_data == self.style_configs:
+                return set()
+            self.style_configs = styles_data
+            self.mark_style_changed()
+            self.apply_style(self.current_style if self.current_style in styles_data else next(iter(styles_data)))
+            return {"styles"}
+
+        if filename == "process_whitelist.yml":
+            process_whitelist = self._load_config("process_whitelist")
+            output_encoders = (self._load_yaml_file("process_whitelist.yml") or {}).get("encoders") or {}
+            if process_whitelist == self.process_whitelist and output_encoders == self.output_encoders:
+                return set()
+            self.process_whitelist = process_whitelist
+            self.output_encoders = output_encoders
+            return {"whitelist"}
+
+        # settings.yml 由程序自己写入；keymap.yml 需要重新注册热键，仍需重启
+        return set()
+
+    def _reload_asset(self, relative_path: str) -> Set[str]:
+        """素材文件变化：只清理依赖这个文件的缓存"""
+        get_asset_catalog().refresh([relative_path])
+        parts = relative_path.replace("\\", "/").split("/")
+        if parts[0] == "chara" and len(parts) == 3 and parts[2].lower() == f"{parts[1]}.psd".lower():
+            from utils.psd_utils import invalidate_psd
+            chara_id = parts[1]
+            invalidate_psd(os.path.join(self.ASSETS_PATH, "chara", chara_id, f"{chara_id}.psd"))
+            self._reload_psd_meta(chara_id)
+            self.psd_surface_cache.clear()
+            invalidate_asset(relative_path)
+            return {"psd"}
+
+        invalidate_asset(relative_path)
+        if parts[0] == "background":
+            self.background_list = get_background_list()
+            return {"backgrounds"}
+        return {"assets"}
+
+    def _reload_psd_meta(self, chara_id: str):
+        """丢弃角色的 PSD 信息，下次 get_psd_info 时重新解析"""
+        self.psd_meta.pop(chara_id, None)
+        self._find_psd_file(chara_id)
 
     def get_program_info(self) -> Dict[str, Any]:
         """获取程序信息"""
@@ -462,4 +652,5 @@ class ConfigLoader:
         """获取版本历史"""
         return self.version_info.get("history", [])
 
-CONFIGS = ConfigLoader()
\ No newline at end of file
+with startup_profiler.phase("加载配置"):
+    CONFIGS = ConfigLoader()
\ No newline at end of file
@@ -1,28 +1,24 @@
 """魔裁文本框核心逻辑"""
 from config import CONFIGS
 from utils.clipboard_utils import ClipboardManager
+from utils.file_watcher import FileWatcher
+from utils.foreground import ForegroundAppResolver
+from utils.render_gate import foreground_render
 from utils.sentiment_analyzer import SentimentAnalyzer
+from utils.warmup import STARTUP_WARMUP, WarmupStep
 from image_processor import get_enhanced_loader, generate_image_with_dll, set_dll_global_config, clear_cache, update_dll_gui_settings, draw_content_auto
 
 import time
 import re
 import random
-import psutil
 import threading
+from functools import partial
 from pynput.keyboard import Key, Controller
 from sys import platform
 from PIL import Image
 from typing import Dict, Any
 from PySide6.QtCore import QObject, Signal
 
-if platform.startswith("win"):
-    try:
-        import win32gui
-        import win32process
-    except ImportError:
-        print("[red]请先安装 Windows 运行库: pip install pywin32[/red]")
-        raise
-
 def _calculate_canvas_size():
     """根据样式配置计算画布大小"""
     ratio = CONFIGS.style.aspect_ratio
@@ -43,12 +39,16 @@ class ManosabaCore(QObject):  # 继承 QObject 以支持信号
     # 定义信号
     status_updated = Signal(str)  # 状态更新信号
     gui_notification = Signal(bool, bool, str)  # GUI通知信号(情感分析器状态)
+    files_changed = Signal(object)  # 配置/素材文件变化信号(监视线程发出，主线程处理)
 
     def __init__(self):
         super().__init__()  # 初始化 QObject
         # 初始化配置
         self.kbd_controller = Controller()
         self.clipboard_manager = ClipboardManager()
+        # 前台应用解析（白名单校验、按应用选择输出编码）
+        self.foreground = ForegroundAppResolver(whitelist=lambda: CONFIGS.process_whitelist)
+        self.foreground.start()
 
         # 情感分析器 - 简单状态管理
         self.sentiment_analyzer = SentimentAnalyzer()
@@ -60,11 +60,31 @@ class ManosabaCore(QObject):  # 继承 QObject 以支持信号
         # 初始化DLL加载器
         set_dll_global_config(CONFIGS.ASSETS_PATH, min_image_ratio=0.2)
         update_dll_gui_settings(CONFIGS.gui_settings)
+        # 图层解码缓存上限只在设置变化时调整；首次合成PSD前再设置，避免启动时加载 psd_tools
+        self._raster_budget_applied = False
+        CONFIGS.settings_store.subscribe(self._on_psd_warmup_settings_changed)
+
+        # 配置和素材热重载：监视线程只发信号，重新加载在主线程进行
+        self.files_changed.connect(self._on_files_changed)
+        self.file_watcher = FileWatcher(CONFIGS.watch_roots(), self.files_changed.emit,
+                                        poll_roots=CONFIGS.poll_roots())
+        self.file_watcher.start()
 
     def update_status(self, message: str):
         """更新状态 - 使用信号"""
         self.status_updated.emit(message)
 
+    def _on_files_changed(self, paths):
+        """文件变化后重新加载受影响的配置，并刷新界面"""
+        affected = CONFIGS.reload_changed_files(paths)
+        if not affected:
+            return
+        self.update_status(f"已重新加载: {', '.join(sorted(affected))}")
+        if hasattr(self, 'gui'):
+            if "styles" in affected:
+                self.gui._init_style_combo()
+            self.gui.update_preview()
+
     def _notify_gui(self, enabled, available, error_message=""):
         """通知GUI情感分析器状态变化 - 使用信号"""
         self.gui_notification.emit(enabled, available, error_message)
@@ -206,65 +226,123 @@ class ManosabaCore(QObject):  # 继承 QObject 以支持信号
             self.update_status(f"情感分析失败: {str(e)}")
             return False
 
-    def _active_process_allowed(self) -> bool:
-        """校验当前前台进程是否在白名单"""
-        if not CONFIGS.process_whitelist:
-            return True
-        
-        wl = {name.lower() for name in CONFIGS.process_whitelist}
-
-        if platform.startswith("win"):
-            try:
-                hwnd = win32gui.GetForegroundWindow()
-                if not hwnd:
-                    return False
-                _, pid = win32process.GetWindowThreadProcessId(hwnd)
-                name = psutil.Process(pid).name().lower()
-                return name in wl
-            except (psutil.Error, OSError):
-                return False
-
-        elif platform == "darwin":
-            try:
-                import subprocess
-
-                result = subprocess.run(
-                    [
-                        "osascript",
-                        "-e",
-                        'tell application "System Events" to get name of first process whose frontmost is true',
-                    ],
-                    capture_output=True,
-                    text=True,
-                    check=True,
-                )
-                name = result.stdout.strip().lower()
-                return name in wl
-            except subprocess.SubprocessError:
-                return False
-
-        else:
-            # Linux 支持
-            return True
-
-    def compose_psd_chara(self, chara, pose, cloth, action, expr) -> int:
+    def compose_psd_chara(self, chara, pose, cloth, action, expr):
         """
-        合成PSD角色图片并返回缓存索引
+        合成PSD角色图片，返回 PSDComposite（缓存索引和裁剪区域），失败返回 None
         """
         st = time.time()
         import os 
         from utils.psd_utils import compose_image
         psd_path = os.path.join(CONFIGS.ASSETS_PATH, "chara", chara, f"{chara}.psd")
         
+        if not self._raster_budget_applied:
+            self._apply_raster_cache_budget()
         try:
-            psd_index = compose_image(psd_path, pose, cloth, action, expr)
+            composite = compose_image(psd_path, pose, cloth, action, expr)
             print(f"PSD图片合成用时: {int((time.time() - st)*1000)}")
-            return psd_index
+            self._schedule_psd_warmup(psd_path, pose, cloth, action)
+            return composite
         except Exception as e:
             print(f"PSD合成失败: {str(e)}")
-            return -1
+            return None
+
+    def _apply_raster_cache_budget(self):
+        """按设置调整图层解码缓存的内存上限"""
+        from utils.psd_utils import set_raster_cache_budget
+        warmup_cfg = CONFIGS.gui_settings.get("psd_warmup", {})
+        set_raster_cache_budget(int(warmup_cfg.get("memory_budget_mb", 256)) * 1024 * 1024)
+        self._raster_budget_applied = True
+
+    def _on_psd_warmup_settings_changed(self, changed):
+        if "psd_warmup" in changed and self._raster_budget_applied:
+            self._apply_raster_cache_budget()
+
+    def _schedule_psd_warmup(self, psd_path, pose, cloth, action):
+        """空闲时在后台预解码当前角色所有表情的图层"""
+        warmup_cfg = CONFIGS.gui_settings.get("psd_warmup", {})
+        if not warmup_cfg.get("enabled", True):
+            return
+        from utils.psd_utils import PSD_WARMUP
+        PSD_WARMUP.start(psd_path, pose, cloth, action,
+                         time_budget=float(warmup_cfg.get("time_budget_s", 30)),
+                         on_progress=self._on_psd_warmup_progress)
+
+    def _on_psd_warmup_progress(self, done, total, reason):
+        """预热进度显示在状态栏"""
+        if reason:
+            self.update_status(f"PSD表情预热{reason}: {done}/{total}")
+        else:
+            self.update_status(f"PSD表情预热中: {done}/{total}")
+
+    def start_startup_warmup(self):
+        """窗口显示后在后台预热首次渲染要用的字体、组件图片和常用emoji"""
+        warmup_cfg = CONFIGS.gui_settings.get("startup_warmup", {})
+        loader = get_enhanced_loader()
+        if not warmup_cfg.get("enabled", True) or not loader.warmup_supported:
+            return
+        from path_utils import get_emoji_usage
+
+        style = CONFIGS.style
+        steps = [
+            WarmupStep("渲染器", loader.warmup_renderer),
+            WarmupStep(f"字体 {style.font_family}", partial(loader.preload_font, style.font_family, style.font_size)),
+        ]
+        for component in self._warmup_components():
+            steps.append(WarmupStep(f"组件 {component.get('type')}", partial(loader.preload_component, component)))
+        for emoji in get_emoji_usage().most_common(int(warmup_cfg.get("emoji_count", 16))):
+            steps.append(WarmupStep(f"emoji {emoji}", partial(loader.preload_emoji, emoji)))
+        STARTUP_WARMUP.start(steps, on_progress=self._on_startup_warmup_progress)
+
+    def _warmup_components(self) -> list:
+        """当前样式预览会绘制的组件，按界面当前的选择填好参数（需在主线程调用）"""
+        current_character_name = CONFIGS._get_current_character_from_layers()
+        character_tab_widgets = {}
+        background_tab_widgets = {}
+        if hasattr(self, 'gui'):
+            character_tab_widgets = self.gui.get_character_tab_widgets()
+            background_tab_widgets = self.gui.get_background_tab_widgets()
+
+        components = []
+        for component in CONFIGS.get_sorted_preview_components():
+            if not component.get("enabled", True):
+                continue
+            comp_type = component.get("type")
+            if comp_type == "namebox":
+                if current_character_name in CONFIGS.mahoshojo:
+                    component["textcfg"] = CONFIGS.mahoshojo[current_character_name]["text"]
+                    component["font_name"] = CONFIGS.mahoshojo[current_character_name]["font"]
+            elif comp_type == "character":
+                # PSD角色切换姿态时另有预热
+                if CONFIGS.get_psd_info(component.get("character_name", "")):
+                    continue
+                widget = character_tab_widgets.get(component.get("layer", 1))
+                ui_values = (widget.get_current_values() if widget else None) or {}
+                emotion_index = ui_values.get("emotion_index", 1)
+                component["emotion_index"] = emotion_index if isinstance(emotion_index, int) else 1
+            elif comp_type == "background":
+                # 随机背景无法预知
+                widget = background_tab_widgets.get(component.get("layer", 0))
+                overlay = widget.get_overlay_value() if widget else ""
+                if not (widget and widget.is_fixed_background() and overlay):
+                    continue
+                component["overlay"] = overlay
+            components.append(component)
+        return components
+
+    def _on_startup_warmup_progress(self, done, total, reason):
+        """预热进度显示在状态栏"""
+        if reason:
+            self.update_status(f"启动预热{reason}: {done}/{total}")
+        else:
+            self.update_status(f"启动预热中: {done}/{total}")
 
     def generate_preview(self) -> tuple:
+        """生成预览图片和相关信息"""
+        # 预览期间后台预热让出CPU
+        with foreground_render():
+            return self._generate_preview()
+
+    def _generate_preview(self) -> tuple:
         """生成预览图片和相关信息"""
         st = time.time()
         use_cache = get_enhanced_loader().layer_cache
@@ -349,13 +427,15 @@ class ManosabaCore(QObject):  # 继承 QObject 以支持信号
                             match = re.search(r'(\d+)', random_selected_emotion)
                             emotion_index = int(match.group(1)) if match else 1
                     
+                    psd_composite = None
                     if psd_info:
                         pose = ui_values.get("pose", "")
                         clothing = ui_values.get("clothing")
                         action = ui_values.get("action")
                         
                         # 直接合成PSD并获取索引
-                        psd_index = self.compose_psd_chara(character_name, pose, clothing, action, emotion_index)
+                        psd_composite = self.compose_psd_chara(character_name, pose, clothing, action, emotion_index)
+                        psd_index = psd_composite.index if psd_composite else -1
                         
                         # 将索引存入组件，而不是图片数据
                         component["psd_index"] = psd_index
@@ -379,6 +459,14 @@ class ManosabaCore(QObject):  # 继承 QObject 以支持信号
                     
                     component["offset_x1"] = emotion_offsets_X.get(str(emotion_index), 0) + offset[0]
                     component["offset_y1"] = emotion_offsets_Y.get(str(emotion_index), 0) + offset[1]
+
+                    # PSD只合成了可见区域，按对齐方式补偿裁掉的边距
+                    if psd_composite:
+                        dx, dy = psd_composite.position_offset(
+                            component.get("align", "top-left"),
+                            float(component.get("scale", 1.0)) * component["scale1"])
+                        component["offset_x1"] += dx
+                        component["offset_y1"] += dy
                 
                 elif comp_type == "background":
                     # 完全从UI获取值
@@ -431,7 +519,8 @@ class ManosabaCore(QObject):  # 继承 QObject 以支持信号
 
     def generate_image(self) -> str:
         """生成并发送图片"""
-        if not self._active_process_allowed():
+        process_name = self.foreground.current_name()
+        if not self.foreground.is_allowed(process_name):
             return "前台应用不在白名单内"
 
         self.base_msg=""
@@ -440,10 +529,10 @@ class ManosabaCore(QObject):  # 继承 QObject 以支持信号
         start_time = time.time()
         print(f"[{int((time.time()-start_time)*1000)}] 开始生成图片")
 
-        # 清空剪贴板
+        # 清空剪贴板，之后以剪贴板序列号变化判断剪切完成
         self.clipboard_manager.clear_clipboard()
-
-        time.sleep(0.005)
+        watcher = self.clipboard_manager.watcher
+        clip_seq = watcher.sequence()
 
         # 获取剪切模式设置
         cut_settings = CONFIGS.gui_settings.get("cut_settings", {})
@@ -500,13 +589,23 @@ class ManosabaCore(QObject):  # 继承 QObject 以支持信号
                     self.kbd_controller.release(Key.cmd)
 
         print(f"[{int((time.time()-start_time)*1000)}] 开始读取剪切板")
-        deadline = time.time() + 2.5
-        while time.time() < deadline:
+        # 序列号变化后才读取内容；读到空内容（清空的延迟通知、剪贴板被占用）时
+        # 继续等下一次变化，并每20ms重试一次读取
+        text, image = "", None
+        changed = False
+        deadline = time.monotonic() + 2.5
+        while (remaining := deadline - time.monotonic()) > 0:
+            if watcher.wait_for_change(clip_seq, min(remaining, 0.02) if changed else remaining):
+                clip_seq = watcher.sequence()
+                changed = True
+            elif not changed:
+                # 没等到变化（如检测器失效）也读一次再放弃
+                text, image = self.clipboard_manager.get_clipboard_all()
+                break
             text, image = self.clipboard_manager.get_clipboard_all()
             if (text and text.strip()) or image is not None:
                 print(f"[{int((time.time()-start_time)*1000)}] 剪切板内容获取完成")
                 break
-            time.sleep(0.005)
         
         # 情感匹配处理
         sentiment_settings = CONFIGS.gui_settings.get("sentiment_matching", {})
@@ -514,6 +613,9 @@ class ManosabaCore(QObject):  # 继承 QObject 以支持信号
         if (sentiment_settings.get("enabled", False) and self.sentiment_enabled and text.strip()):
             
             emotion_updated = self._update_emotion_by_sentiment(text)
+            stats = self.sentiment_analyzer.cache.stats()
+            print(f"情感分析缓存: 内存命中 {stats['memory_hits']}, 磁盘命中 {stats['disk_hits']}, "
+                  f"未命中 {stats['misses']}, 命中率 {stats['hit_rate']:.0%}")
             
             if emotion_updated:
                 print(f"[{int((time.time()-start_time)*1000)}] 情感分析完成")
@@ -528,7 +630,11 @@ class ManosabaCore(QObject):  # 继承 QObject 以支持信号
         try:
             print(f"[{int((time.time()-start_time)*1000)}] 开始图像合成")
             
-            bmp_bytes = draw_content_auto(text=text,content_image=image,)
+            # 按前台应用选择输出编码
+            encoder = CONFIGS.get_output_encoder(process_name)
+            with foreground_render():
+                output_image = draw_content_auto(text=text, content_image=image, encoder=encoder,
+                                                 with_dib=platform.startswith("win"))
 
             print(f"[{int((time.time()-start_time)*1000)}] 图片合成完成")
 
@@ -536,20 +642,14 @@ class ManosabaCore(QObject):  # 继承 QObject 以支持信号
             return f"生成图像失败: {e}"
 
         # 复制到剪贴板
-        if not self.clipboard_manager.copy_image_to_clipboard(bmp_bytes):
+        clip_seq = watcher.sequence()
+        if not self.clipboard_manager.copy_image_to_clipboard(output_image):
             return "复制到剪贴板失败"
         
         print(f"[{int((time.time()-start_time)*1000)}] 图片复制到剪切板完成")
 
-        # 等待剪贴板确认（最多等待2.5秒）
-        wait = 0.01
-        total = 0
-        while total < 0.5:
-            if self.clipboard_manager.has_image_in_clipboard():
-                break
-            time.sleep(wait)
-            total += wait
-            wait = min(wait * 1.5, 0.08)
+        # 等待剪贴板确认（序列号变化，最多等待0.5秒）
+        watcher.wait_for_change(clip_seq, 0.5)
         print(f"[{int((time.time()-start_time)*1000)}] 剪切板确认完成")
 
         # 自动粘贴和发送
@@ -559,7 +659,7 @@ class ManosabaCore(QObject):  # 继承 QObject 以支持信号
             self.kbd_controller.release("v")
             self.kbd_controller.release(Key.ctrl if platform != "darwin" else Key.cmd)
 
-            if not self._active_process_allowed():
+            if not self.foreground.is_allowed(self.foreground.current_name()):
                 return "前台应用不在白名单内"
             if CONFIGS.AUTO_SEND_IMAGE:
                 time.sleep(0.4)
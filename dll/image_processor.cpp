@@ -2,7 +2,9 @@
 
 #include <Windows.h>
 #include <algorithm>
+#include <cmath>
 #include <cstring>
+#include <list>
 #include <memory>
 #include <mutex>
 #include <stack>
@@ -112,6 +114,95 @@ struct FilePathCache {
     std::lock_guard<std::mutex> lock(mutex);
     path_map[base_name] = full_path;
   }
+
+  // 文件被替换或删除后丢弃对应项（可能换了扩展名）
+  bool Forget(const std::string &base_name) {
+    std::lock_guard<std::mutex> lock(mutex);
+    return path_map.erase(base_name) > 0;
+  }
+};
+
+// 解码后的图片缓存（背景、立绘、遮罩、emoji），按文件路径索引，超出预算时淘汰最久未用的
+struct DecodedImageCache {
+  struct Entry {
+    std::string path;
+    SDL_Surface *surface;
+    size_t bytes;
+  };
+  static constexpr size_t kBudget = 256u * 1024 * 1024;
+
+  std::list<Entry> entries; // 最近使用的在前
+  std::unordered_map<std::string, std::list<Entry>::iterator> index;
+  size_t total_bytes = 0;
+  std::mutex mutex;
+
+  // 返回缓存图片的副本（调用方释放），未缓存时返回 nullptr
+  SDL_Surface *Copy(const std::string &path) {
+    std::lock_guard<std::mutex> lock(mutex);
+    auto it = index.find(path);
+    if (it == index.end())
+      return nullptr;
+    entries.splice(entries.begin(), entries, it->second);
+    return SDL_DuplicateSurface(it->second->surface);
+  }
+
+  bool Contains(const std::string &path) {
+    std::lock_guard<std::mutex> lock(mutex);
+    auto it = index.find(path);
+    if (it == index.end())
+      return false;
+    entries.splice(entries.begin(), entries, it->second);
+    return true;
+  }
+
+  // 接管 surface；已有同路径项或单张超出预算时直接释放
+  void Put(const std::string &path, SDL_Surface *surface) {
+    size_t bytes = static_cast<size_t>(surface->pitch) * surface->h;
+    std::lock_guard<std::mutex> lock(mutex);
+    if (bytes > kBudget || index.count(path)) {
+      SDL_FreeSurface(surface);
+      return;
+    }
+    entries.push_front({path, surface, bytes});
+    index[path] = entries.begin();
+    total_bytes += bytes;
+    while (total_bytes > kBudget && entries.size() > 1) {
+      Entry &last = entries.back();
+      total_bytes -= last.bytes;
+      index.erase(last.path);
+      SDL_FreeSurface(last.surface);
+      entries.pop_back();
+    }
+  }
+
+  // 丢弃 base_name 加任意扩展名的项，返回丢弃的个数
+  int Forget(const std::string &base_name) {
+    std::lock_guard<std::mutex> lock(mutex);
+    int forgot = 0;
+    for (auto it = entries.begin(); it != entries.end();) {
+      const std::string &path = it->path;
+      bool match = path.size() > base_name.size() && path.compare(0, base_name.size(), base_name) == 0 && path[base_name.size()] == '.' && path.find('/', base_name.size()) == std::string::npos;
+      if (match) {
+        total_bytes -= it->bytes;
+        index.erase(path);
+        SDL_FreeSurface(it->surface);
+        it = entries.erase(it);
+        forgot++;
+      } else {
+        ++it;
+      }
+    }
+    return forgot;
+  }
+
+  void Clear() {
+    std::lock_guard<std::mutex> lock(mutex);
+    for (Entry &entry : entries)
+      SDL_FreeSurface(entry.surface);
+    entries.clear();
+    index.clear();
+    total_bytes = 0;
+  }
 };
 
 // Static layer node
@@ -131,6 +222,17 @@ struct StaticLayerNode {
   }
 };
 
+// 批量PSD图层描述，与Python端 PSDLayerDesc 结构体一一对应
+struct PSDLayerDesc {
+  unsigned char *data;
+  int width;
+  int height;
+  int pitch;
+  int x;
+  int y;
+  int opacity; // 0-255
+};
+
 struct StyleConfig {
   char aspect_ratio[32] = "16:9";
   unsigned char bracket_color[4] = {239, 79, 84, 255}; // #ef4f54
@@ -349,8 +451,14 @@ public:
   bool InitSDL();
   bool InitRenderer();
 
+  // 启动预热：提前打开字体、解码组件图片和emoji，与渲染共用缓存
+  int PreloadComponent(const char *component_json);
+  bool PreloadFont(const char *font_name, int size);
+  bool PreloadEmoji(const char *emoji_text);
+
   // 资源清理
   void ClearCache(const char *cache_type);
+  void InvalidateAsset(const char *relative_path);
   void CleanupRenderer();
   void Cleanup();
 
@@ -361,13 +469,22 @@ public:
 
   // PSD合成相关函数
   bool CreatePSDTempCanvas(int width, int height);
-  bool AddPSDLayerToTempCanvas(unsigned char *image_data, int image_width, int image_height, int image_pitch, int x, int y);
+  bool AddPSDLayerToTempCanvas(unsigned char *image_data, int image_width, int image_height, int image_pitch, int x, int y, int opacity = 255);
+  int AddPSDLayersToTempCanvas(const PSDLayerDesc *layers, int count);
   int FinalizePSDComposition();
   void ClearPSDCache();
 
+  // PSD基础层缓存（姿态+服装+动作），切换表情时复用
+  int FinalizePSDBase();
+  bool CreatePSDTempCanvasFromBase(int handle, int width, int height, int x, int y);
+  void ReleasePSDBase(int handle);
+  void ClearPSDBaseCache();
+
 private:
   ImageLoaderManager() = default;
   StyleConfig style_config_;
+  // 最近一次应用的样式更新版本号，旧版本的更新直接丢弃
+  int style_version_ = 0;
 
   // Global configuration
   char assets_path_[1024] = {0};
@@ -386,13 +503,22 @@ private:
   // 压缩设置
   bool compression_enabled_ = false;
   int compression_ratio_ = 40; // 默认40%
+  // 渲染缩放：压缩比例直接折算进绘制变换，画布按输出尺寸分配，不再整体缩放
+  float render_scale_ = 1.0f;
+  int ToRenderSize(double value) const { return static_cast<int>(std::lround(value * render_scale_)); }
 
   // PSD缓存相关
   std::unordered_map<int, SDL_Surface *> psd_image_cache_;
   SDL_Surface *psd_temp_canvas_ = nullptr;
   int next_psd_index_ = 0;
 
+  // 基础层缓存不随预览清理，由Python端按LRU释放
+  std::unordered_map<int, SDL_Surface *> psd_base_cache_;
+  int next_psd_base_ = 0;
+
   FontCacheEntry *font_cache_ = nullptr;
+  // 字体文件变化后移出缓存的条目，可能仍被正在进行的绘制使用，退出时释放
+  FontCacheEntry *retired_fonts_ = nullptr;
   SDL_Surface *preview_cache_ = nullptr;
 
   StaticLayerNode *static_layer_cache_first_ = nullptr;
@@ -429,12 +555,18 @@ private:
 
   // 加载组件图片
   enum IMAGE_TYPE { IMAGE_TYPE_COMPONENT, IMAGE_TYPE_CHARA, IMAGE_TYPE_BACKGROUND };
+  bool FindComponentImage(const char *overlay, IMAGE_TYPE image_type, int opt_emotion_index, std::string &found_path);
   SDL_Surface *LoadComponentImage(const char *overlay, IMAGE_TYPE image_type, int opt_emotion_index = 1);
 
+  // 解码图片缓存，返回的是副本，调用方负责释放
+  DecodedImageCache image_cache_;
+  SDL_Surface *LoadImageCached(const std::string &path);
+  bool PreloadImage(const std::string &path);
+
   // 组件绘制
   bool DrawBackgroundComponent(SDL_Surface *target1, cJSON *comp_obj);
   bool DrawCharacterComponent(SDL_Surface *target1, cJSON *comp_obj);
-  SDL_Surface *DrawNameboxWithText(cJSON *comp_obj);
+  SDL_Surface *DrawNameboxWithText(cJSON *comp_obj, float scale);
   bool DrawNameboxComponent(SDL_Surface *target1, SDL_Surface *target2, cJSON *comp_obj);
   bool DrawTextComponent(SDL_Surface *target1, SDL_Surface *target2, cJSON *comp_obj);
   bool DrawGenericComponent(SDL_Surface *target1, SDL_Surface *target2, cJSON *comp_obj);
@@ -516,6 +648,17 @@ void ImageLoaderManager::UpdateGuiSettings(const char *settings_json) {
     }
   }
 
+  float render_scale = 1.0f;
+  if (compression_enabled_ && compression_ratio_ > 0 && compression_ratio_ < 100) {
+    render_scale = 1.0f - compression_ratio_ / 100.0f;
+  }
+  if (render_scale != render_scale_) {
+    // 静态图层缓存按旧的渲染尺寸绘制，需要重建
+    render_scale_ = render_scale;
+    ClearStaticLayerCache();
+    DEBUG_PRINT("Render scale changed: %.2f", render_scale_);
+  }
+
   cJSON_Delete(json_root);
 }
 
@@ -531,6 +674,21 @@ void ImageLoaderManager::UpdateStyleConfig(const char *style_json) {
     return;
   }
 
+  // 增量更新：只包含变化的字段，version 递增
+  cJSON *version_item = cJSON_GetObjectItem(json_root, "version");
+  if (version_item && cJSON_IsNumber(version_item)) {
+    if (version_item->valueint <= style_version_) {
+      DEBUG_PRINT("Ignoring stale style update: %d <= %d", version_item->valueint, style_version_);
+      cJSON_Delete(json_root);
+      return;
+    }
+    style_version_ = version_item->valueint;
+  }
+
+  // 预览中的文字组件以字体和阴影偏移为默认值，这些字段变化时静态图层需要重绘
+  // 颜色、文本框、粘贴区域只在合成内容时读取，不影响任何缓存
+  bool layers_dirty = false;
+
   // 解析样式配置
   cJSON *aspect_ratio_item = cJSON_GetObjectItem(json_root, "aspect_ratio");
   if (aspect_ratio_item && cJSON_IsString(aspect_ratio_item)) {
@@ -558,14 +716,16 @@ void ImageLoaderManager::UpdateStyleConfig(const char *style_json) {
   cJSON *font_family_item = cJSON_GetObjectItem(json_root, "font_family");
   if (font_family_item && cJSON_IsString(font_family_item)) {
     const char *font_family = font_family_item->valuestring;
-    if (font_family) {
+    if (font_family && strncmp(style_config_.font_family, font_family, sizeof(style_config_.font_family) - 1) != 0) {
       strncpy(style_config_.font_family, font_family, sizeof(style_config_.font_family) - 1);
+      layers_dirty = true;
     }
   }
 
   cJSON *font_size = cJSON_GetObjectItem(json_root, "font_size");
-  if (font_size && cJSON_IsNumber(font_size)) {
+  if (font_size && cJSON_IsNumber(font_size) && style_config_.font_size != font_size->valueint) {
     style_config_.font_size = font_size->valueint;
+    layers_dirty = true;
   }
 
   // 解析粘贴图片设置
@@ -624,13 +784,15 @@ void ImageLoaderManager::UpdateStyleConfig(const char *style_json) {
   }
 
   cJSON *shadow_offset_x = cJSON_GetObjectItem(json_root, "shadow_offset_x");
-  if (shadow_offset_x && cJSON_IsNumber(shadow_offset_x)) {
+  if (shadow_offset_x && cJSON_IsNumber(shadow_offset_x) && style_config_.shadow_offset_x != shadow_offset_x->valueint) {
     style_config_.shadow_offset_x = shadow_offset_x->valueint;
+    layers_dirty = true;
   }
 
   cJSON *shadow_offset_y = cJSON_GetObjectItem(json_root, "shadow_offset_y");
-  if (shadow_offset_y && cJSON_IsNumber(shadow_offset_y)) {
+  if (shadow_offset_y && cJSON_IsNumber(shadow_offset_y) && style_config_.shadow_offset_y != shadow_offset_y->valueint) {
     style_config_.shadow_offset_y = shadow_offset_y->valueint;
+    layers_dirty = true;
   }
 
   // 解析文本对齐
@@ -679,7 +841,11 @@ void ImageLoaderManager::UpdateStyleConfig(const char *style_json) {
 
   cJSON_Delete(json_root);
 
-  DEBUG_PRINT("Style configuration updated: font=%s, size=%d", style_config_.font_family, style_config_.font_size);
+  if (layers_dirty) {
+    ClearStaticLayerCache();
+  }
+
+  DEBUG_PRINT("Style configuration updated (v%d): font=%s, size=%d, layers_dirty=%d", style_version_, style_config_.font_family, style_config_.font_size, layers_dirty);
 }
 
 void ImageLoaderManager::ClearCache(const char *cache_type) {
@@ -690,7 +856,60 @@ void ImageLoaderManager::ClearCache(const char *cache_type) {
   if (!cache_type)
     return;
 
-  ClearStaticLayerCache();
+  // 只有静态图层缓存由外部清理；字体和文件路径缓存与样式无关，PSD缓存由各自的接口管理
+  // 解码图片缓存与样式无关，"all" 不包含它，需要时单独清理
+  if (strcmp(cache_type, "all") == 0 || strcmp(cache_type, "layers") == 0) {
+    ClearStaticLayerCache();
+  } else if (strcmp(cache_type, "images") == 0) {
+    image_cache_.Clear();
+  } else {
+    DEBUG_PRINT("Unknown cache type: %s", cache_type);
+  }
+}
+
+void ImageLoaderManager::InvalidateAsset(const char *relative_path) {
+  if (!relative_path || !relative_path[0])
+    return;
+
+  // 路径相对素材目录，如 background/01.webp、chara/ema/ema (1).png、fonts/font3.ttf
+  std::string rel = relative_path;
+  std::replace(rel.begin(), rel.end(), '\\', '/');
+  std::string stem = rel;
+  size_t slash = stem.rfind('/');
+  size_t dot = stem.rfind('.');
+  if (dot != std::string::npos && (slash == std::string::npos || dot > slash))
+    stem = stem.substr(0, dot);
+  std::string category = slash == std::string::npos ? "" : rel.substr(0, rel.find('/'));
+
+  std::string base_name = std::string(assets_path_) + "/" + stem;
+  bool forgot = file_path_cache_.Forget(base_name);
+  int images = image_cache_.Forget(base_name);
+
+  int retired = 0;
+  if (category == "fonts") {
+    std::string font_name = stem.substr(slash + 1);
+    SDL_LockMutex(cache_mutex_);
+    FontCacheEntry **link = &font_cache_;
+    while (*link) {
+      FontCacheEntry *entry = *link;
+      if (font_name == entry->font_name) {
+        *link = entry->next;
+        entry->next = retired_fonts_;
+        retired_fonts_ = entry;
+        retired++;
+      } else {
+        link = &entry->next;
+      }
+    }
+    SDL_UnlockMutex(cache_mutex_);
+  }
+
+  // emoji 只在合成内容时绘制，其余素材都可能在静态图层里
+  if (category != "emoji") {
+    ClearStaticLayerCache();
+  }
+
+  DEBUG_PRINT("Asset invalidated: %s (path cache %d, images %d, fonts %d)", rel.c_str(), forgot, images, retired);
 }
 
 bool ImageLoaderManager::InitSDL() {
@@ -816,6 +1035,14 @@ void ImageLoaderManager::CleanupRenderer() {
 
 void ImageLoaderManager::Cleanup() {
   ClearCache("all");
+  ClearPSDBaseCache();
+  image_cache_.Clear();
+
+  // 字体需要在 TTF_Quit 之前关闭
+  delete font_cache_;
+  font_cache_ = nullptr;
+  delete retired_fonts_;
+  retired_fonts_ = nullptr;
 
   // 清理渲染器资源
   CleanupRenderer();
@@ -920,7 +1147,9 @@ LoadResult ImageLoaderManager::GeneratePreviewImage(int canvas_width, int canvas
     return LoadResult::JSON_PARSE_ERROR;
   }
 
-  // Create canvas
+  // Create canvas - 直接按输出尺寸分配
+  canvas_width = ToRenderSize(canvas_width);
+  canvas_height = ToRenderSize(canvas_height);
   SDL_Surface *canvas = SDL_CreateRGBSurfaceWithFormat(0, canvas_width, canvas_height, 32, SDL_PIXELFORMAT_ABGR8888);
   if (!canvas) {
     DEBUG_PRINT("Failed to create canvas: %s", SDL_GetError());
@@ -1090,6 +1319,16 @@ LoadResult ImageLoaderManager::DrawContentWithTextAndImage(const char *text, con
 
   utils::CalculateTextImageRegions(has_text, has_image, style_config_.paste_enabled, style_config_, strlen(text), emoji_list.size(), text_x, text_y, text_width, text_height, image_x, image_y, image_width_region, image_height_region);
 
+  // 样式中的区域是原始分辨率坐标，换算到画布的渲染尺寸
+  text_x = ToRenderSize(text_x);
+  text_y = ToRenderSize(text_y);
+  text_width = ToRenderSize(text_width);
+  text_height = ToRenderSize(text_height);
+  image_x = ToRenderSize(image_x);
+  image_y = ToRenderSize(image_y);
+  image_width_region = ToRenderSize(image_width_region);
+  image_height_region = ToRenderSize(image_height_region);
+
   // 4. 绘制图片和文本
   if (has_image) {
     DEBUG_PRINT("Drawing image: %dx%d", image_width, image_height);
@@ -1100,26 +1339,7 @@ LoadResult ImageLoaderManager::DrawContentWithTextAndImage(const char *text, con
     DrawTextAndEmojiToCanvas(canvas, std::string(text), emoji_list, emoji_positions, text_x, text_y, text_width, text_height);
   }
 
-  // 5. 压缩图像 - 使用渲染器进行高质量缩放
-  if (compression_enabled_ && compression_ratio_ > 0) {
-    DEBUG_PRINT("Applying compression with renderer: ratio=%d%%", compression_ratio_);
-
-    // 计算新尺寸
-    int new_width = static_cast<int>(canvas->w * (1.0f - compression_ratio_ / 100.0f));
-    int new_height = static_cast<int>(canvas->h * (1.0f - compression_ratio_ / 100.0f));
-
-    // 尝试使用渲染器进行高质量缩放
-    SDL_Surface *compressed_surface = ScaleSurfaceWithRenderer(canvas, new_width, new_height);
-
-    if (compressed_surface) {
-      // 替换原画布
-      SDL_FreeSurface(canvas);
-      canvas = compressed_surface;
-      DEBUG_PRINT("Renderer compression successful, new size: %dx%d", canvas->w, canvas->h);
-    }
-  }
-
-  // 6. 返回图像数据
+  // 5. 返回图像数据（压缩比例已折算进渲染尺寸，画布即输出尺寸）
   *out_width = canvas->w;
   *out_height = canvas->h;
   size_t data_size = static_cast<size_t>(canvas->h) * canvas->pitch;
@@ -1209,7 +1429,7 @@ SDL_Surface *ImageLoaderManager::LoadEmojiImage(const std::string &emoji_text, i
   static const std::vector<std::string> extensions = {".png", ".webp", ".jpg", ".jpeg"};
 
   // 先尝试直接路径
-  SDL_Surface *emoji_surface = IMG_Load(file_path);
+  SDL_Surface *emoji_surface = LoadImageCached(file_path);
 
   if (!emoji_surface) {
     // 如果没有找到，尝试所有扩展名
@@ -1229,7 +1449,7 @@ SDL_Surface *ImageLoaderManager::LoadEmojiImage(const std::string &emoji_text, i
         std::string base_filename = filename.substr(0, last_underscore) + ".png";
         snprintf(file_path, sizeof(file_path), "%s/emoji/%s", assets_path_, base_filename.c_str());
         DEBUG_PRINT("Trying fallback emoji file: %s", file_path);
-        emoji_surface = IMG_Load(file_path);
+        emoji_surface = LoadImageCached(file_path);
       }
 
       if (!emoji_surface) {
@@ -1237,7 +1457,7 @@ SDL_Surface *ImageLoaderManager::LoadEmojiImage(const std::string &emoji_text, i
         return nullptr;
       }
     } else {
-      emoji_surface = IMG_Load(found_path.c_str());
+      emoji_surface = LoadImageCached(found_path);
     }
   }
 
@@ -1400,8 +1620,8 @@ void ImageLoaderManager::DrawTextAndEmojiToCanvas(SDL_Surface *canvas, const std
   TTF_Font *best_font = nullptr;
   std::vector<std::pair<int, int>> best_lines;
 
-  int min_size = 12;
-  int max_size = config->font_size;
+  int max_size = ToRenderSize(config->font_size);
+  int min_size = std::min(ToRenderSize(12), max_size);
 
   DEBUG_PRINT("Testing font sizes from %d to %d", min_size, max_size);
 
@@ -1511,7 +1731,9 @@ void ImageLoaderManager::DrawTextAndEmojiToCanvas(SDL_Surface *canvas, const std
   }
 
   // 10. 绘制文本
-  bool has_shadow = (config->shadow_offset_x != 0 || config->shadow_offset_y != 0);
+  int shadow_offset_x = ToRenderSize(config->shadow_offset_x);
+  int shadow_offset_y = ToRenderSize(config->shadow_offset_y);
+  bool has_shadow = (shadow_offset_x != 0 || shadow_offset_y != 0);
 
   // 解析对齐字符串，获取垂直对齐方式
   std::string align_str(config->text_align);
@@ -1609,7 +1831,7 @@ void ImageLoaderManager::DrawTextAndEmojiToCanvas(SDL_Surface *canvas, const std
         if (has_shadow) {
           SDL_Surface *shadow_surface = TTF_RenderUTF8_Blended(best_font, seg_text.c_str(), shadow_color);
           if (shadow_surface) {
-            SDL_Rect shadow_rect = {current_x + config->shadow_offset_x, current_y + config->shadow_offset_y, shadow_surface->w, shadow_surface->h};
+            SDL_Rect shadow_rect = {current_x + shadow_offset_x, current_y + shadow_offset_y, shadow_surface->w, shadow_surface->h};
             SDL_BlitSurface(shadow_surface, nullptr, canvas, &shadow_rect);
             SDL_FreeSurface(shadow_surface);
           }
@@ -2019,9 +2241,9 @@ TTF_Font *ImageLoaderManager::GetFontCached(const char *font_name, int size) {
   return nullptr;
 }
 
-SDL_Surface *ImageLoaderManager::LoadComponentImage(const char *overlay, IMAGE_TYPE image_type, int opt_emotion_index) {
+bool ImageLoaderManager::FindComponentImage(const char *overlay, IMAGE_TYPE image_type, int opt_emotion_index, std::string &found_path) {
   if (!overlay || strlen(overlay) == 0)
-    return nullptr;
+    return false;
 
   // Build component path
   char base_name[256];
@@ -2044,18 +2266,115 @@ SDL_Surface *ImageLoaderManager::LoadComponentImage(const char *overlay, IMAGE_T
     snprintf(base_path, sizeof(base_path), "%s/%s/%s", assets_path_, img_type, base_name);
   }
   // 使用文件路径缓存
-  std::string found_path;
   static const std::vector<std::string> extensions = {".webp", ".png", ".jpg", ".jpeg", ".bmp"};
+  return FindFileWithExtensions(base_path, extensions, found_path);
+}
 
-  if (!FindFileWithExtensions(base_path, extensions, found_path)) {
+SDL_Surface *ImageLoaderManager::LoadComponentImage(const char *overlay, IMAGE_TYPE image_type, int opt_emotion_index) {
+  std::string found_path;
+  if (!FindComponentImage(overlay, image_type, opt_emotion_index, found_path)) {
     return nullptr;
   }
+  return LoadImageCached(found_path);
+}
 
-  SDL_Surface *comp_surface = IMG_Load(found_path.c_str());
-  if (!comp_surface) {
+SDL_Surface *ImageLoaderManager::LoadImageCached(const std::string &path) {
+  SDL_Surface *surface = image_cache_.Copy(path);
+  if (surface)
+    return surface;
+
+  surface = IMG_Load(path.c_str());
+  if (!surface)
     return nullptr;
+
+  // 调用方会释放或修改返回的图片，缓存中留一份原图
+  SDL_Surface *copy = SDL_DuplicateSurface(surface);
+  if (!copy)
+    return surface;
+  image_cache_.Put(path, surface);
+  return copy;
+}
+
+bool ImageLoaderManager::PreloadImage(const std::string &path) {
+  if (image_cache_.Contains(path))
+    return true;
+
+  SDL_Surface *surface = IMG_Load(path.c_str());
+  if (!surface)
+    return false;
+  image_cache_.Put(path, surface);
+  return true;
+}
+
+int ImageLoaderManager::PreloadComponent(const char *component_json) {
+  if (!component_json || !InitSDL())
+    return -1;
+
+  cJSON *comp_obj = cJSON_Parse(component_json);
+  if (!comp_obj || !cJSON_IsObject(comp_obj)) {
+    cJSON_Delete(comp_obj);
+    return -1;
+  }
+
+  // 与各组件的绘制函数取同样的参数，保证缓存键一致
+  int warmed = 0;
+  std::string found_path;
+  std::string type(GetJsonString(comp_obj, "type", ""));
+  const char *overlay = GetJsonString(comp_obj, "overlay", "");
+
+  if (type == "background") {
+    if (overlay[0] != '#' && FindComponentImage(overlay, IMAGE_TYPE_BACKGROUND, 0, found_path))
+      warmed += PreloadImage(found_path);
+  } else if (type == "character") {
+    // PSD角色由Python端预热
+    const char *char_name = GetJsonString(comp_obj, "character_name", "");
+    int emotion = static_cast<int>(GetJsonNumber(comp_obj, "emotion_index", 1));
+    if (!cJSON_GetObjectItem(comp_obj, "psd_index") && emotion > 0 && FindComponentImage(char_name, IMAGE_TYPE_CHARA, emotion, found_path))
+      warmed += PreloadImage(found_path);
+  } else if (type == "namebox") {
+    if (FindComponentImage(overlay, IMAGE_TYPE_COMPONENT, 0, found_path))
+      warmed += PreloadImage(found_path);
+
+    float scale = static_cast<float>(GetJsonNumber(comp_obj, "scale", 1.0)) * render_scale_;
+    const char *font_name = GetJsonString(comp_obj, "font_name", "font3");
+    cJSON *textcfg_obj = cJSON_GetObjectItem(comp_obj, "textcfg");
+    int text_config_count = textcfg_obj && cJSON_IsArray(textcfg_obj) ? cJSON_GetArraySize(textcfg_obj) : 0;
+    for (int i = 0; i < text_config_count; i++) {
+      cJSON *config_obj = cJSON_GetArrayItem(textcfg_obj, i);
+      if (!config_obj || strlen(GetJsonString(config_obj, "text", "")) == 0)
+        continue;
+      int font_size = static_cast<int>(GetJsonNumber(config_obj, "font_size", 92.0) * scale);
+      warmed += GetFontCached(font_name, font_size) != nullptr;
+    }
+  } else if (type == "text") {
+    const char *font_name = GetJsonString(comp_obj, "font_family", style_config_.font_family);
+    int font_size = ToRenderSize(GetJsonNumber(comp_obj, "font_size", style_config_.font_size));
+    warmed += GetFontCached(font_name, font_size) != nullptr;
+  } else if (strlen(overlay) > 0) {
+    if (FindComponentImage(overlay, IMAGE_TYPE_COMPONENT, 0, found_path))
+      warmed += PreloadImage(found_path);
   }
-  return comp_surface;
+
+  cJSON_Delete(comp_obj);
+  DEBUG_PRINT("Preloaded component %s: %d resources", type.c_str(), warmed);
+  return warmed;
+}
+
+bool ImageLoaderManager::PreloadFont(const char *font_name, int size) {
+  if (!font_name || !font_name[0] || !InitSDL())
+    return false;
+  return GetFontCached(font_name, ToRenderSize(size)) != nullptr;
+}
+
+bool ImageLoaderManager::PreloadEmoji(const char *emoji_text) {
+  if (!emoji_text || !emoji_text[0] || !InitSDL())
+    return false;
+  // 缓存的是解码结果，与绘制尺寸无关
+  SDL_Surface *surface = LoadEmojiImage(emoji_text, ToRenderSize(style_config_.font_size));
+  if (!surface)
+    return false;
+  SDL_FreeSurface(surface);
+  return true;
 }
 
 bool ImageLoaderManager::DrawBackgroundComponent(SDL_Surface *target1, cJSON *comp_obj) {
@@ -2093,12 +2412,14 @@ bool ImageLoaderManager::DrawBackgroundComponent(SDL_Surface *target1, cJSON *co
   if (!bg_surface)
     return false;
 
-  // 使用渲染器进行高质量缩放
+  // 使用渲染器进行高质量缩放（纯色背景已是画布尺寸，不再缩放）
   float scale = static_cast<float>(GetJsonNumber(comp_obj, "scale", 1.0));
+  if (overlay[0] != '#')
+    scale *= render_scale_;
   SDL_Surface *final_surface = bg_surface;
 
   if (scale != 1.0f) {
-    SDL_Surface *scaled_surface = ScaleSurfaceWithRenderer(bg_surface, static_cast<int>(bg_surface->h * scale), static_cast<int>(bg_surface->w * scale));
+    SDL_Surface *scaled_surface = ScaleSurfaceWithRenderer(bg_surface, static_cast<int>(bg_surface->w * scale), static_cast<int>(bg_surface->h * scale));
     if (scaled_surface) {
       SDL_FreeSurface(bg_surface);
       final_surface = scaled_surface;
@@ -2107,8 +2428,8 @@ bool ImageLoaderManager::DrawBackgroundComponent(SDL_Surface *target1, cJSON *co
 
   // 使用工具函数计算位置
   const char *align = GetJsonString(comp_obj, "align", "top-left");
-  int offset_x = static_cast<int>(GetJsonNumber(comp_obj, "offset_x", 0));
-  int offset_y = static_cast<int>(GetJsonNumber(comp_obj, "offset_y", 0));
+  int offset_x = ToRenderSize(GetJsonNumber(comp_obj, "offset_x", 0));
+  int offset_y = ToRenderSize(GetJsonNumber(comp_obj, "offset_y", 0));
 
   // Draw to target surfaces
   SDL_Rect pos = utils::CalculatePosition(align, offset_x, offset_y, target1->w, target1->h, final_surface->w, final_surface->h);
@@ -2158,7 +2479,7 @@ bool ImageLoaderManager::DrawCharacterComponent(SDL_Surface *target1, cJSON *com
   // 使用渲染器进行高质量缩放
   float comp_scale = static_cast<float>(GetJsonNumber(comp_obj, "scale", 1.0));
   float chara_scale = static_cast<float>(GetJsonNumber(comp_obj, "scale1", 1.0));
-  float scale = comp_scale * chara_scale;
+  float scale = comp_scale * chara_scale * render_scale_;
 
   SDL_Surface *final_surface = char_surface;
 
@@ -2175,9 +2496,9 @@ bool ImageLoaderManager::DrawCharacterComponent(SDL_Surface *target1, cJSON *com
 
   // 使用工具函数计算位置
   const char *align = GetJsonString(comp_obj, "align", "top-left");
-  int offset_x = static_cast<int>(GetJsonNumber(comp_obj, "offset_x", 0)) + static_cast<int>(GetJsonNumber(comp_obj, "offset_x1", 0));
+  int offset_x = ToRenderSize(static_cast<int>(GetJsonNumber(comp_obj, "offset_x", 0)) + static_cast<int>(GetJsonNumber(comp_obj, "offset_x1", 0)));
 
-  int offset_y = static_cast<int>(GetJsonNumber(comp_obj, "offset_y", 0)) + static_cast<int>(GetJsonNumber(comp_obj, "offset_y1", 0));
+  int offset_y = ToRenderSize(static_cast<int>(GetJsonNumber(comp_obj, "offset_y", 0)) + static_cast<int>(GetJsonNumber(comp_obj, "offset_y1", 0)));
 
   SDL_Rect pos = utils::CalculatePosition(align, offset_x, offset_y, target1->w, target1->h, final_surface->w, final_surface->h);
 
@@ -2191,7 +2512,7 @@ bool ImageLoaderManager::DrawCharacterComponent(SDL_Surface *target1, cJSON *com
   return true;
 }
 
-SDL_Surface *ImageLoaderManager::DrawNameboxWithText(cJSON *comp_obj) {
+SDL_Surface *ImageLoaderManager::DrawNameboxWithText(cJSON *comp_obj, float scale) {
   const char *overlay = GetJsonString(comp_obj, "overlay", "");
 
   if (strlen(overlay) == 0) {
@@ -2206,6 +2527,15 @@ SDL_Surface *ImageLoaderManager::DrawNameboxWithText(cJSON *comp_obj) {
     return nullptr;
   }
 
+  // 先把底图缩放到最终尺寸，文字直接按缩放后的字号绘制
+  if (scale != 1.0f) {
+    SDL_Surface *scaled_surface = ScaleSurfaceWithRenderer(namebox_surface, static_cast<int>(namebox_surface->w * scale), static_cast<int>(namebox_surface->h * scale));
+    if (scaled_surface) {
+      SDL_FreeSurface(namebox_surface);
+      namebox_surface = scaled_surface;
+    }
+  }
+
   // 获取文本配置
   cJSON *textcfg_obj = cJSON_GetObjectItem(comp_obj, "textcfg");
   if (!textcfg_obj || !cJSON_IsArray(textcfg_obj)) {
@@ -2225,7 +2555,7 @@ SDL_Surface *ImageLoaderManager::DrawNameboxWithText(cJSON *comp_obj) {
   for (int i = 0; i < text_config_count; i++) {
     cJSON *config_obj = cJSON_GetArrayItem(textcfg_obj, i);
     if (config_obj) {
-      int font_size = static_cast<int>(GetJsonNumber(config_obj, "font_size", 92.0));
+      int font_size = static_cast<int>(GetJsonNumber(config_obj, "font_size", 92.0) * scale);
       if (font_size > max_font_size) {
         max_font_size = font_size;
       }
@@ -2236,7 +2566,8 @@ SDL_Surface *ImageLoaderManager::DrawNameboxWithText(cJSON *comp_obj) {
   int baseline_y = static_cast<int>(namebox_surface->h * 0.65);
 
   // 起始X位置 - 以270为中心，根据最大字体大小调整
-  int current_x = 270 - max_font_size / 2;
+  int current_x = static_cast<int>(270 * scale) - max_font_size / 2;
+  int shadow_offset = std::max(1, static_cast<int>(std::lround(2 * scale)));
 
   // 获取字体名称
   const char *font_name = GetJsonString(comp_obj, "font_name", "font3");
@@ -2253,7 +2584,7 @@ SDL_Surface *ImageLoaderManager::DrawNameboxWithText(cJSON *comp_obj) {
       continue;
     }
 
-    int font_size = static_cast<int>(GetJsonNumber(config_obj, "font_size", 92.0));
+    int font_size = static_cast<int>(GetJsonNumber(config_obj, "font_size", 92.0) * scale);
 
     // 获取颜色配置
     SDL_Color text_color;
@@ -2277,10 +2608,10 @@ SDL_Surface *ImageLoaderManager::DrawNameboxWithText(cJSON *comp_obj) {
     // 基线对齐：baseline_y - ascent 得到文本顶部的y坐标
     int text_top_y = baseline_y - TTF_FontAscent(font);
 
-    // 绘制阴影文字 (2像素偏移)
+    // 绘制阴影文字 (原始尺寸下2像素偏移)
     SDL_Surface *shadow_surface = TTF_RenderUTF8_Blended(font, text, shadow_color);
     if (shadow_surface) {
-      SDL_Rect shadow_rect = {current_x + 2, text_top_y + 2, shadow_surface->w, shadow_surface->h};
+      SDL_Rect shadow_rect = {current_x + shadow_offset, text_top_y + shadow_offset, shadow_surface->w, shadow_surface->h};
       SDL_BlitSurface(shadow_surface, nullptr, namebox_surface, &shadow_rect);
       SDL_FreeSurface(shadow_surface);
     }
@@ -2308,33 +2639,18 @@ SDL_Surface *ImageLoaderManager::DrawNameboxWithText(cJSON *comp_obj) {
 
 bool ImageLoaderManager::DrawNameboxComponent(SDL_Surface *target1, SDL_Surface *target2, cJSON *comp_obj) {
 
-  // 使用新的函数绘制带文字的namebox
-  SDL_Surface *namebox_surface = DrawNameboxWithText(comp_obj);
-  // 加载图像
-  if (!namebox_surface) {
+  // 组件缩放和渲染缩放一起交给绘制函数，文字按最终字号绘制，不再整体缩放
+  float scale = static_cast<float>(GetJsonNumber(comp_obj, "scale", 1.0)) * render_scale_;
+  SDL_Surface *final_surface = DrawNameboxWithText(comp_obj, scale);
+  if (!final_surface) {
     DEBUG_PRINT("DrawNameboxComponent: Failed to draw namebox with text");
     return false;
   }
 
-  // 使用渲染器进行高质量缩放
-  float scale = static_cast<float>(GetJsonNumber(comp_obj, "scale", 1.0));
-  SDL_Surface *final_surface = namebox_surface;
-
-  if (scale != 1.0f) {
-    int new_width = static_cast<int>(namebox_surface->w * scale);
-    int new_height = static_cast<int>(namebox_surface->h * scale);
-
-    SDL_Surface *scaled_surface = ScaleSurfaceWithRenderer(namebox_surface, new_width, new_height);
-    if (scaled_surface) {
-      SDL_FreeSurface(namebox_surface);
-      final_surface = scaled_surface;
-    }
-  }
-
   // 使用工具函数计算位置
   const char *align = GetJsonString(comp_obj, "align", "top-left");
-  int offset_x = static_cast<int>(GetJsonNumber(comp_obj, "offset_x", 0));
-  int offset_y = static_cast<int>(GetJsonNumber(comp_obj, "offset_y", 0));
+  int offset_x = ToRenderSize(GetJsonNumber(comp_obj, "offset_x", 0));
+  int offset_y = ToRenderSize(GetJsonNumber(comp_obj, "offset_y", 0));
 
   SDL_Rect pos = utils::CalculatePosition(align, offset_x, offset_y, target1->w, target1->h, final_surface->w, final_surface->h);
   SDL_Rect pos1 = pos;
@@ -2359,7 +2675,7 @@ bool ImageLoaderManager::DrawTextComponent(SDL_Surface *target1, SDL_Surface *ta
 
   // 获取字体配置
   const char *font_name = GetJsonString(comp_obj, "font_family", style_config_.font_family);
-  int font_size = static_cast<int>(GetJsonNumber(comp_obj, "font_size", style_config_.font_size));
+  int font_size = ToRenderSize(GetJsonNumber(comp_obj, "font_size", style_config_.font_size));
 
   DEBUG_PRINT("DrawTextComponent: text='%s', font=%s, size=%d", text, font_name, font_size);
 
@@ -2372,16 +2688,16 @@ bool ImageLoaderManager::DrawTextComponent(SDL_Surface *target1, SDL_Surface *ta
   cJSON *shadow_color_obj = cJSON_GetObjectItem(comp_obj, "shadow_color");
   shadow_color = ParseColor(shadow_color_obj);
 
-  int shadow_offset_x = static_cast<int>(GetJsonNumber(comp_obj, "shadow_offset_x", style_config_.shadow_offset_x));
-  int shadow_offset_y = static_cast<int>(GetJsonNumber(comp_obj, "shadow_offset_y", style_config_.shadow_offset_y));
+  int shadow_offset_x = ToRenderSize(GetJsonNumber(comp_obj, "shadow_offset_x", style_config_.shadow_offset_x));
+  int shadow_offset_y = ToRenderSize(GetJsonNumber(comp_obj, "shadow_offset_y", style_config_.shadow_offset_y));
 
   // 获取对齐方式
   const char *align_str = GetJsonString(comp_obj, "align", "top-left");
-  int offset_x = static_cast<int>(GetJsonNumber(comp_obj, "offset_x", 0));
-  int offset_y = static_cast<int>(GetJsonNumber(comp_obj, "offset_y", 0));
+  int offset_x = ToRenderSize(GetJsonNumber(comp_obj, "offset_x", 0));
+  int offset_y = ToRenderSize(GetJsonNumber(comp_obj, "offset_y", 0));
 
   // 获取最大宽度（用于换行）
-  int max_width = static_cast<int>(GetJsonNumber(comp_obj, "max_width", 1000));
+  int max_width = ToRenderSize(GetJsonNumber(comp_obj, "max_width", 1000));
 
   // 获取字体
   TTF_Font *font = GetFontCached(font_name, font_size);
@@ -2489,7 +2805,7 @@ bool ImageLoaderManager::DrawGenericComponent(SDL_Surface *target1, SDL_Surface
     return false;
 
   // 使用渲染器进行高质量缩放
-  float scale = static_cast<float>(GetJsonNumber(comp_obj, "scale", 1.0));
+  float scale = static_cast<float>(GetJsonNumber(comp_obj, "scale", 1.0)) * render_scale_;
   SDL_Surface *final_surface = comp_surface;
 
   if (scale != 1.0f) {
@@ -2505,8 +2821,8 @@ bool ImageLoaderManager::DrawGenericComponent(SDL_Surface *target1, SDL_Surface
 
   // 使用工具函数计算位置
   const char *align = GetJsonString(comp_obj, "align", "top-left");
-  int offset_x = static_cast<int>(GetJsonNumber(comp_obj, "offset_x", 0));
-  int offset_y = static_cast<int>(GetJsonNumber(comp_obj, "offset_y", 0));
+  int offset_x = ToRenderSize(GetJsonNumber(comp_obj, "offset_x", 0));
+  int offset_y = ToRenderSize(GetJsonNumber(comp_obj, "offset_y", 0));
 
   // Draw to target surfaces
   SDL_Rect pos = utils::CalculatePosition(align, offset_x, offset_y, target1->w, target1->h, final_surface->w, final_surface->h);
@@ -2589,7 +2905,7 @@ bool ImageLoaderManager::CreatePSDTempCanvas(int width, int height) {
   return true;
 }
 
-bool ImageLoaderManager::AddPSDLayerToTempCanvas(unsigned char *image_data, int image_width, int image_height, int image_pitch, int x, int y) {
+bool ImageLoaderManager::AddPSDLayerToTempCanvas(unsigned char *image_data, int image_width, int image_height, int image_pitch, int x, int y, int opacity) {
 
   if (!psd_temp_canvas_) {
     DEBUG_PRINT("No PSD temp canvas created");
@@ -2609,6 +2925,11 @@ bool ImageLoaderManager::AddPSDLayerToTempCanvas(unsigned char *image_data, int
     return false;
   }
 
+  // 图层不透明度
+  if (opacity < 255) {
+    SDL_SetSurfaceAlphaMod(layer_surface, static_cast<Uint8>(opacity < 0 ? 0 : opacity));
+  }
+
   // 绘制到临时画布
   SDL_Rect dest_rect = {x, y, image_width, image_height};
   SDL_BlitSurface(layer_surface, nullptr, psd_temp_canvas_, &dest_rect);
@@ -2617,6 +2938,22 @@ bool ImageLoaderManager::AddPSDLayerToTempCanvas(unsigned char *image_data, int
   return true;
 }
 
+int ImageLoaderManager::AddPSDLayersToTempCanvas(const PSDLayerDesc *layers, int count) {
+  if (!layers || count <= 0) {
+    return 0;
+  }
+
+  // 按顺序合成，返回成功添加的图层数
+  int added = 0;
+  for (int i = 0; i < count; ++i) {
+    const PSDLayerDesc &layer = layers[i];
+    if (AddPSDLayerToTempCanvas(layer.data, layer.width, layer.height, layer.pitch, layer.x, layer.y, layer.opacity)) {
+      added++;
+    }
+  }
+  return added;
+}
+
 int ImageLoaderManager::FinalizePSDComposition() {
   if (!psd_temp_canvas_) {
     DEBUG_PRINT("No PSD temp canvas to finalize");
@@ -2645,6 +2982,75 @@ void ImageLoaderManager::ClearPSDCache() {
   DEBUG_PRINT("PSD cache cleared");
 }
 
+int ImageLoaderManager::FinalizePSDBase() {
+  if (!psd_temp_canvas_) {
+    DEBUG_PRINT("No PSD temp canvas to keep as base");
+    return -1;
+  }
+
+  int handle = next_psd_base_++;
+  psd_base_cache_[handle] = psd_temp_canvas_;
+  psd_temp_canvas_ = nullptr;
+
+  DEBUG_PRINT("PSD base cached, handle: %d", handle);
+  return handle;
+}
+
+bool ImageLoaderManager::CreatePSDTempCanvasFromBase(int handle, int width, int height, int x, int y) {
+  auto it = psd_base_cache_.find(handle);
+  if (it == psd_base_cache_.end() || !it->second) {
+    DEBUG_PRINT("PSD base not found: %d", handle);
+    return false;
+  }
+
+  SDL_Surface *base = it->second;
+  // 顶层栈没有超出基础层（最常见的情况）时画布就是基础层大小，整块复制即可
+  if (x == 0 && y == 0 && width == base->w && height == base->h) {
+    if (psd_temp_canvas_) {
+      SDL_FreeSurface(psd_temp_canvas_);
+    }
+    psd_temp_canvas_ = SDL_DuplicateSurface(base);
+    if (psd_temp_canvas_) {
+      SDL_SetSurfaceBlendMode(psd_temp_canvas_, SDL_BLENDMODE_BLEND);
+      return true;
+    }
+    DEBUG_PRINT("Failed to duplicate PSD base: %s", SDL_GetError());
+  }
+
+  if (!CreatePSDTempCanvas(width, height)) {
+    return false;
+  }
+
+  // 新画布是全透明的，直接复制基础层像素
+  SDL_SetSurfaceBlendMode(base, SDL_BLENDMODE_NONE);
+  SDL_Rect dest_rect = {x, y, base->w, base->h};
+  SDL_BlitSurface(base, nullptr, psd_temp_canvas_, &dest_rect);
+  SDL_SetSurfaceBlendMode(base, SDL_BLENDMODE_BLEND);
+
+  return true;
+}
+
+void ImageLoaderManager::ReleasePSDBase(int handle) {
+  auto it = psd_base_cache_.find(handle);
+  if (it == psd_base_cache_.end()) {
+    return;
+  }
+  if (it->second) {
+    SDL_FreeSurface(it->second);
+  }
+  psd_base_cache_.erase(it);
+}
+
+void ImageLoaderManager::ClearPSDBaseCache() {
+  for (auto &entry : psd_base_cache_) {
+    if (entry.second) {
+      SDL_FreeSurface(entry.second);
+    }
+  }
+  psd_base_cache_.clear();
+  DEBUG_PRINT("PSD base cache cleared");
+}
+
 } // namespace image_loader
 
 // C interface export functions
@@ -2658,6 +3064,16 @@ __declspec(dllexport) void update_style_config(const char *style_json) { image_l
 
 __declspec(dllexport) void clear_cache(const char *cache_type) { image_loader::ImageLoaderManager::GetInstance().ClearCache(cache_type); }
 
+__declspec(dllexport) void invalidate_asset(const char *relative_path) { image_loader::ImageLoaderManager::GetInstance().InvalidateAsset(relative_path); }
+
+__declspec(dllexport) int warmup_renderer() { return image_loader::ImageLoaderManager::GetInstance().InitSDL(); }
+
+__declspec(dllexport) int preload_component(const char *component_json) { return image_loader::ImageLoaderManager::GetInstance().PreloadComponent(component_json); }
+
+__declspec(dllexport) int preload_font(const char *font_name, int size) { return image_loader::ImageLoaderManager::GetInstance().PreloadFont(font_name, size); }
+
+__declspec(dllexport) int preload_emoji(const char *emoji_text) { return image_loader::ImageLoaderManager::GetInstance().PreloadEmoji(emoji_text); }
+
 __declspec(dllexport) int generate_image(int w, int h, const char *json, unsigned char **out, int *outW, int *outH) { return static_cast<int>(image_loader::ImageLoaderManager::GetInstance().GeneratePreviewImage(w, h, json, out, outW, outH)); }
 
 __declspec(dllexport) int draw_content_simple(const char *text, const char *emoji_json, unsigned char *image_data, int image_width, int image_height, int image_pitch, unsigned char **out_data, int *out_width, int *out_height) {
@@ -2675,10 +3091,20 @@ __declspec(dllexport) int add_psd_layer(unsigned char *image_data, int image_wid
   return image_loader::ImageLoaderManager::GetInstance().AddPSDLayerToTempCanvas(image_data, image_width, image_height, image_pitch, x, y);
 }
 
+__declspec(dllexport) int add_psd_layers(const image_loader::PSDLayerDesc *layers, int count) { return image_loader::ImageLoaderManager::GetInstance().AddPSDLayersToTempCanvas(layers, count); }
+
 __declspec(dllexport) int finish_psd_composition() { return image_loader::ImageLoaderManager::GetInstance().FinalizePSDComposition(); }
 
 __declspec(dllexport) void clear_psd_cache() { image_loader::ImageLoaderManager::GetInstance().ClearPSDCache(); }
 
+__declspec(dllexport) int finish_psd_base() { return image_loader::ImageLoaderManager::GetInstance().FinalizePSDBase(); }
+
+__declspec(dllexport) int start_psd_composition_from_base(int handle, int width, int height, int x, int y) {
+  return image_loader::ImageLoaderManager::GetInstance().CreatePSDTempCanvasFromBase(handle, width, height, x, y);
+}
+
+__declspec(dllexport) void release_psd_base(int handle) { image_loader::ImageLoaderManager::GetInstance().ReleasePSDBase(handle); }
+
 __declspec(dllexport) void cleanup_all() { image_loader::ImageLoaderManager::GetInstance().Cleanup(); }
 
 } // extern "C"
\ No newline at end of file
@@ -2,6 +2,10 @@
 """PyQt 版本主程序入口"""
 
 import sys
+# 启动性能分析（--profile-startup），需要在其他模块导入前安装
+from utils import startup_profiler
+startup_profiler.install()
+
 from PySide6.QtWidgets import QApplication, QMainWindow, QGraphicsScene, QGraphicsPixmapItem, QSizePolicy, QDialog
 from PySide6.QtCore import Qt, QTimer, QPoint, QMetaObject, Slot, Q_ARG
 from PySide6.QtGui import QImage, QPixmap, QIcon
@@ -17,6 +21,8 @@ from path_utils import get_resource_path
 from pyqt_setting import SettingWindow
 from pyqt_hotkeys import HotkeyManager
 
+startup_profiler.mark("模块导入完成")
+
 
 class ManosabaMainWindow(QMainWindow):
     """魔裁文本框 PyQt 主窗口"""
@@ -33,7 +39,8 @@ class ManosabaMainWindow(QMainWindow):
         self.background_tab = None
         
         # 初始化核心
-        self.core = ManosabaCore()
+        with startup_profiler.phase("初始化核心"):
+            self.core = ManosabaCore()
         self.core.gui = self
 
         # 连接信号到槽
@@ -54,13 +61,15 @@ class ManosabaMainWindow(QMainWindow):
         self._ignore_signals = False
 
         # 初始化界面
-        self._setup_ui()
+        with startup_profiler.phase("初始化界面"):
+            self._setup_ui()
         
         # 连接信号槽
         self._connect_signals()
 
         # 初始化热键管理器
-        self.hotkey_manager = HotkeyManager(self, self.core)
+        with startup_profiler.phase("初始化热键"):
+            self.hotkey_manager = HotkeyManager(self, self.core)
 
         # 初始预览
         QTimer.singleShot(100, self.update_preview)
@@ -318,8 +327,12 @@ class ManosabaMainWindow(QMainWindow):
     def update_preview(self):
         """更新预览"""
         try:
-            preview_image, info = self.core.generate_preview()
-            self._update_preview_ui(preview_image, info)
+            with startup_profiler.phase("生成预览"):
+                preview_image, info = self.core.generate_preview()
+                self._update_preview_ui(preview_image, info)
+            # 首次预览完成后输出启动报告（只输出一次）
+            startup_profiler.mark("首次预览")
+            startup_profiler.report()
         except Exception as e:
             error_msg = f"预览生成失败: {str(e)}"
             print(traceback.format_exc())
@@ -618,7 +631,8 @@ class ManosabaMainWindow(QMainWindow):
                     
 def main():
     """主函数"""
-    app = QApplication(sys.argv)
+    with startup_profiler.phase("创建QApplication"):
+        app = QApplication(sys.argv)
     
     # 设置应用程序图标
     icon_path = get_resource_path("assets/icon.ico")
@@ -626,11 +640,15 @@ def main():
     app.setWindowIcon(icon)
     
     # 创建主窗口
-    main_window = ManosabaMainWindow()
-    main_window.setWindowIcon(icon)
+    with startup_profiler.phase("创建主窗口"):
+        main_window = ManosabaMainWindow()
+        main_window.setWindowIcon(icon)
 
     # 显示窗口
     main_window.show()
+    startup_profiler.mark("窗口显示")
+    # 窗口显示后在后台预热渲染资源，首次预览等待的时间随之缩短
+    QTimer.singleShot(0, main_window.core.start_startup_warmup)
     
     # 运行应用
     app.exec()
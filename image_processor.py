@@ -1,13 +1,47 @@
 # image_processor.py - 和dll交互的模块
+import copy
 import ctypes
 import json
 import time
-import emoji
-from io import BytesIO
-from ctypes import c_char_p, c_int, POINTER, c_ubyte, c_void_p, c_float, create_string_buffer, cast
+from ctypes import c_char, c_char_p, c_int, POINTER, c_ubyte, c_void_p, c_float, create_string_buffer, cast, Structure, addressof
 from typing import List, Dict, Any, Tuple, Optional
 from PIL import Image
 
+from utils.image_encoder import EncodedImage, encode_image
+from utils.style_model import ComponentView, components_to_json
+
+# 预览文字组件未单独设置时使用的样式字段，变化后静态图层需要重绘
+_LAYER_STYLE_KEYS = frozenset({"font_family", "font_size", "shadow_offset_x", "shadow_offset_y"})
+
+class PSDLayerDesc(Structure):
+    """批量添加PSD图层的描述，与C++端 PSDLayerDesc 一一对应"""
+    _fields_ = [
+        ("data", c_void_p),
+        ("width", c_int),
+        ("height", c_int),
+        ("pitch", c_int),
+        ("x", c_int),
+        ("y", c_int),
+        ("opacity", c_int),
+    ]
+
+def _buffer_address(buffer) -> Tuple[int, Any]:
+    """
+    通过缓冲区协议取得数据地址，不复制数据
+    返回 (地址, 需要在调用期间保持存活的对象)
+    """
+    if isinstance(buffer, bytes):
+        ref = c_char_p(buffer)
+        return cast(ref, c_void_p).value, ref
+    view = memoryview(buffer)
+    if not view.readonly and view.c_contiguous:
+        ref = (c_char * view.nbytes).from_buffer(view)
+        return addressof(ref), ref
+    # 只读且不是bytes的缓冲区只能复制一次
+    data = view.tobytes()
+    ref = c_char_p(data)
+    return cast(ref, c_void_p).value, ref
+
 class ImageLoaderDLL:
     """增强的图像加载DLL包装器，使用JSON传递配置"""
     
@@ -30,6 +64,10 @@ class ImageLoaderDLL:
             raise OSError(f"加载DLL失败: {e}")
         
         self.layer_cache = False
+        self._compression_settings = None
+        # 已推送到C++端的样式字段及推送版本号
+        self._style_sent: Dict[str, Any] = {}
+        self.style_version = 0
         self._define_psd_functions()
     
     def _define_psd_functions(self):
@@ -52,6 +90,11 @@ class ImageLoaderDLL:
         ]
         self.dll.add_psd_layer.restype = c_int
         
+        # 批量添加PSD图层（旧版DLL没有此函数）
+        if hasattr(self.dll, "add_psd_layers"):
+            self.dll.add_psd_layers.argtypes = [POINTER(PSDLayerDesc), c_int]
+            self.dll.add_psd_layers.restype = c_int
+        
         # 结束PSD合成并返回索引
         self.dll.finish_psd_composition.argtypes = []
         self.dll.finish_psd_composition.restype = c_int
@@ -59,6 +102,19 @@ class ImageLoaderDLL:
         # 清理PSD缓存
         self.dll.clear_psd_cache.argtypes = []
         self.dll.clear_psd_cache.restype = None
+        
+        # PSD基础层缓存（旧版DLL没有这些函数）
+        self.psd_base_supported = all(
+            hasattr(self.dll, name)
+            for name in ("finish_psd_base", "start_psd_composition_from_base", "release_psd_base")
+        )
+        if self.psd_base_supported:
+            self.dll.finish_psd_base.argtypes = []
+            self.dll.finish_psd_base.restype = c_int
+            self.dll.start_psd_composition_from_base.argtypes = [c_int, c_int, c_int, c_int, c_int]
+            self.dll.start_psd_composition_from_base.restype = c_int
+            self.dll.release_psd_base.argtypes = [c_int]
+            self.dll.release_psd_base.restype = None
     
     # 添加PSD合成相关方法
     def start_psd_composition(self, width: int, height: int) -> bool:
@@ -90,6 +146,37 @@ class ImageLoaderDLL:
         
         return result == 1
     
+    def add_psd_layers(self, layers: List[Tuple[Any, int, int, int, int, int]]) -> int:
+        """
+        一次调用批量添加PSD图层，按列表顺序合成
+        layers: [(RGBA缓冲区, 宽, 高, x, y, 不透明度0-255), ...]，缓冲区需支持缓冲区协议
+        返回成功添加的图层数
+        """
+        if not layers:
+            return 0
+        
+        descs = (PSDLayerDesc * len(layers))()
+        keep_alive = []
+        for desc, (buffer, width, height, x, y, opacity) in zip(descs, layers):
+            address, ref = _buffer_address(buffer)
+            keep_alive.append(ref)
+            desc.data = address
+            desc.width = width
+            desc.height = height
+            desc.pitch = width * 4
+            desc.x = x
+            desc.y = y
+            desc.opacity = opacity
+        
+        if hasattr(self.dll, "add_psd_layers"):
+            return self.dll.add_psd_layers(descs, len(layers))
+        
+        # 旧版DLL逐层添加（不支持不透明度）
+        return sum(
+            self.dll.add_psd_layer(desc.data, desc.width, desc.height, desc.pitch, desc.x, desc.y) == 1
+            for desc in descs
+        )
+    
     def finish_psd_composition(self) -> int:
         """结束PSD合成，返回缓存索引"""
         # 清理图层缓冲区
@@ -98,6 +185,18 @@ class ImageLoaderDLL:
         print(f"PSD合成完成，索引: {index}")
         return index
     
+    def finish_psd_base(self) -> int:
+        """结束合成，把临时画布保留为基础层，返回基础层句柄"""
+        return self.dll.finish_psd_base()
+    
+    def start_psd_composition_from_base(self, handle: int, width: int, height: int, x: int, y: int) -> bool:
+        """创建临时画布并把基础层复制到 (x, y)"""
+        return self.dll.start_psd_composition_from_base(handle, width, height, x, y) == 1
+    
+    def release_psd_base(self, handle: int):
+        """释放基础层"""
+        self.dll.release_psd_base(handle)
+    
     def clear_psd_cache(self):
         """清理PSD缓存"""
         self.dll.clear_psd_cache()
@@ -109,6 +208,24 @@ class ImageLoaderDLL:
         self.dll.clear_cache.argtypes = [c_char_p]
         self.dll.clear_cache.restype = None
 
+        # 单个素材文件变化（旧版DLL可能没有该函数）
+        if hasattr(self.dll, 'invalidate_asset'):
+            self.dll.invalidate_asset.argtypes = [c_char_p]
+            self.dll.invalidate_asset.restype = None
+
+        # 启动预热（旧版DLL可能没有这些函数）
+        self.warmup_supported = all(hasattr(self.dll, name) for name in
+                                    ("warmup_renderer", "preload_component", "preload_font", "preload_emoji"))
+        if self.warmup_supported:
+            self.dll.warmup_renderer.argtypes = []
+            self.dll.warmup_renderer.restype = c_int
+            self.dll.preload_component.argtypes = [c_char_p]  # 单个组件的JSON
+            self.dll.preload_component.restype = c_int
+            self.dll.preload_font.argtypes = [c_char_p, c_int]
+            self.dll.preload_font.restype = c_int
+            self.dll.preload_emoji.argtypes = [c_char_p]
+            self.dll.preload_emoji.restype = c_int
+
         # 修改：根据C++签名更新generate_image参数
         self.dll.generate_image.argtypes = [
             c_int,                      # canvas_width
@@ -142,6 +259,13 @@ class ImageLoaderDLL:
             c_char_p   # settings_json
         ]
         self.dll.update_gui_settings.restype = None
+
+        # 增量更新样式配置（旧版DLL可能没有该函数）
+        if hasattr(self.dll, 'update_style_config'):
+            self.dll.update_style_config.argtypes = [
+                c_char_p   # style_json，只含变化的字段和 version
+            ]
+            self.dll.update_style_config.restype = None
     
     def set_global_config(self, assets_path: str, min_image_ratio: float = 0.2):
         """设置全局配置到DLL"""
@@ -156,8 +280,35 @@ class ImageLoaderDLL:
         """更新GUI设置到DLL"""
         settings_json = json.dumps(settings, ensure_ascii=False).encode('utf-8')
         self.dll.update_gui_settings(settings_json)
+        # 压缩比例决定渲染尺寸，变化后C++端会丢弃静态图层缓存（只推送了变化的键时可能不含该项）
+        compression = settings.get("image_compression")
+        if "image_compression" in settings and compression != self._compression_settings:
+            self._compression_settings = dict(compression) if compression else compression
+            self.layer_cache = False
         print("DLL GUI设置已更新")
     
+    def update_style_config(self, style_dict: Dict[str, Any]) -> set:
+        """只推送与上次相比变化的样式字段，返回变化的键"""
+        if not hasattr(self.dll, 'update_style_config'):
+            print("Warning: update_style_config function not found in DLL")
+            return set()
+
+        changed = {key: value for key, value in style_dict.items()
+                   if key not in self._style_sent or self._style_sent[key] != value}
+        if not changed:
+            return set()
+
+        self.style_version += 1
+        payload = dict(changed, version=self.style_version)
+        self.dll.update_style_config(json.dumps(payload, ensure_ascii=False).encode('utf-8'))
+        self._style_sent.update(copy.deepcopy(changed))
+
+        # 预览中的文字组件以这些字段为默认值，C++端会丢弃静态图层缓存
+        if not _LAYER_STYLE_KEYS.isdisjoint(changed):
+            self.layer_cache = False
+        print(f"样式配置已更新: {', '.join(sorted(changed))}")
+        return set(changed)
+
     def clear_cache(self, cache_type: str = "all"):
         """清理缓存 - 替换原来的clear_cache"""
         cache_type_bytes = cache_type.encode('utf-8')
@@ -166,6 +317,38 @@ class ImageLoaderDLL:
             self.layer_cache = False
         print(f"DLL缓存已清理: {cache_type}")
     
+    def invalidate_asset(self, relative_path: str):
+        """素材文件变化后丢弃依赖它的缓存，路径相对素材目录"""
+        relative_path = relative_path.replace("\\", "/")
+        if hasattr(self.dll, 'invalidate_asset'):
+            self.dll.invalidate_asset(relative_path.encode('utf-8'))
+        else:
+            # 旧版DLL只能整体丢弃静态图层
+            self.dll.clear_cache(b"layers")
+        # emoji 不进入静态图层
+        if not relative_path.startswith("emoji/"):
+            self.layer_cache = False
+    
+    def warmup_renderer(self) -> bool:
+        """初始化SDL和渲染器"""
+        return bool(self.dll.warmup_renderer())
+
+    def preload_component(self, component) -> int:
+        """打开组件用到的字体、解码组件图片，返回预热的资源数，失败时为 -1"""
+        if isinstance(component, ComponentView):
+            component_json = component.to_json()
+        else:
+            component_json = json.dumps(component, ensure_ascii=False)
+        return self.dll.preload_component(component_json.encode('utf-8'))
+
+    def preload_font(self, font_name: str, font_size: int) -> bool:
+        """按样式字号（未乘渲染缩放）打开字体"""
+        return bool(self.dll.preload_font(font_name.encode('utf-8'), int(font_size)))
+
+    def preload_emoji(self, emoji_text: str) -> bool:
+        """解码emoji图片"""
+        return bool(self.dll.preload_emoji(emoji_text.encode('utf-8')))
+
     def _pil_to_rgba_bytes(self, img: Image.Image) -> tuple[bytes, int, int]:
         """返回 RGBA 字节流、宽、高"""
         if img.mode != "RGBA":
@@ -180,7 +363,7 @@ class ImageLoaderDLL:
     ) -> Optional[Image.Image]:
         """生成完整的图像，使用JSON传递组件配置"""
         # 1. 序列化 JSON
-        components_json = json.dumps(components, ensure_ascii=False).encode('utf-8')
+        components_json = components_to_json(components)
         
         # 2. 调用 DLL
         out_data = POINTER(c_ubyte)()
@@ -311,6 +494,10 @@ class ImageLoaderDLL:
 # 辅助函数：提取emoji并替换为占位符
 def _extract_emojis_and_replace(src: str):
     """提取emoji并获取字节位置"""
+    if src.isascii():
+        # 纯 ASCII 文本不可能包含 emoji，也不必加载 emoji 库
+        return [], []
+    import emoji
     emoji_infos = emoji.emoji_list(src)
     if not emoji_infos:
         return [], []
@@ -335,9 +522,16 @@ def _extract_emojis_and_replace(src: str):
 
 def draw_content_auto(
     text: Optional[str] = None, 
-    content_image: Optional[Image.Image] = None
-) -> bytes:
-    """简化的绘制函数，只处理emoji提取，其他交给C++"""
+    content_image=None,
+    encoder: Optional[Dict[str, Any]] = None,
+    with_dib: bool = False
+) -> EncodedImage:
+    """
+    简化的绘制函数，只处理emoji提取，其他交给C++
+    content_image: PIL 图片，或 (高, 宽, 4) 的 RGBA uint8 数组（如剪贴板 DIB 直接解码的结果）
+    encoder: 输出编码设置（见 utils.image_encoder），默认输出不含文件头的BMP（DIB）
+    with_dib: 编码为其他格式时额外附带DIB（Windows 剪贴板同时提供 CF_DIB）
+    """
     st = time.time()
     
     # 提取emoji
@@ -355,12 +549,20 @@ def draw_content_auto(
     image_height = 0
     image_pitch = 0
     
-    if content_image:
+    image_ref = None
+    
+    if isinstance(content_image, Image.Image):
         # 将图片转换为RGBA格式
         img_rgba = content_image.convert("RGBA")
         image_data = img_rgba.tobytes()
         image_width, image_height = img_rgba.size
         image_pitch = image_width * 4
+    elif content_image is not None:
+        # RGBA 数组：连续时直接把缓冲区地址交给C++，不再复制
+        image_height, image_width = content_image.shape[:2]
+        image_pitch = image_width * 4
+        address, image_ref = _buffer_address(content_image)
+        image_data = c_void_p(address)
     
     # 调用C++端的简化函数
     try:
@@ -380,15 +582,16 @@ def draw_content_auto(
         
         if not result_image:
             raise Exception("C++ drawing failed")
+
+        if emoji_list:
+            from path_utils import get_emoji_usage
+            get_emoji_usage().record(emoji_list)
         
-        # 转换为BMP格式
-        buf = BytesIO()
-        img_rgb = result_image.convert("RGB")
-        img_rgb.save(buf, format="BMP")
-        bmp_data = buf.getvalue()[14:]
+        # 按编码设置输出
+        encoded = encode_image(result_image, encoder, with_dib=with_dib)
         
-        print(f"输出耗时: {int((time.time()-st)*1000)}ms")
-        return bmp_data
+        print(f"输出耗时({encoded.format}, {len(encoded.data) // 1024}KB): {int((time.time()-st)*1000)}ms")
+        return encoded
         
     except Exception as e:
         print(f"绘制失败: {str(e)}")
@@ -423,6 +626,11 @@ def clear_cache(cache_type: str = "all"):
     loader = get_enhanced_loader()
     loader.clear_cache(cache_type)
 
+def invalidate_asset(relative_path: str):
+    """素材文件变化后精确清理DLL缓存"""
+    loader = get_enhanced_loader()
+    loader.invalidate_asset(relative_path)
+
 def set_dll_global_config(assets_path: str, **kwargs):
     """设置DLL全局配置"""
     loader = get_enhanced_loader()
@@ -434,7 +642,7 @@ def update_dll_gui_settings(settings: Dict[str, Any]):
     loader.update_gui_settings(settings)
 
 def update_style_config(style_config):
-    """更新C++端的样式配置"""
+    """更新C++端的样式配置（只推送变化的字段）"""
     loader = get_enhanced_loader()
     
     # 构建样式配置字典
@@ -466,14 +674,4 @@ def update_style_config(style_config):
         "use_character_color": getattr(style_config, 'use_character_color', True)
     }
     
-    # 将配置转换为JSON字符串
-    style_json = json.dumps(style_dict, ensure_ascii=False).encode('utf-8')
-    
-    # 调用C++端的更新函数
-    if hasattr(loader.dll, 'update_style_config'):
-        loader.dll.update_style_config.argtypes = [c_char_p]
-        loader.dll.update_style_config.restype = None
-        loader.dll.update_style_config(style_json)
-        print(f"Style configuration updated")
-    else:
-        print(f"Warning: update_style_config function not found in DLL")
\ No newline at end of file
+    loader.update_style_config(style_dict)
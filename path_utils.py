@@ -2,6 +2,7 @@
 
 import os
 import sys
+import threading
 
 def get_base_path():
     """获取程序的基础路径，支持打包环境和开发环境"""
@@ -55,62 +56,59 @@ def ensure_path_exists(file_path):
         os.makedirs(directory, exist_ok=True)
     return file_path
 
+_IMAGE_EXTENSIONS = ('.webp', '.png', '.jpg', '.jpeg', '.bmp', '.gif')
+_FONT_EXTENSIONS = ('.ttf', '.otf', '.ttc', '.woff', '.woff2')
+
+_asset_catalog = None
+_asset_catalog_lock = threading.Lock()
+
+
+def get_asset_catalog():
+    """素材目录（首次调用时在后台完整扫描，哈希和尺寸按需计算）"""
+    global _asset_catalog
+    with _asset_catalog_lock:
+        if _asset_catalog is None:
+            from utils.asset_catalog import AssetCatalog
+            _asset_catalog = AssetCatalog(
+                get_resource_path("assets"),
+                os.path.join(get_base_path(), "config", ".asset_catalog.pickle"),
+            )
+            _asset_catalog.scan_async()
+        return _asset_catalog
+
+
+_emoji_usage = None
+
+
+def get_emoji_usage():
+    """emoji使用次数记录（启动预热挑选常用emoji）"""
+    global _emoji_usage
+    with _asset_catalog_lock:
+        if _emoji_usage is None:
+            from utils.warmup import EmojiUsage
+            _emoji_usage = EmojiUsage(os.path.join(get_base_path(), "config", ".emoji_usage.json"))
+        return _emoji_usage
+
+
+def _list_assets(kind: str, extensions, label: str) -> list:
+    """从素材目录读取某类素材的文件名列表"""
+    catalog = get_asset_catalog()
+    names = catalog.names(kind, extensions)
+    if not names:
+        print(f"警告：{label}目录不存在或为空: {os.path.join(catalog.root, kind)}")
+    return names
+
+
 def get_available_fonts() -> list:
     """获取可用字体列表，只返回文件名（不含扩展名）"""
-    fonts_dir = get_resource_path(os.path.join("assets", "fonts"))
-    font_files = []
-    
-    if not fonts_dir:
-        print(f"字体目录不存在: {fonts_dir}")
-        return []
-    
-    supported_formats = ('.ttf', '.otf', '.ttc', '.woff', '.woff2')
-    
-    for file in os.listdir(fonts_dir):
-        if file.lower().endswith(supported_formats):
-            # 只返回文件名（不含扩展名）
-            font_name = os.path.splitext(file)[0]
-            font_files.append(font_name)
-    
-    return sorted(set(font_files))
+    fonts = _list_assets("fonts", _FONT_EXTENSIONS, "字体")
+    return sorted({os.path.splitext(font)[0] for font in fonts})
 
 
 def get_background_list() -> list:
     """获取背景文件列表"""
-    try:
-        background_dir = get_resource_path(os.path.join("assets", "background"))
-        if background_dir:
-            # 获取所有图片文件
-            image_extensions = ['.webp', '.png', '.jpg', '.jpeg', '.bmp', '.gif']
-            bg_files = []
-            for f in os.listdir(background_dir):
-                # 检查是否为图片文件
-                if any(f.lower().endswith(ext) for ext in image_extensions):
-                    bg_files.append(f)
-            return sorted(bg_files)
-        else:
-            print(f"警告：背景图片目录不存在: {background_dir}")
-            return []
-    except Exception as e:
-        print(f"获取背景文件列表失败: {e}")
-        return []
+    return _list_assets("background", _IMAGE_EXTENSIONS, "背景图片")
 
 def get_shader_list() -> list:
     """获取shader文件列表"""
-    try:
-        shader_dir = get_resource_path(os.path.join("assets", "shader"))
-        if shader_dir and os.path.exists(shader_dir):
-            # 获取所有图片文件
-            image_extensions = ['.webp', '.png', '.jpg', '.jpeg', '.bmp', '.gif']
-            shader_files = []
-            for f in os.listdir(shader_dir):
-                # 检查是否为图片文件
-                if any(f.lower().endswith(ext) for ext in image_extensions):
-                    shader_files.append(f)
-            return sorted(shader_files)
-        else:
-            print(f"警告：shader图片目录不存在: {shader_dir}")
-            return []
-    except Exception as e:
-        print(f"获取shader文件列表失败: {e}")
-        return []
\ No newline at end of file
+    return _list_assets("shader", _IMAGE_EXTENSIONS, "shader图片")
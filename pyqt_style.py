@@ -1104,6 +1104,7 @@ class StyleWindow(QDialog):
             current_style_name = self.ui.comboBox_style.currentText()
             default_components = CONFIGS.style.default_config.get(current_style_name, {}).get("image_components", [])
             CONFIGS.style_configs[current_style_name]["image_components"] = default_components
+            CONFIGS.mark_style_changed()
             if default_components:
                 self.init_component_editors()
                 clear_cache()
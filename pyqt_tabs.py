@@ -5,7 +5,6 @@ from PySide6.QtWidgets import QWidget
 from PySide6.QtCore import Signal
 from ui.components import Ui_CharaCfg
 from config import CONFIGS
-from utils.psd_utils import get_pose_options, get_clothing_options, get_action_options, get_expression_options
 
 class BackgroundTabWidget(QWidget):
     """背景标签页组件 - 使用UI设计器中的布局"""
@@ -218,6 +217,7 @@ class CharacterTabWidget(QWidget):
         config = self._component_config
 
         # 姿态
+        from utils.psd_utils import get_pose_options  # 用到PSD角色时才加载 psd_tools
         poses = get_pose_options(self.current_character_id)
         self.ui.combo_poise_select.clear()
         self.ui.combo_poise_select.addItems(poses)
@@ -258,6 +258,7 @@ class CharacterTabWidget(QWidget):
             return
         
         # 使用新的函数获取服装选项
+        from utils.psd_utils import get_clothing_options, get_action_options
         clothes = get_clothing_options(self.current_character_id, pose)
         
         # 获取当前服装（用于后续获取动作）
@@ -335,6 +336,7 @@ class CharacterTabWidget(QWidget):
             clothing = self.ui.combo_clothes_select.currentText()
             if pose and pose in psd_info["poses"]:
                 # 使用新的函数获取表情选项
+                from utils.psd_utils import get_expression_options
                 filters, emo_list = get_expression_options(
                     self.current_character_id, pose, clothing
                 )
@@ -378,6 +380,7 @@ class CharacterTabWidget(QWidget):
                 
                 if pose and pose in psd_info["poses"]:
                     # 使用新的函数获取表情选项
+                    from utils.psd_utils import get_expression_options
                     filters, emo_list = get_expression_options(
                         self.current_character_id, pose, clothing
                     )
@@ -549,6 +552,7 @@ class CharacterTabWidget(QWidget):
             clothing = self.ui.combo_clothes_select.currentText()
             
             # 更新动作
+            from utils.psd_utils import get_action_options
             actions = get_action_options(self.current_character_id, pose, clothing)
             self.ui.combo_action_select.blockSignals(True)
             self.ui.combo_action_select.clear()
@@ -661,6 +665,7 @@ class CharacterTabWidget(QWidget):
             for component in CONFIGS.style_configs[CONFIGS.current_style]['image_components']:
                 if component.get("layer") == self.layer_index:
                     component["character_name"] = char_id
+            CONFIGS.mark_style_changed()
             
             self._ignore_signals = True
             self._reload_ui()
@@ -0,0 +1,318 @@
+"""
+asset_catalog.py
+素材目录：记录每个素材的路径、格式、尺寸、字节数、mtime 和内容哈希。
+
+完整扫描在后台线程进行（只 stat，mtime/大小没变的条目沿用上次保存的结果），
+扫描完成前查询某类素材时只列出那一个目录；之后按文件变化增量刷新。
+内容哈希和图片尺寸需要读文件，由同一个后台线程逐个补全（前台渲染时让出），
+只有新增或变化的文件需要计算；get() 遇到尚未补全的条目时同步计算。
+"""
+
+import hashlib
+import os
+import pickle
+import threading
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set
+
+from PIL import Image
+
+from utils.render_gate import background_step
+
+# 目录文件格式版本，结构变化时递增使旧文件失效
+_CATALOG_VERSION = 1
+# 可以读取尺寸的格式
+_IMAGE_FORMATS = frozenset({"png", "webp", "jpg", "jpeg", "bmp", "gif", "psd"})
+# 后台补全时每补全多少个条目保存一次
+_SAVE_EVERY = 200
+
+
+class AssetEntry(NamedTuple):
+    """单个素材文件"""
+    path: str           # 相对素材目录，以 / 分隔
+    format: str         # 小写扩展名，不含点
+    size: int
+    mtime_ns: int
+    width: int = 0
+    height: int = 0
+    content_hash: str = ""  # 为空表示尚未计算
+
+    @property
+    def kind(self) -> str:
+        """素材类别，即第一级目录名（background / chara / emoji / fonts / shader）"""
+        return self.path.split("/", 1)[0] if "/" in self.path else ""
+
+    @property
+    def name(self) -> str:
+        return self.path.rsplit("/", 1)[-1]
+
+    @property
+    def stem(self) -> str:
+        return os.path.splitext(self.name)[0]
+
+    @property
+    def has_metadata(self) -> bool:
+        return bool(self.content_hash)
+
+
+def _describe(abs_path: str, entry: AssetEntry) -> AssetEntry:
+    """读取文件内容计算哈希，图片格式再读取文件头得到尺寸"""
+    with open(abs_path, "rb") as f:
+        digest = hashlib.file_digest(f, "sha1").hexdigest()
+    width = height = 0
+    if entry.format in _IMAGE_FORMATS:
+        try:
+            with Image.open(abs_path) as img:
+                width, height = img.size
+        except Exception:
+            pass
+    return entry._replace(width=width, height=height, content_hash=digest)
+
+
+class AssetCatalog:
+    """素材目录，线程安全"""
+
+    def __init__(self, root: str, cache_path: Optional[str] = None):
+        self.root = os.path.abspath(root) if root else ""
+        self.cache_path = cache_path
+        self._entries: Dict[str, AssetEntry] = {}
+        # 上次保存的条目，首次需要时读取；None 表示尚未读取
+        self._saved: Optional[Dict[str, AssetEntry]] = None
+        # 完整扫描前已单独列出过的目录
+        self._listed_kinds: Set[str] = set()
+        self._scanned = False
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._scan_thread: Optional[threading.Thread] = None
+        # 后台补全不会被取消，只在前台渲染时让出
+        self._never_cancel = threading.Event()
+
+    def _abs(self, relative_path: str) -> str:
+        return os.path.join(self.root, *relative_path.split("/"))
+
+    def _stat_entry(self, relative_path: str, st=None) -> Optional[AssetEntry]:
+        """按当前文件状态生成条目；mtime/大小没变时沿用已有或上次保存的条目（保留哈希和尺寸）"""
+        if st is None:
+            try:
+                st = os.stat(self._abs(relative_path))
+            except OSError:
+                return None
+        for known in (self._entries, self._saved_entries()):
+            old = known.get(relative_path)
+            if old is not None and old.mtime_ns == st.st_mtime_ns and old.size == st.st_size:
+                return old
+        fmt = os.path.splitext(relative_path)[1].lower().lstrip(".")
+        return AssetEntry(relative_path, fmt, st.st_size, st.st_mtime_ns)
+
+    def _saved_entries(self) -> Dict[str, AssetEntry]:
+        if self._saved is None:
+            self._saved = self._load_cache()
+        return self._saved
+
+    def _load_cache(self) -> Dict[str, AssetEntry]:
+        """读取上次保存的目录，格式或根目录不对时忽略"""
+        if not self.cache_path:
+            return {}
+        try:
+            with open(self.cache_path, "rb") as f:
+                data = pickle.load(f)
+            if data.get("version") == _CATALOG_VERSION and data.get("root") == self.root:
+                return {path: AssetEntry(*fields) for path, fields in data["entries"].items()}
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"素材目录缓存读取失败，将重新扫描: {e}")
+        return {}
+
+    def scan(self) -> Set[str]:
+        """完整扫描素材目录，返回新增、删除或变化的路径"""
+        if not self.root or not os.path.isdir(self.root):
+            return set()
+        with self._lock:
+            self._saved_entries()
+        # 遍历目录时不持锁，列表查询不用等扫描
+        found = {}
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [d for d in dirnames if not d.startswith(".")]
+            rel_dir = os.path.relpath(dirpath, self.root).replace(os.sep, "/")
+            for filename in filenames:
+                if filename.startswith("."):
+                    continue
+                relative_path = filename if rel_dir == "." else f"{rel_dir}/{filename}"
+                entry = self._stat_entry(relative_path)
+                if entry is not None:
+                    found[relative_path] = entry
+        with self._lock:
+            # 和上次保存的目录比较，得到离线期间的变化
+            previous = self._saved_entries() if not self._scanned else self._entries
+            changed = {path for path in found.keys() | previous.keys()
+                       if found.get(path) != previous.get(path)}
+            # 扫描期间按需算出的哈希和尺寸保留下来
+            for path, entry in found.items():
+                current = self._entries.get(path)
+                if (current is not None and current.has_metadata
+                        and current.mtime_ns == entry.mtime_ns and current.size == entry.size):
+                    found[path] = current
+            self._entries = found
+            self._saved = {}
+            self._scanned = True
+            self._dirty |= bool(changed)
+            return changed
+
+    def scan_async(self):
+        """在后台线程完整扫描、保存目录，再补全哈希和尺寸"""
+        if self._scan_thread is not None and self._scan_thread.is_alive():
+            return
+        self._scan_thread = threading.Thread(target=self._scan_and_save, name="asset-catalog", daemon=True)
+        self._scan_thread.start()
+
+    def _scan_and_save(self):
+        try:
+            self.scan()
+            self.save()
+            self.fill_metadata()
+        except Exception as e:
+            print(f"素材目录扫描失败: {e}")
+
+    def fill_metadata(self) -> int:
+        """
+        逐个补全缺少哈希/尺寸的条目并定期保存，返回补全的个数
+        每个文件作为一步后台任务执行，前台渲染时让出；补全期间刷新的条目也会被补全
+        """
+        filled = 0
+        # 读取失败的条目不再重试，直到文件再次变化（条目随之更新）
+        attempted: Set[AssetEntry] = set()
+        while True:
+            with self._lock:
+                pending = [entry for entry in self._entries.values()
+                           if not entry.has_metadata and entry not in attempted]
+            if not pending:
+                break
+            for entry in pending:
+                attempted.add(entry)
+                with background_step(self._never_cancel):
+                    described = self._fill(entry)
+                if described.has_metadata:
+                    filled += 1
+                    if filled % _SAVE_EVERY == 0:
+                        self.save()
+        self.save()
+        return filled
+
+    def _list_kind(self, kind: str):
+        """完整扫描完成前只列出一个目录（需持有锁）"""
+        if self._scanned or kind in self._listed_kinds:
+            return
+        self._listed_kinds.add(kind)
+        try:
+            with os.scandir(self._abs(kind)) as it:
+                for item in it:
+                    if item.name.startswith(".") or not item.is_file():
+                        continue
+                    relative_path = f"{kind}/{item.name}"
+                    entry = self._stat_entry(relative_path, item.stat())
+                    if entry is not None:
+                        self._entries[relative_path] = entry
+        except OSError:
+            pass
+
+    def refresh(self, relative_paths: Iterable[str]) -> Set[str]:
+        """只重新检查指定的文件（相对路径），返回实际变化的路径"""
+        changed = set()
+        with self._lock:
+            for relative_path in relative_paths:
+                relative_path = relative_path.replace("\\", "/")
+                entry = self._stat_entry(relative_path)
+                if entry is self._entries.get(relative_path):
+                    continue
+                if entry is None:
+                    self._entries.pop(relative_path, None)
+                else:
+                    self._entries[relative_path] = entry
+                changed.add(relative_path)
+            self._dirty |= bool(changed)
+        return changed
+
+    def entries(self, kind: str, extensions: Optional[Iterable[str]] = None) -> List[AssetEntry]:
+        """某个目录下（不含子目录）的素材，按文件名排序；extensions 如 ('.png', '.webp')"""
+        formats = {ext.lower().lstrip(".") for ext in extensions} if extensions else None
+        prefix = f"{kind}/"
+        with self._lock:
+            self._list_kind(kind)
+            result = [
+                entry for path, entry in self._entries.items()
+                if path.startswith(prefix) and "/" not in path[len(prefix):]
+                and (formats is None or entry.format in formats)
+            ]
+        return sorted(result, key=lambda entry: entry.name)
+
+    def names(self, kind: str, extensions: Optional[Iterable[str]] = None) -> List[str]:
+        """某个目录下的素材文件名列表（排序）"""
+        return [entry.name for entry in self.entries(kind, extensions)]
+
+    def find(self, base_path: str, extensions: Iterable[str]) -> Optional[AssetEntry]:
+        """按扩展名优先级查找 base_path（相对路径，不含扩展名）对应的素材"""
+        with self._lock:
+            self._list_kind(base_path.split("/", 1)[0])
+            for ext in extensions:
+                entry = self._entries.get(base_path + ext)
+                if entry is not None:
+                    return entry
+        return None
+
+    def get(self, relative_path: str) -> Optional[AssetEntry]:
+        """获取条目，哈希和尺寸尚未计算时同步计算"""
+        with self._lock:
+            entry = self._entries.get(relative_path)
+            if entry is None and not self._scanned:
+                entry = self._stat_entry(relative_path)
+                if entry is not None:
+                    self._entries[relative_path] = entry
+        if entry is None or entry.has_metadata:
+            return entry
+        return self._fill(entry)
+
+    def content_hash(self, relative_path: str) -> Optional[str]:
+        """素材内容的 sha1，可作为与路径无关的稳定缓存键"""
+        entry = self.get(relative_path)
+        return entry.content_hash if entry else None
+
+    def _fill(self, entry: AssetEntry) -> AssetEntry:
+        try:
+            described = _describe(self._abs(entry.path), entry)
+        except OSError:
+            return entry
+        with self._lock:
+            # 计算期间文件又变了就丢弃结果
+            if self._entries.get(entry.path) == entry:
+                self._entries[entry.path] = described
+                self._dirty = True
+        return described
+
+    def save(self) -> bool:
+        """有变化时原子地写回目录文件"""
+        if not self.cache_path:
+            return False
+        with self._lock:
+            if not self._dirty:
+                return False
+            data = {
+                "version": _CATALOG_VERSION,
+                "root": self.root,
+                "entries": {path: tuple(entry) for path, entry in self._entries.items()},
+            }
+            self._dirty = False
+        tmp_path = f"{self.cache_path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.cache_path)
+            return True
+        except OSError as e:
+            print(f"素材目录保存失败: {e}")
+            with self._lock:
+                self._dirty = True
+            return False
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -1,20 +1,30 @@
 """剪贴板工具模块"""
 
+import atexit
+import ctypes
+import ctypes.util
 import io
 import os
 import tempfile
 import subprocess
 import re
+import select
+import shlex
+import shutil
+import threading
+import time
 from sys import platform
 import base64
+import binascii
+from html.parser import HTMLParser
+from typing import Callable, Dict, List, Optional, Tuple, Union
 
-from urllib.parse import urlparse, unquote
+from urllib.parse import urlparse, unquote, unquote_to_bytes
 from urllib.request import url2pathname
 
 from PIL import Image
 
-from bs4 import BeautifulSoup
-
+from utils.image_encoder import EncodedImage, to_dib
 
 PLATFORM = platform.lower()
 
@@ -26,14 +36,568 @@ if PLATFORM.startswith("win"):
         raise
 
 
+# HTML 剪贴板最多扫描的字节数（不含 data URI 的 base64 数据本身）
+_HTML_BYTE_BUDGET = 4 * 1024 * 1024
+# base64 数据的结束位置：第一个不属于 base64 字符集的字节
+_BASE64_END = re.compile(rb"[^A-Za-z0-9+/=\s]")
+
+
+class _HTMLFragmentParser(HTMLParser):
+    """一遍扫描：记录第一个 <img> 的 src，同时收集可见文本"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self.img_src: Optional[str] = None
+        # 已跳过的 base64 数据个数，以及第一个 <img> 对应的是第几个
+        self.payload_count = 0
+        self.img_payload: Optional[int] = None
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ("script", "style"):
+            self._skip_depth += 1
+        elif tag == "img" and self.img_src is None:
+            self.img_src = dict(attrs).get("src") or None
+            if self.img_src and self.img_src.endswith("base64,") and self.payload_count:
+                self.img_payload = self.payload_count - 1
+
+    def handle_endtag(self, tag):
+        if tag in ("script", "style") and self._skip_depth:
+            self._skip_depth -= 1
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self.parts.append(data)
+
+
+def _extract_html(raw: bytes, budget: int = _HTML_BYTE_BUDGET) -> Tuple[str, Optional[str], Optional[memoryview]]:
+    """
+    流式解析 HTML 剪贴板，返回 (文本, 第一个图片的src, 第一个base64数据的视图)
+    优先只解析 StartFragment-EndFragment 之间的内容；
+    base64 数据不交给解析器，只记录它在原始字节中的位置，解码时直接用切片视图
+    """
+    start = raw.find(b"<!--StartFragment-->")
+    end = raw.find(b"<!--EndFragment-->", max(start, 0))
+    if start >= 0 and end > start:
+        start += len(b"<!--StartFragment-->")
+    else:
+        start, end = 0, len(raw)
+
+    parser = _HTMLFragmentParser()
+    payloads: List[memoryview] = []
+    view = memoryview(raw)
+    scanned = 0
+    pos = start
+    while pos < end and scanned < budget:
+        i = raw.find(b"base64,", pos, end)
+        stop = end if i < 0 else i + len(b"base64,")
+        stop = min(stop, pos + budget - scanned)
+        parser.feed(raw[pos:stop].decode("utf-8", errors="ignore"))
+        scanned += stop - pos
+        pos = stop
+        if i < 0 or pos != i + len(b"base64,"):
+            continue
+        # 跳过 base64 数据，只记录它在原始字节中的位置
+        match = _BASE64_END.search(raw, pos, end)
+        data_end = match.start() if match else end
+        if parser.img_src is None:
+            payloads.append(view[pos:data_end])
+        parser.payload_count += 1
+        pos = data_end
+    parser.close()
+
+    text = re.sub(r"\s+", " ", "".join(parser.parts)).strip()
+    payload = payloads[parser.img_payload] if parser.img_payload is not None else None
+    return text, parser.img_src, payload
+
+
+def _dib_to_image(dib: bytes) -> Image.Image:
+    """CF_DIB 数据（不含BMP文件头）转为 PIL 图片"""
+    from utils.dib_utils import dib_to_rgba  # 依赖 numpy，剪贴板里有图片时才加载
+    return Image.fromarray(dib_to_rgba(dib), "RGBA")
+
+
+# 编码后图片在各平台剪贴板上的格式
+_WINDOWS_IMAGE_FORMATS = {"png": "PNG", "jpeg": "JFIF", "webp": "image/webp"}
+_MACOS_IMAGE_CLASSES = {"png": "PNGf", "jpeg": "JPEG"}
+
+
+# Linux 剪贴板命令，可通过 LinuxClipboardBackend(commands=...) 替换（测试时可换成假命令）
+LINUX_CLIPBOARD_COMMANDS: Dict[str, Dict[str, List[str]]] = {
+    "wayland": {
+        "copy_image": ["wl-copy", "--type", "image/png"],
+        "list_types": ["wl-paste", "--list-types"],
+        "paste_image": ["wl-paste", "--no-newline", "--type", "image/png"],
+        "paste_text": ["wl-paste", "--no-newline", "--type", "text"],
+        "paste_html": ["wl-paste", "--no-newline", "--type", "text/html"],
+        "clear": ["wl-copy", "--clear"],
+    },
+    "x11": {
+        "copy_image": ["xclip", "-selection", "clipboard", "-t", "image/png", "-i"],
+        "list_types": ["xclip", "-selection", "clipboard", "-t", "TARGETS", "-o"],
+        # 剪贴板所有者取得选择的时间戳，所有者变化时改变
+        "timestamp": ["xclip", "-selection", "clipboard", "-t", "TIMESTAMP", "-o"],
+        "paste_image": ["xclip", "-selection", "clipboard", "-t", "image/png", "-o"],
+        "paste_text": ["xclip", "-selection", "clipboard", "-t", "UTF8_STRING", "-o"],
+        "paste_html": ["xclip", "-selection", "clipboard", "-t", "text/html", "-o"],
+        "clear": ["xclip", "-selection", "clipboard", "-i", "/dev/null"],
+    },
+}
+
+
+def _detect_linux_commands() -> Optional[Dict[str, List[str]]]:
+    """根据会话类型选择 wl-clipboard 或 xclip"""
+    if os.environ.get("WAYLAND_DISPLAY") and shutil.which("wl-paste") and shutil.which("wl-copy"):
+        return LINUX_CLIPBOARD_COMMANDS["wayland"]
+    if os.environ.get("DISPLAY") and shutil.which("xclip"):
+        return LINUX_CLIPBOARD_COMMANDS["x11"]
+    return None
+
+
+class _ShellHelper:
+    """
+    常驻的 sh 进程，读剪贴板时把整段脚本写进它的标准输入执行，一次往返完成多个命令
+    粘贴命令本身仍由 sh 启动，省掉的只是 Python 端的 Popen 和多次管道往返
+    """
+
+    END_MARK = "__CLIPBOARD_END__"
+
+    def __init__(self, shell: str = "sh"):
+        self.shell = shell
+        self._proc: Optional[subprocess.Popen] = None
+        self._lock = threading.Lock()
+
+    def _ensure(self) -> subprocess.Popen:
+        if self._proc is None or self._proc.poll() is not None:
+            self._proc = subprocess.Popen(
+                [self.shell], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL, bufsize=0,
+            )
+        return self._proc
+
+    def close(self):
+        if self._proc is not None:
+            try:
+                self._proc.kill()
+                self._proc.wait(timeout=1)
+            except Exception:
+                pass
+            self._proc = None
+
+    def run(self, script: str, timeout: float = 2.0) -> List[str]:
+        """执行脚本，返回输出的各行；超时或进程退出时重启助手并抛出异常"""
+        with self._lock:
+            proc = self._ensure()
+            end = f"\n{self.END_MARK}\n".encode()
+            try:
+                proc.stdin.write(f"{script}\necho; echo {self.END_MARK}\n".encode())
+                proc.stdin.flush()
+
+                fd = proc.stdout.fileno()
+                deadline = time.monotonic() + timeout
+                buf = bytearray()
+                while not buf.endswith(end):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or not select.select([fd], [], [], remaining)[0]:
+                        raise TimeoutError("剪贴板助手进程超时")
+                    chunk = os.read(fd, 65536)
+                    if not chunk:
+                        raise RuntimeError("剪贴板助手进程已退出")
+                    buf += chunk
+            except Exception:
+                self.close()
+                raise
+        return buf[:-len(end)].decode("utf-8", errors="ignore").split("\n")
+
+
+class LinuxClipboardBackend:
+    """基于 wl-clipboard / xclip 的 Linux 剪贴板"""
+
+    def __init__(self, commands: Optional[Dict[str, List[str]]] = None, shell: str = "sh"):
+        self.commands = commands if commands is not None else _detect_linux_commands()
+        self._helper = _ShellHelper(shell)
+
+    @property
+    def available(self) -> bool:
+        return self.commands is not None
+
+    def _cmd(self, name: str) -> str:
+        return " ".join(shlex.quote(arg) for arg in self.commands[name])
+
+    def copy_png(self, image: Image.Image) -> bool:
+        """把图片编码为PNG直接写入复制命令的标准输入"""
+        # 复制命令需要自己持有剪贴板（wl-copy/xclip 会转入后台），不能交给助手进程执行
+        proc = subprocess.Popen(
+            self.commands["copy_image"], stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            # 剪贴板数据马上就会被读取，压缩率不重要，用最快的 zlib 等级
+            image.save(proc.stdin, format="PNG", compress_level=1)
+        finally:
+            proc.stdin.close()
+        return proc.wait(timeout=5) == 0
+
+    def copy_bytes(self, data: bytes, mime: str) -> bool:
+        """把已编码的图片以指定 MIME 类型写入剪贴板"""
+        command = [mime if arg == "image/png" else arg for arg in self.commands["copy_image"]]
+        proc = subprocess.Popen(
+            command, stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            proc.stdin.write(data)
+        finally:
+            proc.stdin.close()
+        return proc.wait(timeout=5) == 0
+
+    def list_types(self) -> List[str]:
+        lines = self._helper.run(f"{self._cmd('list_types')} 2>/dev/null")
+        return [line.strip() for line in lines if line.strip()]
+
+    def signature(self) -> str:
+        """剪贴板变化的廉价签名：类型列表（以及 X11 的所有者时间戳），不读取内容"""
+        script = f"{self._cmd('list_types')} 2>/dev/null | tr '\\n' ' '"
+        if "timestamp" in self.commands:
+            # 时间戳是二进制整数，转成十六进制文本
+            script += f"; echo; {self._cmd('timestamp')} 2>/dev/null | od -An -tx1"
+        return " ".join(self._helper.run(script)).strip()
+
+    def read_all(self) -> tuple:
+        """
+        一次往返读取类型列表，再按列表只读取实际存在的图片、文本和HTML
+        返回 (类型列表, PNG字节或None, 文本, HTML或None)
+        """
+        def fetch(pattern: str, name: str) -> str:
+            # 类型判断在 sh 内完成，不存在的类型不会启动粘贴命令
+            return f'case "$types" in {pattern}) {self._cmd(name)} 2>/dev/null | base64 -w 0;; esac; echo'
+
+        script = "\n".join([
+            f"types=$({self._cmd('list_types')} 2>/dev/null); printf '%s ' $types; echo",
+            fetch("*image/png*", "paste_image"),
+            fetch("*STRING*|*TEXT*|*text/plain*", "paste_text"),
+            fetch("*text/html*", "paste_html"),
+        ])
+        lines = self._helper.run(script)
+        lines += [""] * (4 - len(lines))
+        types = lines[0].split()
+        png = base64.b64decode(lines[1]) if lines[1] else None
+        text = base64.b64decode(lines[2]).decode("utf-8", errors="ignore") if lines[2] else ""
+        html = base64.b64decode(lines[3]).decode("utf-8", errors="ignore") if lines[3] else None
+        return types, png, text, html
+
+    def clear(self):
+        self._helper.run(f"{self._cmd('clear')} 2>/dev/null")
+
+    def close(self):
+        self._helper.close()
+
+
+# ---------- 剪贴板变化检测 ----------
+class ClipboardWatcher:
+    """
+    按序列号检测剪贴板变化，序列号变化后才去读取和解码内容
+    子类实现 sequence()；事件驱动的子类在收到事件时调用 _notify() 唤醒等待者
+    """
+
+    # 两次检查序列号的最长间隔，事件驱动的子类可以设得很大
+    poll_interval = 0.001
+
+    def __init__(self):
+        self._cond = threading.Condition()
+
+    def sequence(self) -> int:
+        raise NotImplementedError
+
+    def wait_for_change(self, since: int, timeout: float) -> bool:
+        """等待序列号不同于 since，超时返回 False"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self.sequence() == since:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(min(remaining, self.poll_interval))
+        return True
+
+    def _notify(self):
+        with self._cond:
+            self._cond.notify_all()
+
+    def close(self):
+        pass
+
+
+class _SequenceNumberWatcher(ClipboardWatcher):
+    """系统直接提供序列号（Windows GetClipboardSequenceNumber / macOS changeCount），读取代价极小"""
+
+    def __init__(self, read_sequence: Callable[[], int], poll_interval: Optional[float] = None):
+        super().__init__()
+        self._read_sequence = read_sequence
+        if poll_interval is not None:
+            self.poll_interval = poll_interval
+
+    def sequence(self) -> int:
+        return int(self._read_sequence())
+
+
+class _ClipboardListenerWatcher(_SequenceNumberWatcher):
+    """
+    Windows：仅消息窗口注册 AddClipboardFormatListener，收到 WM_CLIPBOARDUPDATE 时唤醒等待者
+    序列号仍取 GetClipboardSequenceNumber，轮询只作兜底
+    """
+
+    poll_interval = 0.5
+    _WM_CLIPBOARDUPDATE = 0x031D
+
+    def __init__(self):
+        super().__init__(win32clipboard.GetClipboardSequenceNumber)
+        self._hwnd = None
+        self._error: Optional[Exception] = None
+        ready = threading.Event()
+        threading.Thread(target=self._loop, args=(ready,), name="clipboard-watch", daemon=True).start()
+        ready.wait(2.0)
+        if self._hwnd is None:
+            raise OSError(f"无法注册剪贴板监听: {self._error}")
+        atexit.register(self.close)
+
+    def _loop(self, ready: threading.Event):
+        import win32api
+        import win32con
+        import win32gui
+        from ctypes import wintypes
+        user32 = ctypes.windll.user32
+        user32.AddClipboardFormatListener.argtypes = [wintypes.HWND]
+        user32.RemoveClipboardFormatListener.argtypes = [wintypes.HWND]
+
+        def wndproc(hwnd, msg, wparam, lparam):
+            if msg == self._WM_CLIPBOARDUPDATE:
+                self._notify()
+                return 0
+            if msg == win32con.WM_DESTROY:
+                user32.RemoveClipboardFormatListener(hwnd)
+                win32gui.PostQuitMessage(0)
+                return 0
+            return win32gui.DefWindowProc(hwnd, msg, wparam, lparam)
+
+        try:
+            wc = win32gui.WNDCLASS()
+            wc.lpszClassName = f"ManosabaClipboardListener{id(self)}"
+            wc.lpfnWndProc = wndproc
+            wc.hInstance = win32api.GetModuleHandle(None)
+            atom = win32gui.RegisterClass(wc)
+            hwnd = win32gui.CreateWindow(atom, "", 0, 0, 0, 0, 0, win32con.HWND_MESSAGE, 0, wc.hInstance, None)
+            if not user32.AddClipboardFormatListener(hwnd):
+                win32gui.DestroyWindow(hwnd)
+                raise ctypes.WinError()
+        except Exception as e:
+            self._error = e
+            ready.set()
+            return
+        self._hwnd = hwnd
+        ready.set()
+        win32gui.PumpMessages()
+
+    def close(self):
+        hwnd, self._hwnd = self._hwnd, None
+        if hwnd:
+            import win32con
+            import win32gui
+            try:
+                win32gui.PostMessage(hwnd, win32con.WM_CLOSE, 0, 0)
+            except Exception:
+                pass
+
+
+class _EventCounterWatcher(ClipboardWatcher):
+    """
+    后台线程收到剪贴板所有者变化事件时序列号加一
+    事件程序意外退出（如合成器不支持 data-control、打不开显示）时改为定时比较 fallback 签名
+    """
+
+    poll_interval = 0.5
+
+    def __init__(self, fallback: Optional[Callable[[], object]] = None):
+        super().__init__()
+        self._seq = 0
+        self._closed = False
+        self._fallback_signature = fallback or (lambda: None)
+        self._fallback: Optional[_PollingWatcher] = None
+
+    def sequence(self) -> int:
+        fallback = self._fallback
+        if fallback is not None:
+            return self._seq + fallback.sequence()
+        return self._seq
+
+    def _changed(self):
+        with self._cond:
+            self._seq += 1
+            self._cond.notify_all()
+
+    def _helper_exited(self, name: str, returncode: Optional[int]):
+        """事件程序退出：改为定时检查，并当作一次变化唤醒等待者（让调用方至少读一次剪贴板）"""
+        if self._closed:
+            return
+        print(f"剪贴板监视程序 {name} 已退出（返回码 {returncode}），改为定时检查剪贴板")
+        with self._cond:
+            self._fallback = _PollingWatcher(self._fallback_signature)
+            self.poll_interval = self._fallback.poll_interval
+            self._seq += 1
+            self._cond.notify_all()
+
+    def close(self):
+        self._closed = True
+
+
+class _WlPasteWatcher(_EventCounterWatcher):
+    """Wayland：wl-paste --watch 在每次剪贴板变化时执行一次命令"""
+
+    def __init__(self, wl_paste: str = "wl-paste", fallback: Optional[Callable[[], object]] = None):
+        super().__init__(fallback)
+        self._name = wl_paste
+        self._proc = subprocess.Popen(
+            [wl_paste, "--watch", "echo"], stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL, stdin=subprocess.DEVNULL,
+        )
+        threading.Thread(target=self._reader, name="clipboard-watch", daemon=True).start()
+        atexit.register(self.close)
+
+    def _reader(self):
+        for _ in iter(self._proc.stdout.readline, b""):
+            self._changed()
+        self._helper_exited(self._name, self._proc.wait())
+
+    def close(self):
+        super().close()
+        if self._proc.poll() is None:
+            self._proc.terminate()
+
+
+class _ClipnotifyWatcher(_EventCounterWatcher):
+    """X11：clipnotify 在剪贴板所有者变化时退出，循环调用即可"""
+
+    def __init__(self, clipnotify: str = "clipnotify", fallback: Optional[Callable[[], object]] = None):
+        super().__init__(fallback)
+        self._cmd = clipnotify
+        self._proc: Optional[subprocess.Popen] = None
+        threading.Thread(target=self._loop, name="clipboard-watch", daemon=True).start()
+        atexit.register(self.close)
+
+    def _loop(self):
+        while not self._closed:
+            self._proc = subprocess.Popen(
+                [self._cmd, "-s", "clipboard"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            )
+            returncode = self._proc.wait()
+            if returncode != 0:
+                self._helper_exited(self._cmd, returncode)
+                return
+            self._changed()
+
+    def close(self):
+        super().close()
+        if self._proc and self._proc.poll() is None:
+            self._proc.terminate()
+
+
+class _PollingWatcher(ClipboardWatcher):
+    """
+    没有事件源时的兜底：定期比较签名，签名变化视为序列号加一
+    签名应当廉价（类型列表等），不要读取或解码剪贴板内容；两次取样至少间隔 poll_interval
+    """
+
+    poll_interval = 0.25
+
+    def __init__(self, signature: Callable[[], object]):
+        super().__init__()
+        self._signature = signature
+        self._last = None
+        self._seq = 0
+        self._sampled_at = float("-inf")
+
+    def sequence(self) -> int:
+        now = time.monotonic()
+        if now - self._sampled_at < self.poll_interval:
+            return self._seq
+        self._sampled_at = now
+        try:
+            current = self._signature()
+        except Exception:
+            return self._seq
+        if current != self._last:
+            self._last = current
+            self._seq += 1
+        return self._seq
+
+
+def _macos_change_count() -> Callable[[], int]:
+    """不依赖 pyobjc，通过 Objective-C 运行时读取 NSPasteboard.generalPasteboard.changeCount"""
+    objc = ctypes.CDLL(ctypes.util.find_library("objc"))
+    ctypes.CDLL("/System/Library/Frameworks/AppKit.framework/AppKit")
+    objc.objc_getClass.argtypes = [ctypes.c_char_p]
+    objc.objc_getClass.restype = ctypes.c_void_p
+    objc.sel_registerName.argtypes = [ctypes.c_char_p]
+    objc.sel_registerName.restype = ctypes.c_void_p
+    send_id = ctypes.CFUNCTYPE(ctypes.c_void_p, ctypes.c_void_p, ctypes.c_void_p)(("objc_msgSend", objc))
+    send_long = ctypes.CFUNCTYPE(ctypes.c_long, ctypes.c_void_p, ctypes.c_void_p)(("objc_msgSend", objc))
+    pasteboard = send_id(objc.objc_getClass(b"NSPasteboard"), objc.sel_registerName(b"generalPasteboard"))
+    if not pasteboard:
+        raise OSError("无法获取 NSPasteboard")
+    change_count = objc.sel_registerName(b"changeCount")
+    return lambda: send_long(pasteboard, change_count)
+
+
 class ClipboardManager:
     """剪贴板管理器"""
 
-    def __init__(self):
+    def __init__(self, linux_backend: Optional[LinuxClipboardBackend] = None,
+                 watcher: Optional[ClipboardWatcher] = None):
         self.platform = PLATFORM
-
-    def copy_image_to_clipboard(self, bmp_bytes: bytes) -> bool:
-        """将BMP字节数据复制到剪贴板"""
+        self.linux = linux_backend
+        if self.linux is None and not (self.platform.startswith("win") or self.platform == "darwin"):
+            self.linux = LinuxClipboardBackend()
+        self._watcher = watcher
+
+    @property
+    def watcher(self) -> ClipboardWatcher:
+        """按平台创建的剪贴板变化检测器（首次使用时创建）"""
+        if self._watcher is None:
+            self._watcher = self._create_watcher()
+        return self._watcher
+
+    def _create_watcher(self) -> ClipboardWatcher:
+        if self.platform.startswith("win"):
+            try:
+                return _ClipboardListenerWatcher()
+            except Exception as e:
+                print(f"剪贴板变化通知不可用，改为轮询序列号: {e}")
+                return _SequenceNumberWatcher(win32clipboard.GetClipboardSequenceNumber)
+        if self.platform == "darwin":
+            # changeCount 要经过 Objective-C 消息发送，间隔放宽到 20ms
+            try:
+                from AppKit import NSPasteboard
+                return _SequenceNumberWatcher(NSPasteboard.generalPasteboard().changeCount, 0.02)
+            except ImportError:
+                return _SequenceNumberWatcher(_macos_change_count(), 0.02)
+        if self.linux and self.linux.available:
+            wl_paste = self.linux.commands.get("list_types", [""])[0]
+            if self.linux.commands is LINUX_CLIPBOARD_COMMANDS["wayland"]:
+                return _WlPasteWatcher(wl_paste, self.linux.signature)
+            if shutil.which("clipnotify"):
+                return _ClipnotifyWatcher(fallback=self.linux.signature)
+            # 生成图片前会先清空剪贴板，剪切后类型列表和所有者时间戳都会变化
+            return _PollingWatcher(self.linux.signature)
+        return _PollingWatcher(lambda: None)
+
+    def copy_image_to_clipboard(self, image: Union[bytes, EncodedImage]) -> bool:
+        """将图片复制到剪贴板，image 为 DIB 字节或 EncodedImage"""
+        if isinstance(image, EncodedImage):
+            if image.format != "dib":
+                return self._copy_encoded_image(image)
+            image = image.data
+        bmp_bytes = image
         try:
             if self.platform == "darwin":
                 return self._copy_image_macos(bmp_bytes)
@@ -44,13 +608,34 @@ class ClipboardManager:
             print(f"复制图片到剪贴板失败: {e}")
             return False
 
-    def _copy_image_macos(self, png_bytes: bytes) -> bool:
+    def _copy_encoded_image(self, image: EncodedImage) -> bool:
+        """按编码格式写入剪贴板（PNG/WebP/JPEG）"""
+        try:
+            if self.platform == "darwin":
+                if image.format not in _MACOS_IMAGE_CLASSES:
+                    print(f"macOS 剪贴板不支持 {image.format} 格式")
+                    return False
+                return self._copy_image_macos(image.data, image.format)
+            if self.platform.startswith("win"):
+                # 只认位图的程序仍能粘贴：同时提供 CF_DIB
+                dib = image.dib if image.dib is not None else to_dib(Image.open(io.BytesIO(image.data)))
+                return self._copy_image_windows(dib, (_WINDOWS_IMAGE_FORMATS[image.format], image.data))
+            if not self.linux or not self.linux.available:
+                print("未找到 wl-clipboard 或 xclip，无法复制图片")
+                return False
+            return self.linux.copy_bytes(image.data, image.mime)
+        except Exception as e:
+            print(f"复制图片到剪贴板失败: {e}")
+            return False
+
+    def _copy_image_macos(self, image_bytes: bytes, image_format: str = "png") -> bool:
         """macOS 复制图片到剪贴板"""
-        with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as tmp:
-            tmp.write(png_bytes)
+        with tempfile.NamedTemporaryFile(suffix=f".{image_format}", delete=False) as tmp:
+            tmp.write(image_bytes)
             tmp_path = tmp.name
 
-        cmd = f"""osascript -e 'set the clipboard to (read (POSIX file "{tmp_path}") as «class PNGf»)'"""
+        image_class = _MACOS_IMAGE_CLASSES[image_format]
+        cmd = f"""osascript -e 'set the clipboard to (read (POSIX file "{tmp_path}") as «class {image_class}»)'"""
         result = subprocess.run(cmd, shell=True, capture_output=True, check=False)
 
         try:
@@ -60,11 +645,17 @@ class ClipboardManager:
 
         return result.returncode == 0
 
-    def _copy_image_windows(self, bmp_bytes: bytes) -> bool:
-        """Windows 复制图片到剪贴板"""
+    def _copy_image_windows(self, bmp_bytes: bytes, preferred: Optional[Tuple[str, bytes]] = None) -> bool:
+        """
+        Windows 复制图片到剪贴板，总是写入 CF_DIB
+        preferred 为 (注册的剪贴板格式名, 数据)，先于 CF_DIB 写入，支持该格式的程序优先使用
+        """
         try:
             win32clipboard.OpenClipboard()
             win32clipboard.EmptyClipboard()
+            if preferred:
+                format_name, data = preferred
+                win32clipboard.SetClipboardData(win32clipboard.RegisterClipboardFormat(format_name), data)
             win32clipboard.SetClipboardData(win32clipboard.CF_DIB, bmp_bytes)
             win32clipboard.CloseClipboard()
             return True
@@ -77,10 +668,12 @@ class ClipboardManager:
             except Exception:
                 pass
 
-    def _copy_image_linux(self, png_bytes: bytes) -> bool:
-        """Linux 复制图片到剪贴板"""
-        print("Linux 剪贴板支持尚未实现")
-        return False
+    def _copy_image_linux(self, bmp_bytes: bytes) -> bool:
+        """Linux 复制图片到剪贴板（DIB 转 PNG 后直接写入 wl-copy/xclip）"""
+        if not self.linux or not self.linux.available:
+            print("未找到 wl-clipboard 或 xclip，无法复制图片")
+            return False
+        return self.linux.copy_png(_dib_to_image(bmp_bytes))
 
     def has_image_in_clipboard(self) -> bool:
         """检查剪贴板中是否有图片"""
@@ -104,12 +697,26 @@ class ClipboardManager:
                     is not None
                 )
             # Linux 的实现
-            return False  # 需要根据具体实现补充
+            if self.linux and self.linux.available:
+                return "image/png" in self.linux.list_types()
+            return False
         except Exception:
             return False
     
     def clear_clipboard(self):
         """清空剪贴板"""
+        if self.platform.startswith("win"):
+            self._clear_clipboard_windows()
+        elif self.platform == "darwin":
+            subprocess.run(["pbcopy"], input=b"", check=False)
+        elif self.linux and self.linux.available:
+            try:
+                self.linux.clear()
+            except Exception as e:
+                print(f"清空剪贴板失败: {e}")
+
+    def _clear_clipboard_windows(self):
+        """Windows 清空剪贴板"""
         try:
             win32clipboard.OpenClipboard()
             win32clipboard.EmptyClipboard()
@@ -123,6 +730,37 @@ class ClipboardManager:
                 pass
 
     def get_clipboard_all(self):
+        """读取剪贴板中的 (文本, 图片)"""
+        if self.platform.startswith("win"):
+            return self._get_clipboard_all_windows()
+        if self.platform == "darwin":
+            return self._get_clipboard_all_macos()
+        return self._get_clipboard_all_linux()
+
+    def _get_clipboard_all_macos(self):
+        """macOS 读取剪贴板文本"""
+        result = subprocess.run(["pbpaste"], capture_output=True, check=False)
+        return result.stdout.decode("utf-8", errors="ignore"), None
+
+    def _get_clipboard_all_linux(self):
+        """Linux 一次读取剪贴板中的文本和图片"""
+        if not self.linux or not self.linux.available:
+            return "", None
+        try:
+            _, png, text, html = self.linux.read_all()
+            image = None
+            if png:
+                image = Image.open(io.BytesIO(png))
+                image.load()
+            elif html:
+                _, image = self.parse_html_clipboard(html)
+            return text, image
+        except Exception as e:
+            print(f"读取剪贴板失败: {e}")
+            return "", None
+
+    def _get_clipboard_all_windows(self):
+        """Windows 读取剪贴板中的文本和图片"""
         text = ""
         image = None
         
@@ -131,14 +769,10 @@ class ClipboardManager:
             win32clipboard.OpenClipboard()
             # 1️⃣ 优先直接取位图（真正的图片）
             if win32clipboard.IsClipboardFormatAvailable(win32clipboard.CF_DIB):
+                # 直接解析 DIB 为 RGBA 数组，交给 draw_content_auto 时不再经过 PIL
+                from utils.dib_utils import dib_to_rgba
                 data = win32clipboard.GetClipboardData(win32clipboard.CF_DIB)
-                header = (
-                    b"BM"
-                    + (len(data) + 14).to_bytes(4, "little")
-                    + b"\x00\x00\x00\x00\x36\x00\x00\x00"
-                )
-                image = Image.open(io.BytesIO(header + data))
-                image.load()
+                image = dib_to_rgba(data)
 
             # 2️⃣ 取纯文本
             if win32clipboard.IsClipboardFormatAvailable(win32clipboard.CF_UNICODETEXT):
@@ -168,19 +802,8 @@ class ClipboardManager:
         if not win32clipboard.IsClipboardFormatAvailable(html_format):
             return None
 
-        html_bytes = win32clipboard.GetClipboardData(html_format)
-
-        if isinstance(html_bytes, bytes):
-            html = html_bytes.decode("utf-8", errors="ignore")
-        else:
-            html = html_bytes
-
-        return html
-
-    def _extract_img_src_from_html(self, html: str) -> str | None:
-        soup = BeautifulSoup(html, 'html.parser')
-        img_tag = soup.find('img')
-        return img_tag.get('src') if img_tag else None
+        # CF_HTML 本身是 UTF-8 字节，保持原样交给解析器
+        return win32clipboard.GetClipboardData(html_format)
 
     def _file_uri_to_path(self, uri: str) -> str | None:
         # 把 file:// URI 转成本地路径。
@@ -235,17 +858,18 @@ class ClipboardManager:
         # 不是 file URI，也不是本地路径
         return None
 
-    def parse_html_clipboard(self, html: str):
+    def parse_html_clipboard(self, html):
         """
         返回 (text, image)：
-        - text: html 去标签的纯文本（简单清理）
-        - image: PIL.Image or None（如果能从 img src 读取到文件）
+        - text: html 片段的纯文本
+        - image: PIL.Image or None（如果能从第一个 img src 读取到图片）
+        html 可以是 str 或 UTF-8 bytes
         """
-        text = None
         image = None
+        raw = html.encode("utf-8") if isinstance(html, str) else bytes(html)
+        text, src, payload = _extract_html(raw)
 
         # 提取 img src
-        src = self._extract_img_src_from_html(html)
         if src:
             # src 可能是 file:// URI、绝对路径、也可能是 http(s)（少见）
             # 处理 file:// 或本地路径
@@ -269,18 +893,15 @@ class ClipboardManager:
                 if src.startswith('data:'):
                     # data:[<mediatype>][;base64],<data>
                     try:
-                        # 找到 base64 数据的起始位置
-                        if ';base64,' in src:
-                            header, b64 = src.split(';base64,', 1)
-                            raw = base64.b64decode(b64)
-                            image = Image.open(io.BytesIO(raw)).copy()
+                        if payload is not None and src.endswith(";base64,"):
+                            # base64 数据直接从原始字节的视图解码
+                            raw_image = binascii.a2b_base64(payload)
                         else:
-                            # 如果没有明确的 base64 标记，尝试直接解码
                             comma_idx = src.find(',')
-                            if comma_idx != -1:
-                                b64 = src[comma_idx+1:]
-                                raw = base64.b64decode(b64)
-                                image = Image.open(io.BytesIO(raw)).copy()
+                            raw_image = unquote_to_bytes(src[comma_idx + 1:]) if comma_idx != -1 else b""
+                        if raw_image:
+                            image = Image.open(io.BytesIO(raw_image))
+                            image.load()
                     except Exception as e:
                         print(f"HTML图片加载失败（data URI）: {e}")
                 elif src.startswith('http://') or src.startswith('https://'):
@@ -298,46 +919,39 @@ class ClipboardManager:
                     except Exception as e:
                         print(f"HTML图片加载失败（直接路径）: {e}")
 
-        # 提取文本：移除注释和标签，解 html 实体等（这里使用简单方法）
-        try:
-            # 取 StartFragment-EndFragment 间的内容优先（许多程序会包含）
-            # 使用非贪婪匹配，并正确处理换行
-            frag_match = re.search(r'<!--StartFragment-->(.*?)<!--EndFragment-->', html, flags=re.DOTALL)
-            if frag_match:
-                fragment = frag_match.group(1)
-            else:
-                # 如果没有找到片段标记，使用整个HTML
-                fragment = html
-                
-            # 去标签，但保留文本内容
-            # 使用更稳健的方法：先移除脚本和样式标签
-            fragment = re.sub(r'<(script|style)[^>]*>.*?</\1>', '', fragment, flags=re.DOTALL)
-            
-            # 移除HTML标签
-            text = re.sub(r'<[^>]+>', '', fragment)
-            
-            # 解常见 HTML 实体
-            html_entities = {
-                '&nbsp;': ' ', '&amp;': '&', '&lt;': '<', '&gt;': '>',
-                '&quot;': '"', '&#39;': "'", '&nbsp': ' '
-            }
-            
-            for entity, char in html_entities.items():
-                text = text.replace(entity, char)
-            
-            # 移除多余空白字符
-            text = re.sub(r'\s+', ' ', text).strip()
-            
-            # 如果文本为空但HTML不为空，可能还有嵌套结构
-            if not text and html:
-                # 尝试更激进的方法：提取所有可见文本
-                text_only = re.sub(r'<[^>]+>', ' ', html)
-                text_only = re.sub(r'\s+', ' ', text_only).strip()
-                if text_only:
-                    text = text_only
-                    
-        except Exception as e:
-            print(f"提取文本失败: {e}")
-            text = html
+        return text, image
+
+
+class MemoryClipboard:
+    """内存中的假剪贴板，接口与 ClipboardManager 相同，可替换 core 中的剪贴板以脱离系统剪贴板运行"""
+
+    def __init__(self):
+        self.text = ""
+        self.image: Optional[Image.Image] = None
+        self.watcher = _EventCounterWatcher()
+
+    def set_content(self, text: str = "", image: Optional[Image.Image] = None):
+        """写入内容并推进序列号，相当于其他程序改变了剪贴板"""
+        self.text = text
+        self.image = image
+        self.watcher._changed()
+
+    def copy_image_to_clipboard(self, image: Union[bytes, EncodedImage]) -> bool:
+        if isinstance(image, EncodedImage):
+            if image.format != "dib":
+                decoded = Image.open(io.BytesIO(image.data))
+                decoded.load()
+                self.set_content("", decoded)
+                return True
+            image = image.data
+        self.set_content("", _dib_to_image(image))
+        return True
 
-        return text, image
\ No newline at end of file
+    def has_image_in_clipboard(self) -> bool:
+        return self.image is not None
+
+    def clear_clipboard(self):
+        self.set_content()
+
+    def get_clipboard_all(self):
+        return self.text, self.image
@@ -0,0 +1,129 @@
+"""
+config_snapshot.py
+配置文件快照：YAML 解析结果按文件缓存到二进制快照中，启动时只重新解析改动过的文件。
+
+每个文件记录 (mtime_ns, 大小, sha1, 解析结果的pickle, 解析耗时)。
+mtime 和大小都没变直接命中；变了再比对内容哈希，哈希相同也算命中。
+解析结果以 pickle 字节保存，每次读取都反序列化出新对象，调用方可以随意修改。
+"""
+
+import hashlib
+import os
+import pickle
+import threading
+import time
+from typing import Any, Dict
+
+import yaml
+
+try:
+    # libyaml 的 C 实现，比纯 Python 的 SafeLoader 快一个数量级
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
+# 快照格式版本，结构变化时递增使旧快照失效
+_SNAPSHOT_VERSION = 1
+
+
+def load_yaml(stream) -> Any:
+    """用可用的最快加载器解析 YAML"""
+    return yaml.load(stream, Loader=_YamlLoader)
+
+
+class ConfigSnapshot:
+    """按源文件 mtime/哈希 缓存 YAML 解析结果"""
+
+    def __init__(self, snapshot_path: str):
+        self.snapshot_path = snapshot_path
+        self._entries: Dict[str, dict] = {}
+        self._dirty = False
+        self._loaded = False
+        self._lock = threading.Lock()
+        # 本次运行的统计
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+
+    def _load_snapshot(self):
+        """读取快照文件，格式不对或损坏时当作空快照"""
+        self._loaded = True
+        try:
+            with open(self.snapshot_path, "rb") as f:
+                data = pickle.load(f)
+            if data.get("version") == _SNAPSHOT_VERSION:
+                self._entries = data.get("entries", {})
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"配置快照读取失败，将重新解析YAML: {e}")
+            self._entries = {}
+
+    def load(self, filepath: str) -> Any:
+        """读取 YAML 文件，快照命中时跳过解析；文件为空时返回 {}"""
+        with self._lock:
+            if not self._loaded:
+                self._load_snapshot()
+
+            key = os.path.normcase(os.path.abspath(filepath))
+            stat = os.stat(filepath)
+            entry = self._entries.get(key)
+            if entry and entry["mtime"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+                return self._hit(entry)
+
+            with open(filepath, "rb") as f:
+                raw = f.read()
+            digest = hashlib.sha1(raw).hexdigest()
+            if entry and entry["sha1"] == digest:
+                # 只是 mtime 变了（如被重新保存但内容相同）
+                entry["mtime"], entry["size"] = stat.st_mtime_ns, stat.st_size
+                self._dirty = True
+                return self._hit(entry)
+
+            st = time.perf_counter()
+            data = load_yaml(raw.decode("utf-8")) or {}
+            elapsed = time.perf_counter() - st
+            self.misses += 1
+            self._entries[key] = {
+                "mtime": stat.st_mtime_ns,
+                "size": stat.st_size,
+                "sha1": digest,
+                "data": pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL),
+                "parse_seconds": elapsed,
+            }
+            self._dirty = True
+            return data
+
+    def _hit(self, entry: dict) -> Any:
+        self.hits += 1
+        self.saved_seconds += entry["parse_seconds"]
+        return pickle.loads(entry["data"])
+
+    def forget(self, filepath: str):
+        """文件被程序改写后丢弃其缓存"""
+        with self._lock:
+            key = os.path.normcase(os.path.abspath(filepath))
+            if self._entries.pop(key, None) is not None:
+                self._dirty = True
+
+    def save(self) -> bool:
+        """有变化时原子地写回快照文件"""
+        with self._lock:
+            if not self._dirty:
+                return False
+            tmp_path = f"{self.snapshot_path}.tmp"
+            try:
+                os.makedirs(os.path.dirname(self.snapshot_path) or ".", exist_ok=True)
+                with open(tmp_path, "wb") as f:
+                    pickle.dump({"version": _SNAPSHOT_VERSION, "entries": self._entries}, f,
+                                protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_path, self.snapshot_path)
+                self._dirty = False
+                return True
+            except OSError as e:
+                print(f"配置快照保存失败: {e}")
+                return False
+
+    def report(self) -> str:
+        """本次运行的命中统计"""
+        return f"快照命中 {self.hits}/{self.hits + self.misses}，节省YAML解析约 {self.saved_seconds * 1000:.0f}ms"
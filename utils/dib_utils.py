@@ -0,0 +1,191 @@
+"""
+dib_utils.py
+剪贴板 DIB（CF_DIB / CF_DIBV5）解析，不经过 PIL 解码。
+
+支持 BITMAPINFOHEADER / V4 / V5 头、自下而上与自上而下的行序、
+BI_RGB / BI_BITFIELDS / BI_ALPHABITFIELDS（任意掩码）以及 1/4/8 位调色板。
+RLE 压缩和内嵌 JPEG/PNG 的 DIB 交给 PIL 处理。
+"""
+
+from __future__ import annotations
+
+import io
+import struct
+from typing import NamedTuple, Optional, Tuple
+
+import numpy as np
+
+BI_RGB = 0
+BI_RLE8 = 1
+BI_RLE4 = 2
+BI_BITFIELDS = 3
+BI_JPEG = 4
+BI_PNG = 5
+BI_ALPHABITFIELDS = 6
+
+# BI_RGB 时的默认掩码 (R, G, B, A)
+_DEFAULT_MASKS = {
+    16: (0x7C00, 0x03E0, 0x001F, 0),
+    24: (0xFF0000, 0x00FF00, 0x0000FF, 0),
+    32: (0xFF0000, 0x00FF00, 0x0000FF, 0),
+}
+
+
+class DIBInfo(NamedTuple):
+    """DIB 头信息"""
+    header_size: int
+    width: int
+    height: int
+    top_down: bool
+    bit_count: int
+    compression: int
+    masks: Tuple[int, int, int, int]  # (R, G, B, A)
+    palette_offset: int
+    palette_size: int
+    pixel_offset: int
+    stride: int
+
+
+def parse_dib_header(buf) -> DIBInfo:
+    """解析 DIB 头，计算调色板和像素数据的真实偏移"""
+    header_size, width, height, _, bit_count, compression = struct.unpack_from("<IiiHHI", buf, 0)
+    if header_size < 40:
+        raise ValueError(f"不支持的 DIB 头大小: {header_size}")
+    colors_used = struct.unpack_from("<I", buf, 32)[0]
+
+    offset = header_size
+    masks = _DEFAULT_MASKS.get(bit_count, (0, 0, 0, 0))
+    if compression in (BI_BITFIELDS, BI_ALPHABITFIELDS):
+        if header_size >= 56:
+            # V3/V4/V5 头里自带 RGBA 掩码
+            masks = struct.unpack_from("<IIII", buf, 40)
+        elif compression == BI_ALPHABITFIELDS:
+            masks = struct.unpack_from("<IIII", buf, offset)
+            offset += 16
+        else:
+            # BITMAPINFOHEADER 后面紧跟 3 个掩码
+            masks = struct.unpack_from("<III", buf, offset) + (0,)
+            offset += 12
+
+    palette_size = colors_used or ((1 << bit_count) if bit_count <= 8 else 0)
+    palette_offset = offset
+    offset += palette_size * 4
+
+    stride = ((abs(width) * bit_count + 31) // 32) * 4
+    return DIBInfo(header_size, abs(width), abs(height), height < 0, bit_count,
+                   compression, tuple(masks), palette_offset, palette_size, offset, stride)
+
+
+def dib_rows(buf, info: Optional[DIBInfo] = None) -> np.ndarray:
+    """
+    返回像素行的 (高, 行字节数) uint8 视图，按自上而下顺序，不复制数据
+    自下而上的 DIB 返回负步长视图
+    """
+    info = info or parse_dib_header(buf)
+    data = np.frombuffer(buf, dtype=np.uint8, count=info.stride * info.height, offset=info.pixel_offset)
+    rows = data.reshape(info.height, info.stride)
+    return rows if info.top_down else rows[::-1]
+
+
+def _mask_channel(values: np.ndarray, mask: int) -> np.ndarray:
+    """按任意位掩码提取通道并扩展到 0-255"""
+    if not mask:
+        return None
+    shift = (mask & -mask).bit_length() - 1
+    maximum = mask >> shift
+    channel = (values & mask) >> shift
+    if maximum == 255:
+        return channel.astype(np.uint8)
+    return ((channel.astype(np.uint32) * 255 + maximum // 2) // maximum).astype(np.uint8)
+
+
+def _byte_index(mask: int) -> Optional[int]:
+    """掩码恰好是某个完整字节时返回字节下标"""
+    for i in range(4):
+        if mask == 0xFF << (8 * i):
+            return i
+    return None
+
+
+def dib_to_rgba(buf) -> np.ndarray:
+    """
+    DIB 转为 (高, 宽, 4) 的 RGBA uint8 连续数组
+    常见格式只从视图做一次拷贝
+    """
+    info = parse_dib_header(buf)
+    width, height = info.width, info.height
+
+    if info.compression in (BI_RLE8, BI_RLE4, BI_JPEG, BI_PNG):
+        return _dib_to_rgba_pil(buf, info)
+
+    rows = dib_rows(buf, info)
+    out = np.empty((height, width, 4), dtype=np.uint8)
+    r_mask, g_mask, b_mask, a_mask = info.masks
+
+    if info.bit_count in (24, 32):
+        pixel_bytes = info.bit_count // 8
+        pixels = rows[:, :width * pixel_bytes].reshape(height, width, pixel_bytes)
+        indexes = [_byte_index(m) for m in (r_mask, g_mask, b_mask)]
+        alpha_index = _byte_index(a_mask) if a_mask else None
+        if None not in indexes and (not a_mask or alpha_index is not None):
+            # 掩码都是整字节：直接从视图按通道拷贝
+            for channel, index in enumerate(indexes):
+                out[..., channel] = pixels[..., index]
+            if alpha_index is None:
+                out[..., 3] = 255
+            else:
+                out[..., 3] = pixels[..., alpha_index]
+            return out
+        values = pixels.view("<u4")[..., 0] if pixel_bytes == 4 else None
+    elif info.bit_count == 16:
+        values = rows[:, :width * 2].view("<u2")
+    elif info.bit_count <= 8:
+        return _dib_palette_to_rgba(buf, info, rows, out)
+    else:
+        raise ValueError(f"不支持的 DIB 位深: {info.bit_count}")
+
+    if values is None:
+        raise ValueError("24 位 DIB 不支持非整字节掩码")
+    for channel, mask in enumerate((r_mask, g_mask, b_mask)):
+        out[..., channel] = _mask_channel(values, mask)
+    out[..., 3] = _mask_channel(values, a_mask) if a_mask else 255
+    return out
+
+
+def _dib_palette_to_rgba(buf, info: DIBInfo, rows: np.ndarray, out: np.ndarray) -> np.ndarray:
+    """1/4/8 位调色板 DIB"""
+    palette = np.frombuffer(buf, dtype=np.uint8, count=info.palette_size * 4,
+                            offset=info.palette_offset).reshape(-1, 4)
+    width = info.width
+    if info.bit_count == 8:
+        indices = rows[:, :width]
+    elif info.bit_count == 4:
+        packed = rows[:, :(width + 1) // 2]
+        indices = np.empty((info.height, packed.shape[1] * 2), dtype=np.uint8)
+        indices[:, 0::2] = packed >> 4
+        indices[:, 1::2] = packed & 0x0F
+        indices = indices[:, :width]
+    elif info.bit_count == 1:
+        indices = np.unpackbits(rows, axis=1)[:, :width]
+    else:
+        raise ValueError(f"不支持的调色板位深: {info.bit_count}")
+
+    indices = np.minimum(indices, len(palette) - 1)
+    # 调色板为 BGRX
+    out[..., 0] = palette[indices, 2]
+    out[..., 1] = palette[indices, 1]
+    out[..., 2] = palette[indices, 0]
+    out[..., 3] = 255
+    return out
+
+
+def _dib_to_rgba_pil(buf, info: DIBInfo) -> np.ndarray:
+    """压缩 DIB：补上偏移正确的文件头后交给 PIL"""
+    from PIL import Image
+
+    if info.compression in (BI_JPEG, BI_PNG):
+        image = Image.open(io.BytesIO(bytes(memoryview(buf)[info.pixel_offset:])))
+    else:
+        header = b"BM" + struct.pack("<IHHI", len(buf) + 14, 0, 0, info.pixel_offset + 14)
+        image = Image.open(io.BytesIO(header + bytes(buf)))
+    return np.asarray(image.convert("RGBA"))
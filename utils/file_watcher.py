@@ -0,0 +1,330 @@
+"""
+file_watcher.py
+文件监视：配置和素材目录下的文件变化按批通知，供热重载使用。
+
+Linux 使用 inotify，Windows 使用 ReadDirectoryChangesW，两者都直接给出变化的文件；
+其他平台或初始化失败时定期扫描 mtime/大小（可以只扫描一部分目录）。
+后端在监视线程中创建，初始的目录遍历不占用启动时间。连续的变化会合并成一批再回调。
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import threading
+from sys import platform
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+PLATFORM = platform.lower()
+
+# 扫描模式下的轮询间隔（秒）
+POLL_INTERVAL = 2.0
+# 事件模式下每次等待的最长时间（秒），决定 stop() 的响应速度
+EVENT_WAIT = 1.0
+# 最后一次变化后等待多久再回调（秒），编辑器保存时常常连续写多次
+DEBOUNCE = 0.3
+
+
+def _default_ignore(path: str) -> bool:
+    """临时文件、隐藏文件（如配置快照）和缓存目录不触发重载"""
+    name = os.path.basename(path)
+    return name.startswith(".") or name.endswith((".tmp", ".pyc")) or "__pycache__" in path
+
+
+class _PollingBackend:
+    """定期扫描 mtime/大小，比较前后两次快照"""
+
+    name = "poll"
+
+    def __init__(self, roots: List[str]):
+        self.roots = roots
+        self._stop = threading.Event()
+        self._state: Dict[str, Dict[str, Tuple[int, int]]] = {root: self._scan_root(root) for root in roots}
+
+    @staticmethod
+    def _scan_root(root: str) -> Dict[str, Tuple[int, int]]:
+        state = {}
+        for dirpath, _, filenames in os.walk(root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                state[path] = (st.st_mtime_ns, st.st_size)
+        return state
+
+    def scan(self, roots: Optional[Iterable[str]] = None) -> Set[str]:
+        """重新扫描，返回新增、删除或修改过的文件"""
+        changed = set()
+        for root in roots or self.roots:
+            old, new = self._state.get(root, {}), self._scan_root(root)
+            changed.update(path for path in old.keys() | new.keys() if old.get(path) != new.get(path))
+            self._state[root] = new
+        return changed
+
+    def wait(self, timeout: float) -> Set[str]:
+        if timeout > 0 and self._stop.wait(timeout):
+            return set()
+        return self.scan()
+
+    def close(self):
+        self._stop.set()
+
+
+class _WindowsBackend:
+    """ReadDirectoryChangesW（重叠I/O）递归监视各个根目录，通知中直接带有变化的文件名"""
+
+    name = "win32"
+
+    _FILE_LIST_DIRECTORY = 0x0001
+    _BUFFER_SIZE = 64 * 1024
+
+    def __init__(self, roots: List[str]):
+        import pywintypes
+        import win32con
+        import win32event
+        import win32file
+        self._win32event = win32event
+        self._win32file = win32file
+        self.roots = roots
+        self._flags = (win32con.FILE_NOTIFY_CHANGE_FILE_NAME | win32con.FILE_NOTIFY_CHANGE_DIR_NAME
+                       | win32con.FILE_NOTIFY_CHANGE_LAST_WRITE | win32con.FILE_NOTIFY_CHANGE_SIZE)
+        self._watches = []
+        for root in roots:
+            handle = win32file.CreateFile(
+                root, self._FILE_LIST_DIRECTORY,
+                win32con.FILE_SHARE_READ | win32con.FILE_SHARE_WRITE | win32con.FILE_SHARE_DELETE,
+                None, win32con.OPEN_EXISTING,
+                win32con.FILE_FLAG_BACKUP_SEMANTICS | win32file.FILE_FLAG_OVERLAPPED, None)
+            overlapped = pywintypes.OVERLAPPED()
+            overlapped.hEvent = win32event.CreateEvent(None, True, False, None)
+            buffer = win32file.AllocateReadBuffer(self._BUFFER_SIZE)
+            self._watches.append((root, handle, overlapped, buffer))
+            self._issue(len(self._watches) - 1)
+
+    def _issue(self, index: int):
+        _, handle, overlapped, buffer = self._watches[index]
+        self._win32file.ReadDirectoryChangesW(handle, buffer, True, self._flags, overlapped)
+
+    def wait(self, timeout: float) -> Set[str]:
+        if not self._watches:
+            return set()
+        events = [watch[2].hEvent for watch in self._watches]
+        rc = self._win32event.WaitForMultipleObjects(events, False, max(0, int(timeout * 1000)))
+        index = rc - self._win32event.WAIT_OBJECT_0
+        if not 0 <= index < len(self._watches):
+            return set()
+
+        root, handle, overlapped, buffer = self._watches[index]
+        nbytes = self._win32file.GetOverlappedResult(handle, overlapped, True)
+        self._win32event.ResetEvent(overlapped.hEvent)
+        if nbytes:
+            changed = {os.path.join(root, name) for _, name in self._win32file.FILE_NOTIFY_INFORMATION(buffer, nbytes)}
+        else:
+            # 缓冲区溢出，不知道具体文件，只能把整个根目录当作变化
+            print(f"目录变化通知溢出，重新检查 {root}")
+            changed = set(_PollingBackend._scan_root(root))
+        self._issue(index)
+        return changed
+
+    def close(self):
+        for _, handle, overlapped, _ in self._watches:
+            try:
+                self._win32file.CancelIo(handle)
+                handle.Close()
+                overlapped.hEvent.Close()
+            except Exception:
+                pass
+        self._watches = []
+
+
+class _InotifyBackend:
+    """Linux inotify（通过 ctypes 调用 libc），递归监视各级目录"""
+
+    name = "inotify"
+
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ISDIR = 0x40000000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    _MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    _EVENT = struct.Struct("iIII")
+
+    def __init__(self, roots: List[str]):
+        self.roots = roots
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._fd = self._libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 失败")
+        self._dirs: Dict[int, str] = {}
+        for root in roots:
+            self._watch_tree(root)
+
+    def _watch_tree(self, root: str):
+        for dirpath, _, _ in os.walk(root):
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(dirpath), self._MASK)
+            if wd >= 0:
+                self._dirs[wd] = dirpath
+
+    def wait(self, timeout: float) -> Set[str]:
+        if self._fd < 0:
+            return set()
+        readable, _, _ = select.select([self._fd], [], [], max(0.0, timeout))
+        if not readable:
+            return set()
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+
+        changed = set()
+        offset = 0
+        while offset + self._EVENT.size <= len(data):
+            wd, mask, _, length = self._EVENT.unpack_from(data, offset)
+            offset += self._EVENT.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            if mask & self.IN_Q_OVERFLOW:
+                print("inotify 事件队列溢出，部分文件变化可能未被处理")
+                continue
+            if mask & self.IN_IGNORED:
+                self._dirs.pop(wd, None)
+                continue
+            directory = self._dirs.get(wd)
+            if directory is None or not name:
+                continue
+            path = os.path.join(directory, os.fsdecode(name))
+            if mask & self.IN_ISDIR:
+                # 新建或移入的目录需要补上监视，目录内已有的文件也算变化
+                if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                    self._watch_tree(path)
+                    changed.update(_PollingBackend._scan_root(path))
+                continue
+            changed.add(path)
+        return changed
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def _create_backend(roots: List[str], backend: str, poll_roots: List[str]):
+    """按平台选择监视方式，失败时退回扫描（扫描只覆盖 poll_roots）"""
+    if backend == "auto":
+        try:
+            if PLATFORM.startswith("linux"):
+                return _InotifyBackend(roots)
+            if PLATFORM.startswith("win"):
+                return _WindowsBackend(roots)
+        except Exception as e:
+            print(f"文件变化通知不可用，改为定时扫描: {e}")
+    elif backend == "inotify":
+        return _InotifyBackend(roots)
+    elif backend == "win32":
+        return _WindowsBackend(roots)
+    return _PollingBackend(poll_roots)
+
+
+class FileWatcher:
+    """
+    监视若干目录，文件变化合并成一批后回调 on_change(路径集合)
+    回调在监视线程中执行；也可以不启动线程，直接调用 poll() 同步取变化
+    poll_roots 为退回定时扫描时实际扫描的目录（默认同 roots），文件很多且很少变化的目录可以不放进去
+    """
+
+    def __init__(self, roots: Iterable[str], on_change: Callable[[Set[str]], None],
+                 backend: str = "auto", interval: Optional[float] = None, debounce: float = DEBOUNCE,
+                 ignore: Callable[[str], bool] = _default_ignore, poll_roots: Optional[Iterable[str]] = None):
+        self.roots = [os.path.abspath(root) for root in roots if root and os.path.isdir(root)]
+        self.poll_roots = (self.roots if poll_roots is None else
+                           [os.path.abspath(root) for root in poll_roots if root and os.path.isdir(root)])
+        self.on_change = on_change
+        self.backend_name = backend
+        self.interval = interval
+        self.debounce = debounce
+        self.ignore = ignore
+        # 后端在第一次使用时创建（inotify 添加监视、扫描建立初始快照都要遍历目录）
+        self.backend = None
+        self._backend_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _ensure_backend(self):
+        with self._backend_lock:
+            if self.backend is None:
+                self.backend = _create_backend(self.roots, self.backend_name, self.poll_roots)
+            return self.backend
+
+    def _wait_time(self, backend) -> float:
+        if self.interval is not None:
+            return self.interval
+        return POLL_INTERVAL if isinstance(backend, _PollingBackend) else EVENT_WAIT
+
+    def _filter(self, paths: Iterable[str]) -> Set[str]:
+        return {path for path in paths if not self.ignore(path)}
+
+    def poll(self) -> Set[str]:
+        """立即检查一次变化，有变化时回调并返回变化的文件（首次调用只建立初始状态）"""
+        changed = self._filter(self._ensure_backend().wait(0))
+        if changed:
+            self._dispatch(changed)
+        return changed
+
+    def _dispatch(self, changed: Set[str]):
+        try:
+            self.on_change(changed)
+        except Exception as e:
+            print(f"处理文件变化失败: {e}")
+
+    def _run(self):
+        try:
+            backend = self._ensure_backend()
+        except Exception as e:
+            print(f"文件监视启动失败: {e}")
+            return
+        watched = self.poll_roots if isinstance(backend, _PollingBackend) else self.roots
+        print(f"文件监视已启动（{backend.name}）: {', '.join(watched)}")
+        interval = self._wait_time(backend)
+        while not self._stop.is_set():
+            changed = self._filter(backend.wait(interval))
+            if not changed:
+                continue
+            # 等到一段时间内不再有新变化再回调
+            while not self._stop.is_set():
+                more = self._filter(backend.wait(self.debounce))
+                if not more:
+                    break
+                changed |= more
+            if not self._stop.is_set():
+                self._dispatch(changed)
+
+    def start(self) -> bool:
+        """启动监视线程（后端在线程中创建），没有可监视的目录时返回 False"""
+        if self._thread is not None or not self.roots:
+            return self._thread is not None
+        self._thread = threading.Thread(target=self._run, name="file-watcher", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        """停止监视并释放系统资源"""
+        self._stop.set()
+        backend = self.backend
+        # 扫描后端没有系统句柄，先关闭可以立即唤醒等待；其他后端等线程结束后再关闭句柄
+        if isinstance(backend, _PollingBackend):
+            backend.close()
+        if self._thread is not None:
+            self._thread.join(timeout=max(POLL_INTERVAL, EVENT_WAIT) + 1)
+            self._thread = None
+        if backend is not None:
+            backend.close()
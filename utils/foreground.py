@@ -0,0 +1,277 @@
+"""
+foreground.py
+前台应用解析：缓存前台进程名，供白名单校验和按应用选择输出编码使用。
+
+Windows 通过 SetWinEventHook(EVENT_SYSTEM_FOREGROUND) 在焦点变化时更新前台进程，
+macOS 有 pyobjc 时用 NSWorkspace，否则调用 osascript 并短时间缓存结果，
+Linux 不校验白名单。FakeForegroundPlatform 可以在任意平台上模拟前台切换。
+"""
+
+import subprocess
+import threading
+import time
+from sys import platform
+from typing import Callable, Dict, FrozenSet, Iterable, Optional, Tuple
+
+PLATFORM = platform.lower()
+
+# 轮询平台上前台进程的缓存时间（秒）
+FOREGROUND_TTL = 0.2
+# pid→进程名 缓存时间（秒），防止 pid 复用后拿到旧名字
+NAME_TTL = 5.0
+
+
+class ForegroundPlatform:
+    """平台层接口"""
+
+    # 该平台是否校验白名单
+    enforces_whitelist = True
+
+    def foreground_pid(self) -> Optional[int]:
+        """当前前台窗口所属进程的 pid"""
+        return None
+
+    def process_name(self, pid: int) -> Optional[str]:
+        """pid 对应的进程名"""
+        import psutil  # 首次校验白名单时才加载
+        try:
+            return psutil.Process(pid).name()
+        except (psutil.Error, OSError):
+            return None
+
+    def watch(self, on_change: Callable[[Optional[int]], None]) -> bool:
+        """开始监听焦点变化，回调参数为新的前台 pid；不支持时返回 False"""
+        return False
+
+
+class _WindowsForegroundPlatform(ForegroundPlatform):
+    """Windows：GetForegroundWindow + 前台切换事件钩子"""
+
+    def __init__(self):
+        import win32gui
+        import win32process
+        self._win32gui = win32gui
+        self._win32process = win32process
+        self._thread: Optional[threading.Thread] = None
+
+    def _window_pid(self, hwnd) -> Optional[int]:
+        if not hwnd:
+            return None
+        try:
+            _, pid = self._win32process.GetWindowThreadProcessId(hwnd)
+            return pid
+        except OSError:
+            return None
+
+    def foreground_pid(self) -> Optional[int]:
+        return self._window_pid(self._win32gui.GetForegroundWindow())
+
+    def watch(self, on_change: Callable[[Optional[int]], None]) -> bool:
+        if self._thread is not None:
+            return True
+        ready = threading.Event()
+        result = {"ok": False}
+
+        def run():
+            import ctypes
+            from ctypes import wintypes
+
+            user32 = ctypes.windll.user32
+            EVENT_SYSTEM_FOREGROUND = 0x0003
+            WINEVENT_OUTOFCONTEXT = 0x0000
+            WinEventProc = ctypes.WINFUNCTYPE(
+                None, wintypes.HANDLE, wintypes.DWORD, wintypes.HWND,
+                wintypes.LONG, wintypes.LONG, wintypes.DWORD, wintypes.DWORD,
+            )
+
+            def callback(hook, event, hwnd, id_object, id_child, thread_id, event_time):
+                on_change(self._window_pid(hwnd))
+
+            proc = WinEventProc(callback)
+            user32.SetWinEventHook.restype = wintypes.HANDLE
+            hook = user32.SetWinEventHook(EVENT_SYSTEM_FOREGROUND, EVENT_SYSTEM_FOREGROUND,
+                                          0, proc, 0, 0, WINEVENT_OUTOFCONTEXT)
+            result["ok"] = bool(hook)
+            ready.set()
+            if not hook:
+                return
+            # 钩子回调在本线程的消息循环中派发
+            msg = wintypes.MSG()
+            while user32.GetMessageW(ctypes.byref(msg), 0, 0, 0) > 0:
+                user32.TranslateMessage(ctypes.byref(msg))
+                user32.DispatchMessageW(ctypes.byref(msg))
+
+        self._thread = threading.Thread(target=run, name="foreground-hook", daemon=True)
+        self._thread.start()
+        ready.wait(2)
+        if not result["ok"]:
+            print("前台窗口事件钩子注册失败，改为按需查询")
+        return result["ok"]
+
+
+class _MacForegroundPlatform(ForegroundPlatform):
+    """macOS：优先 NSWorkspace（pyobjc），否则 osascript"""
+
+    def __init__(self):
+        try:
+            from AppKit import NSWorkspace
+            self._workspace = NSWorkspace.sharedWorkspace()
+        except ImportError:
+            self._workspace = None
+
+    def foreground_pid(self) -> Optional[int]:
+        if self._workspace is not None:
+            app = self._workspace.frontmostApplication()
+            return int(app.processIdentifier()) if app else None
+        try:
+            result = subprocess.run(
+                [
+                    "osascript",
+                    "-e",
+                    'tell application "System Events" to get unix id of first process whose frontmost is true',
+                ],
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+            return int(result.stdout.strip())
+        except (subprocess.SubprocessError, ValueError):
+            return None
+
+
+class _LinuxForegroundPlatform(ForegroundPlatform):
+    """Linux：不获取前台进程，也不校验白名单"""
+
+    enforces_whitelist = False
+
+
+class FakeForegroundPlatform(ForegroundPlatform):
+    """假平台层：手动切换前台进程，用于在任意平台上测试"""
+
+    def __init__(self, pid: Optional[int] = None, names: Optional[Dict[int, str]] = None):
+        self.pid = pid
+        self.names: Dict[int, str] = dict(names or {})
+        self.queries = 0
+        self._listeners = []
+
+    def foreground_pid(self) -> Optional[int]:
+        self.queries += 1
+        return self.pid
+
+    def process_name(self, pid: int) -> Optional[str]:
+        return self.names.get(pid)
+
+    def watch(self, on_change: Callable[[Optional[int]], None]) -> bool:
+        self._listeners.append(on_change)
+        return True
+
+    def set_foreground(self, pid: Optional[int], name: Optional[str] = None):
+        """切换前台进程并触发焦点变化事件"""
+        if pid is not None and name is not None:
+            self.names[pid] = name
+        self.pid = pid
+        for listener in self._listeners:
+            listener(pid)
+
+
+def _create_platform() -> ForegroundPlatform:
+    """按当前系统选择平台层"""
+    if PLATFORM.startswith("win"):
+        return _WindowsForegroundPlatform()
+    if PLATFORM == "darwin":
+        return _MacForegroundPlatform()
+    return _LinuxForegroundPlatform()
+
+
+class ForegroundAppResolver:
+    """
+    前台应用解析服务
+    支持事件的平台由焦点变化事件更新前台 pid，其余平台按 FOREGROUND_TTL 缓存
+    pid→进程名 单独缓存 NAME_TTL 秒；白名单预先编译成小写集合
+    """
+
+    def __init__(self, platform_impl: Optional[ForegroundPlatform] = None,
+                 whitelist: Optional[Callable[[], Iterable[str]]] = None,
+                 foreground_ttl: float = FOREGROUND_TTL, name_ttl: float = NAME_TTL):
+        self.platform = platform_impl or _create_platform()
+        self._whitelist_getter = whitelist
+        self._whitelist_source = None
+        self._whitelist: FrozenSet[str] = frozenset()
+        self.foreground_ttl = foreground_ttl
+        self.name_ttl = name_ttl
+
+        self._lock = threading.Lock()
+        self._names: Dict[int, Tuple[Optional[str], float]] = {}
+        # 轮询模式下的前台 pid 缓存：(pid, 时间)
+        self._pid: Optional[Tuple[Optional[int], float]] = None
+        self._event_driven = False
+        self._event_pid: Optional[int] = None
+
+    def start(self) -> bool:
+        """开始监听焦点变化（平台支持时），返回是否由事件驱动"""
+        if self._event_driven or not self.platform.enforces_whitelist:
+            return self._event_driven
+        with self._lock:
+            self._event_pid = self.platform.foreground_pid()
+        self._event_driven = self.platform.watch(self._on_foreground_changed)
+        return self._event_driven
+
+    def _on_foreground_changed(self, pid: Optional[int]):
+        with self._lock:
+            self._event_pid = pid
+
+    def _foreground_pid(self) -> Optional[int]:
+        if self._event_driven:
+            with self._lock:
+                return self._event_pid
+        now = time.monotonic()
+        with self._lock:
+            if self._pid is not None and now - self._pid[1] < self.foreground_ttl:
+                return self._pid[0]
+        pid = self.platform.foreground_pid()
+        with self._lock:
+            self._pid = (pid, now)
+        return pid
+
+    def _process_name(self, pid: int) -> Optional[str]:
+        now = time.monotonic()
+        with self._lock:
+            cached = self._names.get(pid)
+            if cached is not None and now - cached[1] < self.name_ttl:
+                return cached[0]
+        name = self.platform.process_name(pid)
+        name = name.lower() if name else None
+        with self._lock:
+            self._names[pid] = (name, now)
+            # 清理过期项，避免缓存无限增长
+            if len(self._names) > 64:
+                self._names = {p: v for p, v in self._names.items() if now - v[1] < self.name_ttl}
+        return name
+
+    def current_name(self) -> Optional[str]:
+        """当前前台进程名（小写），获取失败或平台不支持时返回 None"""
+        if not self.platform.enforces_whitelist:
+            return None
+        pid = self._foreground_pid()
+        return self._process_name(pid) if pid is not None else None
+
+    def _compiled_whitelist(self) -> FrozenSet[str]:
+        """白名单来源对象变化时才重新编译"""
+        source = self._whitelist_getter() if self._whitelist_getter else None
+        if source is not self._whitelist_source:
+            self._whitelist_source = source
+            self._whitelist = frozenset(name.lower() for name in (source or ()))
+        return self._whitelist
+
+    def is_allowed(self, process_name: Optional[str]) -> bool:
+        """校验前台进程是否在白名单，白名单为空时不限制"""
+        whitelist = self._compiled_whitelist()
+        if not whitelist or not self.platform.enforces_whitelist:
+            return True
+        return process_name is not None and process_name in whitelist
+
+    def invalidate(self):
+        """丢弃缓存的前台进程和进程名"""
+        with self._lock:
+            self._pid = None
+            self._names.clear()
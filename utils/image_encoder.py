@@ -0,0 +1,194 @@
+"""
+image_encoder.py
+输出图片编码：DIB（原始位图）/ PNG / WebP / JPEG，支持目标大小。
+
+编码设置是一个 dict（见 config/process_whitelist.yml 的 encoders 段）：
+    format:        dib / png / webp / jpeg
+    quality:       WebP/JPEG 的最高质量
+    min_quality:   目标大小搜索时允许的最低质量
+    compress_level PNG 的 zlib 等级（0-9，越低越快）
+    max_bytes:     目标最大字节数，0 表示不限制
+    min_scale:     目标大小搜索时允许的最小缩放比例
+    parallel:      是否并行尝试多个质量
+"""
+
+from __future__ import annotations
+
+import io
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from PIL import Image, features
+
+ENCODER_FORMATS = ("dib", "png", "webp", "jpeg")
+
+_MIME_TYPES = {
+    "dib": "image/bmp",
+    "png": "image/png",
+    "webp": "image/webp",
+    "jpeg": "image/jpeg",
+}
+
+DEFAULT_ENCODER: Dict[str, Any] = {
+    "format": "dib",
+    "quality": 90,
+    "min_quality": 50,
+    "compress_level": 1,
+    "max_bytes": 0,
+    "min_scale": 0.5,
+    "parallel": True,
+}
+
+# 并行搜索时每轮同时尝试的质量个数
+_SEARCH_FANOUT = 3
+# 目标大小搜索最多缩放几次
+_MAX_SCALE_STEPS = 4
+
+_ENCODE_WORKERS = max(1, min(4, os.cpu_count() or 1))
+_ENCODE_POOL_LOCK = threading.Lock()
+_encode_pool = None
+
+
+class EncodedImage(NamedTuple):
+    """编码后的输出图片"""
+    data: bytes
+    format: str
+    width: int
+    height: int
+    # 非 DIB 格式时同一张图的 DIB，供只认位图的程序粘贴（Windows CF_DIB），不需要时为 None
+    dib: Optional[bytes] = None
+
+    @property
+    def mime(self) -> str:
+        return _MIME_TYPES[self.format]
+
+
+def _get_encode_pool() -> ThreadPoolExecutor:
+    """按需创建编码线程池（Pillow 编码时会释放 GIL）"""
+    global _encode_pool
+    with _ENCODE_POOL_LOCK:
+        if _encode_pool is None:
+            _encode_pool = ThreadPoolExecutor(max_workers=_ENCODE_WORKERS, thread_name_prefix="image-encode")
+        return _encode_pool
+
+
+def _resolve_options(options: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """补全默认值并检查格式"""
+    opts = DEFAULT_ENCODER | (options or {})
+    fmt = str(opts["format"]).lower()
+    if fmt == "jpg":
+        fmt = "jpeg"
+    if fmt not in ENCODER_FORMATS:
+        print(f"未知的输出格式 {fmt}，改用 dib")
+        fmt = "dib"
+    if fmt == "webp" and not features.check("webp"):
+        print("当前 Pillow 不支持 WebP，改用 png")
+        fmt = "png"
+    opts["format"] = fmt
+    return opts
+
+
+def _encode_once(image: Image.Image, fmt: str, quality: int, compress_level: int) -> bytes:
+    """按指定参数编码一次"""
+    buf = io.BytesIO()
+    if fmt == "dib":
+        image.save(buf, format="BMP")
+        return buf.getvalue()[14:]
+    if fmt == "png":
+        image.save(buf, format="PNG", compress_level=compress_level)
+    elif fmt == "webp":
+        image.save(buf, format="WEBP", quality=quality, method=0)
+    else:
+        image.save(buf, format="JPEG", quality=quality, optimize=False)
+    return buf.getvalue()
+
+
+def _encode_many(image: Image.Image, qualities: List[int], opts: Dict[str, Any]) -> List[bytes]:
+    """对多个质量编码，parallel 时在线程池中同时进行"""
+    fmt, level = opts["format"], opts["compress_level"]
+    if opts["parallel"] and len(qualities) > 1:
+        return list(_get_encode_pool().map(lambda q: _encode_once(image, fmt, q, level), qualities))
+    return [_encode_once(image, fmt, q, level) for q in qualities]
+
+
+def _search_quality(image: Image.Image, lo: int, hi: int, opts: Dict[str, Any]) -> Optional[bytes]:
+    """在 [lo, hi] 内找不超过 max_bytes 的最高质量，返回其编码结果"""
+    max_bytes = opts["max_bytes"]
+    best: Optional[Tuple[int, bytes]] = None
+    while lo <= hi:
+        if opts["parallel"] and hi - lo >= _SEARCH_FANOUT:
+            step = (hi - lo) / (_SEARCH_FANOUT + 1)
+            candidates = sorted({lo + round(step * (i + 1)) for i in range(_SEARCH_FANOUT)})
+        else:
+            candidates = [(lo + hi) // 2]
+        for quality, data in zip(candidates, _encode_many(image, candidates, opts)):
+            if len(data) <= max_bytes:
+                if best is None or quality > best[0]:
+                    best = (quality, data)
+                lo = max(lo, quality + 1)
+            else:
+                hi = min(hi, quality - 1)
+    return best[1] if best else None
+
+
+def _fit_to_size(image: Image.Image, opts: Dict[str, Any]) -> Tuple[Image.Image, bytes]:
+    """先降质量再降分辨率，直到不超过 max_bytes；始终不满足时返回最小的结果"""
+    fmt, max_bytes = opts["format"], opts["max_bytes"]
+    quality = int(opts["quality"])
+    min_quality = min(int(opts["min_quality"]), quality)
+    lossy = fmt in ("webp", "jpeg")
+    min_scale = float(opts["min_scale"])
+
+    scale = 1.0
+    scaled, data = image, b""
+    for _ in range(_MAX_SCALE_STEPS):
+        if scale < 1.0:
+            size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+            scaled = image.resize(size, Image.Resampling.BILINEAR)
+        if lossy:
+            # 最高和最低质量一起试：最高质量满足就直接用，最低质量都不满足就缩小
+            high, data = _encode_many(scaled, [quality, min_quality], opts)
+            if len(high) <= max_bytes:
+                return scaled, high
+            if len(data) <= max_bytes:
+                found = _search_quality(scaled, min_quality + 1, quality - 1, opts)
+                return scaled, found or data
+        else:
+            data = _encode_once(scaled, fmt, quality, opts["compress_level"])
+            if len(data) <= max_bytes:
+                return scaled, data
+
+        if scale <= min_scale:
+            break
+        # 编码大小大致与面积成正比
+        scale = max(min_scale, scale * math.sqrt(max_bytes / len(data)) * 0.95)
+
+    print(f"输出图片无法压缩到 {max_bytes} 字节以内，实际 {len(data)} 字节")
+    return scaled, data
+
+
+def encode_image(image: Image.Image, options: Optional[Dict[str, Any]] = None,
+                 with_dib: bool = False) -> EncodedImage:
+    """按编码设置编码图片，with_dib 时非 DIB 格式额外附带一份 DIB"""
+    opts = _resolve_options(options)
+    fmt = opts["format"]
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    image.load()
+
+    if fmt != "dib" and opts["max_bytes"]:
+        image, data = _fit_to_size(image, opts)
+    else:
+        data = _encode_once(image, fmt, int(opts["quality"]), opts["compress_level"])
+    dib = to_dib(image) if with_dib and fmt != "dib" else None
+    return EncodedImage(data, fmt, image.width, image.height, dib)
+
+
+def to_dib(image: Image.Image) -> bytes:
+    """编码为不含文件头的BMP（DIB）"""
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    return _encode_once(image, "dib", 0, 0)
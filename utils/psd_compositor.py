@@ -0,0 +1,134 @@
+"""
+psd_compositor.py
+NumPy 实现的PSD图层合成器，在预乘alpha的 float32 画布上原地合成。
+
+支持
+----------------
+混合模式: NORMAL / MULTIPLY / SCREEN / OVERLAY（其余模式按 NORMAL 处理）
+图层不透明度
+剪贴蒙版：剪贴图层的 alpha 乘以下方基底图层的 alpha
+
+公式按 W3C Compositing and Blending：
+    Co' = Cs'(1 - αb) + Cb'(1 - αs) + αs·αb·B(Cb, Cs)
+    αo  = αs + αb(1 - αs)
+"""
+
+from __future__ import annotations
+
+from typing import Optional, Tuple
+
+import numpy as np
+
+# 合成器原生支持的混合模式
+BLEND_MODES = ("NORMAL", "MULTIPLY", "SCREEN", "OVERLAY")
+# 和 NORMAL 等价、不需要本合成器的模式
+_SIMPLE_MODES = ("NORMAL", "PASS_THROUGH")
+
+
+def needs_compositor(blend_mode: str, clipping: bool = False) -> bool:
+    """该图层是否需要本合成器（SDL 直接贴图只能处理 NORMAL + 不透明度）"""
+    return clipping or blend_mode not in _SIMPLE_MODES
+
+
+def _blend(mode: str, cb: np.ndarray, cs: np.ndarray) -> np.ndarray:
+    """非预乘颜色的混合函数 B(Cb, Cs)"""
+    if mode == "MULTIPLY":
+        return cb * cs
+    if mode == "SCREEN":
+        return cb + cs - cb * cs
+    if mode == "OVERLAY":
+        return np.where(cb <= 0.5, 2.0 * cb * cs, 1.0 - 2.0 * (1.0 - cb) * (1.0 - cs))
+    return cs
+
+
+class PremultipliedCanvas:
+    """预乘alpha的 float32 画布，所有图层都在同一块缓冲区上原地合成"""
+
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        self.buffer = np.zeros((height, width, 4), dtype=np.float32)
+        # 当前剪贴组基底图层：(画布行, 画布列, 该区域内的alpha)
+        self._clip_base: Optional[Tuple[slice, slice, np.ndarray]] = None
+
+    def _region(self, x: int, y: int, w: int, h: int) -> Optional[Tuple[slice, slice, slice, slice]]:
+        """图层与画布的交集，返回 (画布行, 画布列, 图层行, 图层列)"""
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + w, self.width), min(y + h, self.height)
+        if x1 <= x0 or y1 <= y0:
+            return None
+        return (slice(y0, y1), slice(x0, x1),
+                slice(y0 - y, y1 - y), slice(x0 - x, x1 - x))
+
+    def _clip_mask(self, cy: slice, cx: slice) -> np.ndarray:
+        """取基底图层在指定画布区域内的 alpha，基底之外为0"""
+        mask = np.zeros((cy.stop - cy.start, cx.stop - cx.start), dtype=np.float32)
+        if self._clip_base is None:
+            return mask
+        by, bx, alpha = self._clip_base
+        y0, y1 = max(cy.start, by.start), min(cy.stop, by.stop)
+        x0, x1 = max(cx.start, bx.start), min(cx.stop, bx.stop)
+        if y1 > y0 and x1 > x0:
+            mask[y0 - cy.start:y1 - cy.start, x0 - cx.start:x1 - cx.start] = \
+                alpha[y0 - by.start:y1 - by.start, x0 - bx.start:x1 - bx.start]
+        return mask
+
+    def composite(self, rgba, width: int, height: int, x: int, y: int,
+                  blend_mode: str = "NORMAL", opacity: int = 255, clipping: bool = False):
+        """
+        把一个非预乘的 RGBA8 图层合成到 (x, y)
+        rgba: 支持缓冲区协议的 width*height*4 字节数据
+        """
+        src = np.frombuffer(rgba, dtype=np.uint8).reshape(height, width, 4)
+        region = self._region(x, y, width, height)
+
+        if region is None:
+            if not clipping:
+                self._clip_base = None
+            return
+        cy, cx, sy, sx = region
+
+        src = src[sy, sx].astype(np.float32)
+        src *= 1.0 / 255.0
+        alpha_s = src[..., 3]
+        if opacity < 255:
+            alpha_s *= opacity / 255.0
+
+        if clipping:
+            alpha_s *= self._clip_mask(cy, cx)
+        else:
+            # 新的剪贴组基底，记录它的 alpha 供后续剪贴图层使用
+            self._clip_base = (cy, cx, alpha_s.copy())
+
+        dst = self.buffer[cy, cx]
+        alpha_b = dst[..., 3]
+        alpha_s3 = alpha_s[..., None]
+        color_s = src[..., :3]
+
+        if blend_mode in ("MULTIPLY", "SCREEN", "OVERLAY"):
+            # Cb = Cb' / αb（透明处取0）
+            color_b = np.divide(dst[..., :3], alpha_b[..., None],
+                                out=np.zeros_like(color_s), where=alpha_b[..., None] > 0)
+            mixed = _blend(blend_mode, color_b, color_s)
+            # Cs'(1-αb) + αs·αb·B  ==  αs·((1-αb)·Cs + αb·B)
+            mixed *= alpha_b[..., None]
+            mixed += color_s * (1.0 - alpha_b[..., None])
+            mixed *= alpha_s3
+        else:
+            mixed = color_s * alpha_s3
+
+        # Cb'(1 - αs) 原地完成
+        dst[..., :3] *= 1.0 - alpha_s3
+        dst[..., :3] += mixed
+        dst[..., 3] *= 1.0 - alpha_s
+        dst[..., 3] += alpha_s
+
+    def to_rgba8(self) -> np.ndarray:
+        """输出非预乘的 RGBA8 连续数组（可直接作为缓冲区交给DLL）"""
+        alpha = self.buffer[..., 3:4]
+        out = np.divide(self.buffer, alpha, out=np.zeros_like(self.buffer), where=alpha > 0)
+        out[..., 3:4] = alpha
+        np.clip(out, 0.0, 1.0, out=out)
+        out *= 255.0
+        out += 0.5
+        return np.ascontiguousarray(out, dtype=np.uint8)
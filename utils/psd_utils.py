@@ -5,8 +5,10 @@ psd_tooli.py
 主要函数
 ----------------
 inspect_psd(path:str) -> dict
+compile_recipe(path:str, pose:str, clothing:str|None=None,
+               action:str|None=None, expression:str|None=None) -> PSDRecipe
 compose_image(path:str, pose:str, clothing:str|None=None,
-              action:str|None=None, expression:str|None=None) -> PIL.Image
+              action:str|None=None, expression:str|None=None) -> PSDComposite
 
 目前支持以下图层结构：
 A:
@@ -36,23 +38,124 @@ B:
 
 from __future__ import annotations
 
+import os
 import threading
-from functools import lru_cache
-from typing import Dict, List, Optional, Tuple
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
 
 from psd_tools import PSDImage
-from PIL import Image
+
+from utils.psd_compositor import PremultipliedCanvas, needs_compositor
+from utils.render_gate import wait_idle
 
 # ---------- 缓存 ----------
-_CACHE_LOCK = threading.RLock()
-_CACHE_SIZE = 8
+# 按估算字节数淘汰，至少保留最近使用的一个
+_CACHE_BUDGET = 512 * 1024 * 1024
+
+
+class _PSDHandle(NamedTuple):
+    """缓存中的一个PSD：文档、预编译索引和估算占用"""
+    psd: PSDImage
+    index: "_PSDIndex"
+    nbytes: int
+
+
+# 每个图层的对象开销（解析记录、图层包装和索引条目）的粗略估计
+_LAYER_OVERHEAD = 4 * 1024
+
+
+def _estimate_psd_nbytes(psd: PSDImage, index: "_PSDIndex", path: str) -> int:
+    """
+    估算已解析文档的内存占用
+    psd-tools 打开时把各通道的（压缩）数据和合并图像数据读成 bytes 留在文档里，
+    解码出的图层不留在文档中，由图层解码缓存按解码后的大小另行计算
+    """
+    try:
+        record = psd._record
+        nbytes = len(record.image_data.data)
+        layer_info = record.layer_and_mask_information.layer_info
+        for channels in (layer_info.channel_image_data if layer_info else None) or ():
+            nbytes += sum(len(channel.data) for channel in channels)
+    except AttributeError:
+        nbytes = os.path.getsize(path)
+    return nbytes + _LAYER_OVERHEAD * len(index.layers_by_id)
+
+
+class _PSDDocumentCache:
+    """
+    线程安全的 PSD 文档缓存（进程内）
+    同一路径的并发加载只解析一次，其余线程等待同一个结果
+    加载期间被 invalidate() 的结果只交给等待的线程，不放入缓存
+    """
+
+    def __init__(self, budget_bytes: int):
+        self.budget_bytes = budget_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, _PSDHandle]" = OrderedDict()
+        self._loading: Dict[str, Future] = {}
+        self._bytes = 0
+        # 每次 invalidate() 递增，加载开始后变化说明结果可能已过期
+        self._generation = 0
+
+    def get(self, path: str) -> _PSDHandle:
+        with self._lock:
+            handle = self._entries.get(path)
+            if handle is not None:
+                self._entries.move_to_end(path)
+                return handle
+            future = self._loading.get(path)
+            owner = future is None
+            if owner:
+                future = self._loading[path] = Future()
+            generation = self._generation
+
+        if not owner:
+            return future.result()
+
+        try:
+            psd = PSDImage.open(path)
+            index = _PSDIndex(psd)
+            handle = _PSDHandle(psd, index, _estimate_psd_nbytes(psd, index, path))
+        except BaseException as e:
+            with self._lock:
+                if self._loading.get(path) is future:
+                    del self._loading[path]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            if self._loading.get(path) is future:
+                del self._loading[path]
+            if generation != self._generation:
+                future.set_result(handle)
+                return handle
+            self._entries[path] = handle
+            self._bytes += handle.nbytes
+            while len(self._entries) > 1 and self._bytes > self.budget_bytes:
+                _, old = self._entries.popitem(last=False)
+                self._bytes -= old.nbytes
+        future.set_result(handle)
+        return handle
+
+    def invalidate(self, path: Optional[str] = None):
+        """丢弃指定PSD（或全部）的缓存，正在进行的加载结果也不再放入缓存"""
+        with self._lock:
+            self._generation += 1
+            for key in [k for k in self._entries if path is None or k == path]:
+                self._bytes -= self._entries.pop(key).nbytes
+            # 之后的 get() 重新加载，不再等待加载中的旧文件
+            for key in [k for k in self._loading if path is None or k == path]:
+                del self._loading[key]
+
+
+_PSD_CACHE = _PSDDocumentCache(_CACHE_BUDGET)
 
 
-@lru_cache(maxsize=_CACHE_SIZE)
 def _load_psd(path: str) -> PSDImage:
     """线程安全的 PSD 缓存（进程内）"""
-    with _CACHE_LOCK:
-        return PSDImage.open(path)
+    return _PSD_CACHE.get(path).psd
 
 
 # ---------- 小工具 ----------
@@ -80,6 +183,96 @@ def _leaf_names(group) -> List[str]:
             names.append(clean_name)
     return names
 
+
+# ---------- 预编译索引 ----------
+class _PSDIndex:
+    """
+    PSD 图层树的预编译索引，每个 PSD 只构建一次
+
+    nodes:              (干净名字, ...) 路径 -> 图层，同名时取第一个
+    layers_by_id:       图层id -> 图层，供合成配方查找
+    pose_actions:       姿态 -> 姿态下"动作"组的动作列表
+    pose_expressions:   姿态 -> 姿态下"表情"组的 (筛选器列表, {筛选器: 表情列表})
+    cloth_expressions:  (姿态, 服装) -> 服装下"表情"组的 (筛选器列表, {筛选器: 表情列表})
+    """
+
+    def __init__(self, psd):
+        self.nodes: Dict[Tuple[str, ...], object] = {}
+        self.layers_by_id: Dict[int, object] = {}
+        self.pose_actions: Dict[str, List[str]] = {}
+        self.pose_expressions: Dict[str, Tuple[List[str], Dict[str, List[str]]]] = {}
+        self.cloth_expressions: Dict[Tuple[str, str], Tuple[List[str], Dict[str, List[str]]]] = {}
+        # (姿态, 服装, 动作, 表情) -> 合成配方，由 compile_recipe 按需填充
+        self.recipes: Dict[Tuple, "PSDRecipe"] = {}
+
+        self._index_nodes(psd, ())
+        self._compile_options(psd)
+
+    def _index_nodes(self, group, prefix: Tuple[str, ...]):
+        """记录每个图层的路径，同名图层只保留第一个（与 next(...) 查找一致）"""
+        for layer in group:
+            path = prefix + (_clean(layer.name),)
+            self.nodes.setdefault(path, layer)
+            self.layers_by_id[layer.layer_id] = layer
+            if layer.is_group():
+                self._index_nodes(layer, path)
+
+    def _compile_options(self, psd):
+        """预先计算每个 (姿态, 服装) 的动作和表情选项"""
+        pose_root = _find_group(psd, "姿态")
+        if pose_root is None:
+            return
+
+        seen_poses = set()
+        for pose_grp in pose_root:
+            if not pose_grp.is_group():
+                continue
+            pose = _clean(pose_grp.name)
+            if pose in seen_poses:
+                continue
+            seen_poses.add(pose)
+
+            pose_actions = _find_group(pose_grp, "动作")
+            if pose_actions:
+                self.pose_actions[pose] = _leaf_names(pose_actions)
+
+            expr_root = _find_group(pose_grp, "表情")
+            if expr_root:
+                self.pose_expressions[pose] = _extract_emotion_filters(expr_root)
+
+            pose_clothes_root = _find_group(pose_grp, "服装")
+            if not pose_clothes_root:
+                continue
+            seen = set()
+            for item in pose_clothes_root:
+                cloth = _clean(item.name)
+                if cloth in seen:
+                    continue
+                seen.add(cloth)
+                if not item.is_group():
+                    continue
+                cloth_expr_root = _find_group(item, "表情")
+                if cloth_expr_root:
+                    self.cloth_expressions[(pose, cloth)] = _extract_emotion_filters(cloth_expr_root)
+
+    def expression_options(self, pose: str, clothing: Optional[str]) -> Tuple[List[str], Dict[str, List[str]]]:
+        """优先服装层级，其次姿态层级"""
+        result = None
+        if clothing:
+            result = self.cloth_expressions.get((pose, clothing))
+        if result is None:
+            result = self.pose_expressions.get(pose)
+        if result is None:
+            return [], {}
+        # 返回副本，避免调用方修改缓存
+        filters, options = result
+        return list(filters), {k: list(v) for k, v in options.items()}
+
+
+def _get_psd_index(path: str) -> _PSDIndex:
+    """每个 PSD 只构建一次索引，随文档一起缓存"""
+    return _PSD_CACHE.get(path).index
+
 # ---------- 1. 解析 ----------
 def inspect_psd(path: str) -> dict:
     """
@@ -259,14 +452,8 @@ def get_action_options(chara_id: str, pose: str, clothing: str) -> List[str]:
             return pose_info.get("clothes", {}).get(clothing, [])
         else:
             # 动作可能在姿态内直接的动作组
-            psd = _load_psd(_get_psd_path(chara_id))
-            pose_root = _find_group(psd, "姿态")
-            if pose_root:
-                pose_grp = next((g for g in pose_root if _clean(g.name) == pose), None)
-                if pose_grp:
-                    pose_actions = _find_group(pose_grp, "动作")
-                    if pose_actions:
-                        return _leaf_names(pose_actions)
+            index = _get_psd_index(_get_psd_path(chara_id))
+            return list(index.pose_actions.get(pose, []))
     elif pose_info.get("actions_source") == "global":
         # 结构A：使用全局动作
         return psd_info.get("global_actions", [])
@@ -284,32 +471,9 @@ def get_expression_options(chara_id: str, pose: str, clothing: str = None) -> Tu
     if not psd_info:
         return [], {}
     
-    # 获取表情根组
-    psd = _load_psd(_get_psd_path(chara_id))
-    pose_root = _find_group(psd, "姿态")
-    if not pose_root:
-        return [], {}
-    
-    pose_grp = next((g for g in pose_root if g.is_group() and _clean(g.name) == pose), None)
-    if not pose_grp:
-        return [], {}
-    
-    # 优先检查服装层级
-    if clothing:
-        pose_clothes_root = _find_group(pose_grp, "服装")
-        if pose_clothes_root:
-            target_cloth = next((item for item in pose_clothes_root if _clean(item.name) == clothing), None)
-            if target_cloth and target_cloth.is_group():
-                cloth_expr_root = _find_group(target_cloth, "表情")
-                if cloth_expr_root:
-                    return _extract_emotion_filters(cloth_expr_root)
-    
-    # 检查姿态层级
-    expr_root = _find_group(pose_grp, "表情")
-    if expr_root:
-        return _extract_emotion_filters(expr_root)
-    
-    return [], {}
+    # 直接查预编译索引，不再遍历图层
+    index = _get_psd_index(_get_psd_path(chara_id))
+    return index.expression_options(pose, clothing)
 
 
 def _extract_emotion_filters(expr_root) -> tuple[List[str], Dict[str, List[str]]]:
@@ -349,15 +513,118 @@ def _layer_topil(layer):
     return layer.composite()
 
 
-def compose_image(path: str, pose: str,
-                  clothing: Optional[str] = None,
-                  action: Optional[str] = None,
-                  expression: Optional[str] = None,
-                  filter_name: Optional[str] = None) -> Image.Image:
+def _layer_rgba(layer) -> Optional[Tuple[bytes, int, int]]:
+    """解码图层为 (RGBA字节, 宽, 高)，空图层返回 None"""
+    im = _layer_topil(layer)
+    if im is None:
+        return None
+    if im.mode != "RGBA":
+        im = im.convert("RGBA")
+    return im.tobytes(), im.width, im.height
+
+
+class RecipeLayer(NamedTuple):
+    """合成配方中的一个图层：图层id、在PSD画布上的包围盒、混合模式、不透明度和是否为剪贴图层"""
+    layer_id: int
+    left: int
+    top: int
+    right: int
+    bottom: int
+    blend_mode: str = "NORMAL"
+    opacity: int = 255
+    clipping: bool = False
+
+
+class PSDRecipe(NamedTuple):
+    """
+    一次选择 (姿态, 服装, 动作, 表情) 编译出的不可变合成配方
+    base 先按顺序合成，fore 最后覆盖
+    """
+    size: Tuple[int, int]
+    base: Tuple[RecipeLayer, ...]
+    fore: Tuple[RecipeLayer, ...]
+
+    @property
+    def bbox(self) -> Tuple[int, int, int, int]:
+        """所有可见图层的并集包围盒 (left, top, right, bottom)，裁剪到画布内"""
+        w, h = self.size
+        boxes = [(max(0, step.left), max(0, step.top), min(w, step.right), min(h, step.bottom))
+                 for step in self.base + self.fore]
+        boxes = [box for box in boxes if box[2] > box[0] and box[3] > box[1]]
+        if not boxes:
+            return (0, 0, w, h)
+        return (min(box[0] for box in boxes), min(box[1] for box in boxes),
+                max(box[2] for box in boxes), max(box[3] for box in boxes))
+
+    def to_dict(self) -> dict:
+        """序列化为可 JSON 化的 dict，便于批处理或其他进程复用"""
+        return {
+            "size": list(self.size),
+            "base": [list(step) for step in self.base],
+            "fore": [list(step) for step in self.fore],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "PSDRecipe":
+        """从 to_dict 的结果还原配方"""
+        return cls(
+            size=tuple(data["size"]),
+            base=tuple(RecipeLayer(*step) for step in data.get("base", [])),
+            fore=tuple(RecipeLayer(*step) for step in data.get("fore", [])),
+        )
+
+
+class PSDComposite(NamedTuple):
+    """
+    C++端的合成结果
+    只合成了配方包围盒内的区域，bbox 记录该区域在整张PSD中的位置
+    """
+    index: int
+    bbox: Tuple[int, int, int, int]
+    size: Tuple[int, int]
+
+    def position_offset(self, align: str, scale: float) -> Tuple[int, int]:
+        """
+        计算裁剪后需要额外加到组件偏移上的量，
+        使裁剪图按 align 对齐并缩放 scale 倍后，与整张PSD的绘制位置一致
+        """
+        align = align or "top-left"
+        left, top, right, bottom = self.bbox
+        w, h = self.size
+
+        def _axis(start: int, end: int, full: int, far: str, mid: str) -> int:
+            if far in align:
+                return round(-(full - end) * scale)
+            if mid in align:
+                return round(start * scale - (full - (end - start)) * scale / 2)
+            return round(start * scale)
+
+        return (_axis(left, right, w, "right", "center"),
+                _axis(top, bottom, h, "bottom", "middle"))
+
+
+def _recipe_layer(layer) -> RecipeLayer:
+    """把 psd-tools 图层转换成配方步骤"""
+    l, t, r, b = layer.bbox
+    blend_mode = getattr(layer.blend_mode, "name", str(layer.blend_mode))
+    clipping = bool(getattr(layer, "clipping_layer", False))
+    return RecipeLayer(layer.layer_id, l, t, r, b, blend_mode, int(layer.opacity), clipping)
+
+
+def compile_recipe(path: str, pose: str,
+                   clothing: Optional[str] = None,
+                   action: Optional[str] = None,
+                   expression: Optional[str] = None) -> PSDRecipe:
     """
-    重构后的图像合成函数 - 深度优先遍历版本
-    只合成指定的图层 + 在选项层级中发现的BASE/FORE图层
+    把一次选择编译成合成配方，按PSD缓存
+    深度优先遍历，只进入选中的选项组 + 在选项层级中发现的BASE/FORE图层
     """
+    index = _get_psd_index(path)
+    key = (pose, clothing, action, expression)
+    recipe = index.recipes.get(key)
+    if recipe is not None:
+        return recipe
+
     psd = _load_psd(path)
     pose_root = _find_group(psd, "姿态")
     if not pose_root:
@@ -401,8 +668,9 @@ def compose_image(path: str, pose: str,
                         found_clothing = True
                         if target_cloth.is_group():
                             # 收集服装下的所有图层（但不包括选项组）
+                            prefixes = ("BASE", "FORE", action) if action else ("BASE", "FORE")
                             for child in target_cloth:
-                                if not child.is_group() and child.name.startswith(("BASE", "FORE", action)):
+                                if not child.is_group() and child.name.startswith(prefixes):
                                     base_stack.append(child)
                         else:
                             base_stack.append(target_cloth)
@@ -471,30 +739,361 @@ def compose_image(path: str, pose: str,
     # 从PSD根开始深度遍历
     collect_layers(psd)
     
+    recipe = PSDRecipe(
+        size=tuple(psd.size),
+        base=tuple(_recipe_layer(layer) for layer in base_stack),
+        fore=tuple(_recipe_layer(layer) for layer in fore_stack),
+    )
+    index.recipes[key] = recipe
+    return recipe
+
+
+# ---------- 并行栅格化 ----------
+# psd-tools 解码图层的耗时主要在 zlib 解压和 numpy 运算上，这些都会释放 GIL，用线程池并行
+# （RLE 解码在发布的 wheel 里是编译扩展，不构成瓶颈）
+_RASTER_WORKERS = max(1, min(8, os.cpu_count() or 1))
+_RASTER_POOL_LOCK = threading.Lock()
+_raster_pool = None
+
+
+def _get_raster_pool():
+    """按需创建栅格化线程池"""
+    global _raster_pool
+    with _RASTER_POOL_LOCK:
+        if _raster_pool is None:
+            _raster_pool = ThreadPoolExecutor(max_workers=_RASTER_WORKERS, thread_name_prefix="psd-raster")
+        return _raster_pool
+
+
+def _rasterize_layer_ids(path: str, layer_ids: List[int]) -> list:
+    """按图层id解码为RGBA数据"""
+    index = _get_psd_index(path)
+    return [_layer_rgba(index.layers_by_id[layer_id]) for layer_id in layer_ids]
+
+
+# ---------- 图层解码缓存 ----------
+# 按字节数限制的 LRU，键为 (路径, 图层id)，值为 _layer_rgba 的结果
+_RASTER_CACHE_LOCK = threading.Lock()
+_raster_cache: "OrderedDict[Tuple[str, int], Optional[Tuple[bytes, int, int]]]" = OrderedDict()
+_raster_cache_bytes = 0
+_raster_cache_budget = 256 * 1024 * 1024
+
+
+def _raster_nbytes(raster) -> int:
+    return len(raster[0]) if raster else 0
+
+
+def _evict_rasters():
+    """淘汰最久未用的图层直到不超预算（调用方持有锁）"""
+    global _raster_cache_bytes
+    while _raster_cache and _raster_cache_bytes > _raster_cache_budget:
+        _, old = _raster_cache.popitem(last=False)
+        _raster_cache_bytes -= _raster_nbytes(old)
+
+
+def set_raster_cache_budget(budget_bytes: int):
+    """设置图层解码缓存的内存上限"""
+    global _raster_cache_budget
+    with _RASTER_CACHE_LOCK:
+        _raster_cache_budget = max(0, int(budget_bytes))
+        _evict_rasters()
+
+
+def clear_raster_cache(path: Optional[str] = None):
+    """清空图层解码缓存，指定 path 时只清该PSD"""
+    global _raster_cache_bytes
+    with _RASTER_CACHE_LOCK:
+        for key in [k for k in _raster_cache if path is None or k[0] == path]:
+            _raster_cache_bytes -= _raster_nbytes(_raster_cache.pop(key))
+
+
+def _cache_raster(key: Tuple[str, int], raster, evict: bool = True) -> bool:
+    """
+    写入图层解码缓存
+    evict=False 时不淘汰旧图层，超出预算直接返回 False（供预热使用）
+    """
+    global _raster_cache_bytes
+    size = _raster_nbytes(raster)
+    with _RASTER_CACHE_LOCK:
+        if key in _raster_cache:
+            return True
+        if not evict and _raster_cache_bytes + size > _raster_cache_budget:
+            return False
+        _raster_cache[key] = raster
+        _raster_cache_bytes += size
+        _evict_rasters()
+        return key in _raster_cache
+
+
+def _rasterize(path: str, steps: Tuple[RecipeLayer, ...]) -> list:
+    """并行解码配方中的图层，返回与 steps 顺序一致的 (RGBA字节, 宽, 高) 列表"""
+    # 同一图层可能在配方里出现多次，只解码一次；已缓存的图层直接复用
+    by_id = {}
+    with _RASTER_CACHE_LOCK:
+        for step in steps:
+            key = (path, step.layer_id)
+            if key in _raster_cache:
+                _raster_cache.move_to_end(key)
+                by_id[step.layer_id] = _raster_cache[key]
+    unique_ids = [i for i in dict.fromkeys(step.layer_id for step in steps) if i not in by_id]
+
+    if not unique_ids:
+        decoded = []
+    elif len(unique_ids) == 1:
+        decoded = _rasterize_layer_ids(path, unique_ids)
+    else:
+        index = _get_psd_index(path)
+        layers = [index.layers_by_id[layer_id] for layer_id in unique_ids]
+        decoded = list(_get_raster_pool().map(_layer_rgba, layers))
+
+    for layer_id, raster in zip(unique_ids, decoded):
+        by_id[layer_id] = raster
+        _cache_raster((path, layer_id), raster)
+    return [by_id[step.layer_id] for step in steps]
+
+
+# ---------- 后台预热 ----------
+# 真正的渲染进行时，预热线程在每个图层之间让出（见 utils.render_gate）
+
+
+class PSDWarmup:
+    """
+    空闲时在后台预解码当前 (姿态, 服装, 动作) 下所有表情的图层
+    受时间预算和图层解码缓存的内存预算限制
+    """
+
+    def __init__(self):
+        self._thread: Optional[threading.Thread] = None
+        self._cancel = threading.Event()
+        self._key = None
+
+    def start(self, path: str, pose: str, clothing: Optional[str], action: Optional[str],
+              time_budget: float = 30.0,
+              on_progress: Optional[Callable[[int, int, Optional[str]], None]] = None):
+        """
+        开始预热，同一选择已在预热时忽略
+        on_progress(已完成表情数, 表情总数, 结束原因)，结束原因为 None 表示仍在进行
+        """
+        key = (path, pose, clothing, action)
+        if key == self._key and self._thread and self._thread.is_alive():
+            return
+        self.cancel()
+        self._key = key
+        self._cancel = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, args=(key, self._cancel, time_budget, on_progress),
+            name="psd-warmup", daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        """停止当前预热"""
+        self._cancel.set()
+        self._key = None
+
+    @staticmethod
+    def _wait_idle(cancel: threading.Event) -> bool:
+        """等待前台渲染结束，被取消时返回 False"""
+        return wait_idle(cancel)
+
+    def _warm_recipe(self, path: str, recipe: PSDRecipe, cancel: threading.Event, deadline: float) -> Optional[str]:
+        """预解码一个配方的图层，需要停止时返回原因"""
+        index = _get_psd_index(path)
+        for step in recipe.base + recipe.fore:
+            if not self._wait_idle(cancel):
+                return "已取消"
+            if time.monotonic() > deadline:
+                return "达到时间预算"
+            cache_key = (path, step.layer_id)
+            with _RASTER_CACHE_LOCK:
+                cached = cache_key in _raster_cache
+            if cached:
+                continue
+            raster = _layer_rgba(index.layers_by_id[step.layer_id])
+            if not _cache_raster(cache_key, raster, evict=False):
+                return "达到内存预算"
+        return None
+
+    def _run(self, key, cancel: threading.Event, time_budget: float, on_progress):
+        path, pose, clothing, action = key
+        deadline = time.monotonic() + time_budget
+        done = total = 0
+        reason = "完成"
+
+        try:
+            _, options = _get_psd_index(path).expression_options(pose, clothing)
+            expressions = list(dict.fromkeys(e for names in options.values() for e in names))
+            total = len(expressions)
+            for expression in expressions:
+                if not self._wait_idle(cancel):
+                    return
+                recipe = compile_recipe(path, pose, clothing, action, expression)
+                stop = self._warm_recipe(path, recipe, cancel, deadline)
+                if stop:
+                    reason = stop
+                    break
+                done += 1
+                if on_progress:
+                    on_progress(done, total, None)
+        except Exception as e:
+            reason = f"出错: {e}"
+
+        if on_progress and not cancel.is_set():
+            on_progress(done, total, reason)
+
+
+PSD_WARMUP = PSDWarmup()
+
+
+# ---------- 基础层缓存 ----------
+# 切换表情时姿态/服装/动作不变，把 base 栈合成结果留在C++端，之后只叠加表情图层
+# 键为 (路径, base栈)，值为 (C++基础层句柄, 基础层包围盒)
+_BASE_CACHE_SIZE = 4
+_BASE_CACHE_LOCK = threading.Lock()
+_base_cache: "OrderedDict[tuple, Tuple[int, Tuple[int, int, int, int]]]" = OrderedDict()
+# 正在合成的基础层，同一个键只合成一次，其余线程等待结果
+_base_loading: Dict[tuple, Future] = {}
+
+
+def _needs_compositor(steps: Tuple[RecipeLayer, ...]) -> bool:
+    """是否有C++直接贴图处理不了的图层（混合模式、剪贴蒙版）"""
+    return any(needs_compositor(step.blend_mode, step.clipping) for step in steps)
+
+
+def _add_steps(loader, path: str, steps: Tuple[RecipeLayer, ...],
+               ox: int, oy: int, width: int, height: int):
+    """解码并把图层一次性交给C++，坐标相对 (ox, oy)，画布大小 width x height"""
+    images = _rasterize(path, steps)
+    if _needs_compositor(steps):
+        # 在预乘alpha画布上按混合模式合成，结果作为一个图层交给C++
+        canvas = PremultipliedCanvas(width, height)
+        for step, raster in zip(steps, images):
+            if raster:
+                canvas.composite(raster[0], raster[1], raster[2], step.left - ox, step.top - oy,
+                                 step.blend_mode, step.opacity, step.clipping)
+        loader.add_psd_layers([(canvas.to_rgba8(), width, height, 0, 0, 255)])
+        return
+    loader.add_psd_layers([
+        (raster[0], raster[1], raster[2], step.left - ox, step.top - oy, step.opacity)
+        for step, raster in zip(steps, images) if raster
+    ])
+
+
+def _get_base(loader, path: str, recipe: PSDRecipe) -> Optional[Tuple[int, Tuple[int, int, int, int]]]:
+    """取得配方 base 栈的C++基础层，没有则合成并缓存；DLL不支持时返回 None"""
+    if not recipe.base or not getattr(loader, "psd_base_supported", False):
+        return None
+
+    key = (path, recipe.base)
+    with _BASE_CACHE_LOCK:
+        entry = _base_cache.get(key)
+        if entry is not None:
+            _base_cache.move_to_end(key)
+            return entry
+        future = _base_loading.get(key)
+        owner = future is None
+        if owner:
+            future = _base_loading[key] = Future()
+
+    if not owner:
+        return future.result()
+
+    try:
+        bbox = PSDRecipe(recipe.size, recipe.base, ()).bbox
+        if not loader.start_psd_composition(bbox[2] - bbox[0], bbox[3] - bbox[1]):
+            raise RuntimeError("Failed to start PSD composition")
+        _add_steps(loader, path, recipe.base, bbox[0], bbox[1], bbox[2] - bbox[0], bbox[3] - bbox[1])
+        handle = loader.finish_psd_base()
+    except BaseException as e:
+        with _BASE_CACHE_LOCK:
+            if _base_loading.get(key) is future:
+                del _base_loading[key]
+        future.set_exception(e)
+        raise
+
+    entry = (handle, bbox) if handle >= 0 else None
+    released = []
+    with _BASE_CACHE_LOCK:
+        if _base_loading.get(key) is future:
+            del _base_loading[key]
+        elif entry is not None:
+            # 合成期间被 clear_base_cache 丢弃，结果可能已过期，不缓存也不使用
+            released.append(handle)
+            entry = None
+        if entry is not None:
+            _base_cache[key] = entry
+            while len(_base_cache) > _BASE_CACHE_SIZE:
+                _, (old_handle, _) = _base_cache.popitem(last=False)
+                released.append(old_handle)
+    for old_handle in released:
+        loader.release_psd_base(old_handle)
+    future.set_result(entry)
+    return entry
+
+
+def clear_base_cache(path: Optional[str] = None):
+    """释放缓存的基础层，指定 path 时只释放该PSD的"""
+    from image_processor import get_enhanced_loader
+    with _BASE_CACHE_LOCK:
+        keys = [k for k in _base_cache if path is None or k[0] == path]
+        entries = [_base_cache.pop(k) for k in keys]
+        # 合成中的旧基础层不再被等待，之后的请求重新合成
+        for key in [k for k in _base_loading if path is None or k[0] == path]:
+            del _base_loading[key]
+    if entries:
+        loader = get_enhanced_loader()
+        for handle, _ in entries:
+            loader.release_psd_base(handle)
+
+
+def invalidate_psd(path: Optional[str] = None):
+    """PSD文件变化后丢弃它的文档、解码图层和基础层缓存，path 为 None 时全部丢弃"""
+    if path is None or (PSD_WARMUP._key and PSD_WARMUP._key[0] == path):
+        PSD_WARMUP.cancel()
+    _PSD_CACHE.invalidate(path)
+    clear_raster_cache(path)
+    clear_base_cache(path)
+
+
+def compose_recipe(path: str, recipe: PSDRecipe) -> PSDComposite:
+    """执行合成配方，只在图层包围盒范围内分配画布，返回合成结果"""
     # 获取增强的图像加载器
     from image_processor import get_enhanced_loader
     loader = get_enhanced_loader()
     
-    # 开始PSD合成
-    w, h = psd.size
-    if not loader.start_psd_composition(w, h):
-        raise RuntimeError("Failed to start PSD composition")
-    
-    # 合成基础栈
-    for layer in base_stack:
-        im = _layer_topil(layer)
-        if im:
-            l, t, _, _ = layer.bbox
-            # 使用C++合成而不是PIL
-            loader.add_psd_layer(im, l, t)
-    
-    # 合成顶层栈
-    for layer in fore_stack:
-        im = _layer_topil(layer)
-        if im:
-            l, t, _, _ = layer.bbox
-            loader.add_psd_layer(im, l, t)
+    bbox = recipe.bbox
+    ox, oy = bbox[0], bbox[1]
+    width, height = bbox[2] - ox, bbox[3] - oy
+
+    # 优先复制缓存的基础层，只叠加顶层栈（表情），顶层图层只贴在各自的包围盒内
+    # 结果要作为独立的表面留在C++端的合成缓存里（之后还会缩放绘制），而基础层要给后续表情复用，
+    # 所以不能直接在基础层上叠加，至少要复制一次；顶层栈没有超出基础层时画布就是基础层大小，整块复制
+    # 顶层栈需要混合模式时要读底色，只能整体在NumPy中合成
+    base = None if _needs_compositor(recipe.fore) else _get_base(loader, path, recipe)
+    if base is not None:
+        handle, (bx, by, _, _) = base
+        if not loader.start_psd_composition_from_base(handle, width, height, bx - ox, by - oy):
+            raise RuntimeError("Failed to start PSD composition")
+        _add_steps(loader, path, recipe.fore, ox, oy, width, height)
+    else:
+        # 开始PSD合成，画布只覆盖可见区域
+        if not loader.start_psd_composition(width, height):
+            raise RuntimeError("Failed to start PSD composition")
+        # 先合成基础栈，再合成顶层栈，整个配方一次性交给C++
+        _add_steps(loader, path, recipe.base + recipe.fore, ox, oy, width, height)
     
     # 结束合成并返回索引
     psd_index = loader.finish_psd_composition()
-    return psd_index
\ No newline at end of file
+    return PSDComposite(psd_index, bbox, tuple(recipe.size))
+
+
+def compose_image(path: str, pose: str,
+                  clothing: Optional[str] = None,
+                  action: Optional[str] = None,
+                  expression: Optional[str] = None,
+                  filter_name: Optional[str] = None) -> PSDComposite:
+    """
+    合成指定选择的PSD图片，返回C++端的合成结果（缓存索引和裁剪区域）
+    同一选择的图层遍历只做一次，之后直接执行缓存的配方
+    """
+    recipe = compile_recipe(path, pose, clothing, action, expression)
+    return compose_recipe(path, recipe)
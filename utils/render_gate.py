@@ -0,0 +1,56 @@
+"""
+render_gate.py
+前台渲染与后台预热之间的协调。
+
+前台渲染（预览、合成）进行时后台预热暂停；后台任务每次只在空闲时执行一小步，
+前台渲染开始前会等正在执行的那一步结束，两者不会同时调用C++渲染器。
+"""
+
+import threading
+from contextlib import contextmanager
+
+_render_lock = threading.Lock()
+_render_depth = 0
+_render_idle = threading.Event()
+_render_idle.set()
+# 后台任务执行一步期间持有
+_background_step = threading.Lock()
+
+
+@contextmanager
+def foreground_render():
+    """标记一次前台渲染，期间后台预热暂停"""
+    global _render_depth
+    with _render_lock:
+        _render_depth += 1
+        _render_idle.clear()
+    try:
+        # 等待正在执行的后台步骤结束
+        with _background_step:
+            pass
+        yield
+    finally:
+        with _render_lock:
+            _render_depth -= 1
+            if _render_depth == 0:
+                _render_idle.set()
+
+
+def wait_idle(cancel: threading.Event) -> bool:
+    """等待前台渲染结束，被取消时返回 False"""
+    while not cancel.is_set():
+        if _render_idle.wait(0.05):
+            return not cancel.is_set()
+    return False
+
+
+@contextmanager
+def background_step(cancel: threading.Event):
+    """在前台空闲时执行一步后台任务，得到 False 表示已被取消"""
+    while wait_idle(cancel):
+        with _background_step:
+            # 拿到锁之前前台渲染可能刚好开始
+            if _render_idle.is_set():
+                yield True
+                return
+    yield False
@@ -1,8 +1,13 @@
 from typing import Optional, Dict, Any, List
+import os
 import re
 
-import openai
 from config import CONFIGS
+from path_utils import get_base_path
+from utils.sentiment_cache import SentimentCache, make_key
+
+# 情感分析提示词版本，修改提示词后递增，旧的缓存结果不再命中
+_PROMPT_VERSION = 1
 
 
 class AIClientManager:
@@ -15,6 +20,7 @@ class AIClientManager:
     def initialize_client(self, client_type: str, config: Dict[str, Any]) -> bool:
         """初始化AI客户端"""
         try:
+            import openai  # 导入较慢，启用情感匹配时才加载
             openai.api_key = config.get("api_key", "")
             openai.base_url = config.get("base_url", "http://localhost:11434/v1/")
             self.current_client = client_type
@@ -28,6 +34,7 @@ class AIClientManager:
     def _test_connection(self, model_name: str) -> bool:
         """测试连接"""
         try:
+            import openai
             # 发送一个简单的测试请求
             response = openai.chat.completions.create(
                 model=model_name,
@@ -47,6 +54,15 @@ class SentimentAnalyzer:
         
         self.selected_emotion = None #用来在generate_image里显示选择的表情
 
+        cache_cfg = CONFIGS.gui_settings.get("sentiment_cache", {})
+        self.cache_enabled = cache_cfg.get("enabled", True)
+        self.cache = SentimentCache(
+            os.path.join(get_base_path(), "config", ".sentiment_cache.sqlite3"),
+            ttl=float(cache_cfg.get("ttl_days", 30)) * 24 * 3600,
+            memory_entries=int(cache_cfg.get("memory_entries", 512)),
+            disk_entries=int(cache_cfg.get("disk_entries", 20000)),
+        )
+
     def initialize(self, client_type: str, config: Dict[str, Any]) -> bool:
         """
         初始化函数 - 使用新的配置结构
@@ -81,13 +97,9 @@ class SentimentAnalyzer:
                 {"role": "user", "content": message}
             ]
 
-            # 获取模型配置
-            models = CONFIGS.get_available_models()
-            current_client = self.client_manager.current_client
-            model_name = models[current_client]["model"] if current_client in models else "deepseek-chat"
-
+            import openai
             response = openai.chat.completions.create(
-                model=model_name,
+                model=self._current_model_name(),
                 messages=messages,
                 temperature=0.2,
                 stream=False
@@ -99,6 +111,12 @@ class SentimentAnalyzer:
             print(f"请求失败: {e}")
             raise
 
+    def _current_model_name(self) -> str:
+        """当前客户端配置的模型名"""
+        models = CONFIGS.get_available_models()
+        current_client = self.client_manager.current_client
+        return models[current_client]["model"] if current_client in models else "deepseek-chat"
+
     def analyze_sentiment_with_options(self, text: str, options: List[str]) -> Optional[str]:
         """
         分析文本并从给定选项中选择最匹配的一项
@@ -118,6 +136,16 @@ class SentimentAnalyzer:
             print("没有提供选项列表")
             return None
         
+        # 同一句话、同一组选项和模型直接复用之前的结果
+        cache_key = None
+        if self.cache_enabled:
+            model = f"{self.client_manager.current_client}/{self._current_model_name()}"
+            cache_key = make_key(text, options, model, _PROMPT_VERSION)
+            cached = self.cache.get(cache_key)
+            if cached in options:
+                print(f"情感分析命中缓存: {cached}")
+                return cached
+
         try:
             # 构建包含选项的提示词
             options_str = ', '.join(options)
@@ -134,8 +162,10 @@ class SentimentAnalyzer:
             response = self._send_request_with_prompt(text, custom_prompt)
             print(f"AI原始回复: {response}")
             
-            # 从回复中提取选项
+            # 从回复中提取选项，只缓存能对应到选项的回复
             selected_option = self._extract_option(response, options)
+            if selected_option and cache_key:
+                self.cache.put(cache_key, selected_option)
             return selected_option if selected_option else (options[0] if options else None)
             
         except Exception as e:
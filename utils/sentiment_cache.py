@@ -0,0 +1,177 @@
+"""
+sentiment_cache.py
+情感分析结果缓存：内存 LRU + SQLite 持久化。
+
+键为 (规范化文本, 排序后的选项, 模型名, 提示词版本) 的哈希，同一句话在同一组选项、
+同一模型和同一版提示词下直接复用上次的结果，不再请求 AI 接口。
+条目超过有效期后失效；内存和数据库各有条数上限，超出时淘汰最久未用的。
+SQLite 不可用或数据库打不开时只用内存缓存。
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+# 数据库结构版本，结构变化时递增，旧表直接丢弃
+_SCHEMA_VERSION = 1
+DEFAULT_TTL = 30 * 24 * 3600
+MEMORY_ENTRIES = 512
+DISK_ENTRIES = 20000
+# 写入多少次检查一次数据库条数
+_TRIM_INTERVAL = 100
+
+_SPACES = re.compile(r"\s+")
+# 句尾的标点和语气符号不影响情感判断，如 "好的" 与 "好的！"、"哈哈哈~~"
+_TRAILING_MARKS = re.compile(r"[\s!！?？。.,，、~～…]+$")
+
+
+def normalize_text(text: str) -> str:
+    """全角半角统一、忽略大小写、合并空白并去掉句尾标点"""
+    text = unicodedata.normalize("NFKC", text or "").casefold()
+    text = _SPACES.sub(" ", text).strip()
+    return _TRAILING_MARKS.sub("", text) or text
+
+
+def make_key(text: str, options: Iterable[str], model: str, prompt_version: int) -> str:
+    """缓存键：规范化文本、排序后的选项、模型名和提示词版本"""
+    raw = json.dumps([normalize_text(text), sorted(options), model, prompt_version], ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class SentimentCache:
+    """两级缓存，线程安全"""
+
+    def __init__(self, db_path: Optional[str] = None, ttl: float = DEFAULT_TTL,
+                 memory_entries: int = MEMORY_ENTRIES, disk_entries: int = DISK_ENTRIES):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.memory_entries = max(1, memory_entries)
+        self.disk_entries = max(1, disk_entries)
+        # 键 -> (结果, 写入时间)
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._db_failed = not db_path
+        self._puts = 0
+        # 本次运行的统计
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.expired = 0
+
+    def _connect(self):
+        """首次访问时打开数据库（需持有锁）"""
+        if self._db is not None or self._db_failed:
+            return self._db
+        try:
+            import sqlite3
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            db = sqlite3.connect(self.db_path, timeout=1.0, isolation_level=None, check_same_thread=False)
+            if db.execute("PRAGMA user_version").fetchone()[0] != _SCHEMA_VERSION:
+                db.execute("DROP TABLE IF EXISTS results")
+                db.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+            db.execute("CREATE TABLE IF NOT EXISTS results ("
+                       "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)")
+            db.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)")
+            db.execute("DELETE FROM results WHERE created < ?", (time.time() - self.ttl,))
+            self._db = db
+        except Exception as e:
+            print(f"情感分析缓存数据库不可用，只使用内存缓存: {e}")
+            self._db_failed = True
+        return self._db
+
+    def _remember(self, key: str, value: str, created: float):
+        """放入内存 LRU（需持有锁）"""
+        self._memory[key] = (value, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[str]:
+        """命中时返回缓存的结果，过期或不存在时返回 None"""
+        now = time.time()
+        with self._lock:
+            item = self._memory.get(key)
+            if item is not None:
+                if now - item[1] <= self.ttl:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return item[0]
+                del self._memory[key]
+                self.expired += 1
+
+            db = self._connect()
+            if db is not None:
+                try:
+                    row = db.execute("SELECT value, created FROM results WHERE key = ?", (key,)).fetchone()
+                    if row is not None and now - row[1] <= self.ttl:
+                        db.execute("UPDATE results SET accessed = ? WHERE key = ?", (now, key))
+                        self._remember(key, row[0], row[1])
+                        self.disk_hits += 1
+                        return row[0]
+                    if row is not None:
+                        db.execute("DELETE FROM results WHERE key = ?", (key,))
+                        self.expired += 1
+                except Exception as e:
+                    print(f"情感分析缓存读取失败: {e}")
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, value: str):
+        """写入两级缓存"""
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+            db = self._connect()
+            if db is None:
+                return
+            try:
+                db.execute("INSERT OR REPLACE INTO results (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                           (key, value, now, now))
+                self._puts += 1
+                if self._puts % _TRIM_INTERVAL == 0:
+                    self._trim(db)
+            except Exception as e:
+                print(f"情感分析缓存写入失败: {e}")
+
+    def _trim(self, db):
+        """删除过期条目，超出条数上限时删除最久未用的（需持有锁）"""
+        db.execute("DELETE FROM results WHERE created < ?", (time.time() - self.ttl,))
+        excess = db.execute("SELECT COUNT(*) FROM results").fetchone()[0] - self.disk_entries
+        if excess > 0:
+            db.execute("DELETE FROM results WHERE key IN "
+                       "(SELECT key FROM results ORDER BY accessed LIMIT ?)", (excess,))
+
+    def clear(self):
+        """清空两级缓存"""
+        with self._lock:
+            self._memory.clear()
+            db = self._connect()
+            if db is not None:
+                db.execute("DELETE FROM results")
+
+    def stats(self) -> Dict[str, float]:
+        """命中统计（本次运行）"""
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "memory_entries": len(self._memory),
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
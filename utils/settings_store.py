@@ -0,0 +1,117 @@
+"""
+settings_store.py
+GUI 设置的持久化：按顶层键做脏检查，只通知变化的键，写盘经过防抖后在后台线程原子完成。
+"""
+
+import atexit
+import copy
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional, Set
+
+import yaml
+
+# 连续修改合并写盘的等待时间（秒）
+SAVE_DEBOUNCE = 0.5
+
+
+class SettingsStore:
+    """
+    包装 gui_settings 字典（调用方仍可直接读写），commit() 时与上次提交的基准逐键比较
+    变化的键通知订阅者，并安排一次防抖写盘
+    """
+
+    def __init__(self, path: str, data: Dict[str, Any], persisted: Optional[Dict[str, Any]] = None,
+                 debounce: float = SAVE_DEBOUNCE, on_saved: Optional[Callable[[str], None]] = None):
+        self.path = path
+        self.data = data
+        self.debounce = debounce
+        self._on_saved = on_saved
+        # 上次提交时各顶层键的值；文件里缺少的键首次提交时视为变化
+        self._baseline: Dict[str, Any] = copy.deepcopy(persisted if persisted is not None else data)
+        self._listeners: List[Callable[[Dict[str, Any]], None]] = []
+
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+        self._pending: Optional[Dict[str, Any]] = None
+        self._write_lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def subscribe(self, listener: Callable[[Dict[str, Any]], None]):
+        """订阅变化，回调参数为 {变化的键: 新值}"""
+        self._listeners.append(listener)
+
+    def set(self, key: str, value: Any) -> Set[str]:
+        """设置一个顶层键并提交"""
+        self.data[key] = value
+        return self.commit()
+
+    def dirty_keys(self) -> Set[str]:
+        """与基准相比发生变化的顶层键"""
+        keys = set(self.data) | set(self._baseline)
+        return {key for key in keys if self.data.get(key) != self._baseline.get(key)}
+
+    def commit(self) -> Set[str]:
+        """提交当前修改：通知变化的键并安排写盘，没有变化时返回空集合"""
+        dirty = self.dirty_keys()
+        if not dirty:
+            return dirty
+
+        changed = {key: copy.deepcopy(self.data[key]) for key in dirty if key in self.data}
+        for key in dirty:
+            if key in self.data:
+                self._baseline[key] = copy.deepcopy(self.data[key])
+            else:
+                self._baseline.pop(key, None)
+
+        for listener in self._listeners:
+            try:
+                listener(changed)
+            except Exception as e:
+                print(f"设置变化通知失败: {e}")
+
+        self._schedule_write()
+        return dirty
+
+    def _schedule_write(self):
+        """防抖：只保留最后一次的数据，计时结束后在后台线程写盘"""
+        with self._lock:
+            self._pending = copy.deepcopy(self.data)
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.debounce, self._write_pending)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _write_pending(self):
+        with self._lock:
+            data, self._pending = self._pending, None
+            self._timer = None
+        if data is not None:
+            self._write(data)
+
+    def _write(self, data: Dict[str, Any]) -> bool:
+        """写入临时文件后替换，避免写到一半留下损坏的配置"""
+        with self._write_lock:
+            tmp_path = f"{self.path}.tmp"
+            try:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    yaml.dump(data, f, allow_unicode=True, default_flow_style=False)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                print(f"保存设置失败: {e}")
+                return False
+        if self._on_saved:
+            self._on_saved(self.path)
+        return True
+
+    def flush(self):
+        """立即写入尚未落盘的修改（退出时调用）"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            data, self._pending = self._pending, None
+        if data is not None:
+            self._write(data)
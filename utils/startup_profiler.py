@@ -0,0 +1,112 @@
+"""
+startup_profiler.py
+启动性能分析：统计各模块的导入耗时和各启动阶段的耗时，首次预览完成后输出报告。
+
+设置环境变量 MANOSABA_PROFILE_STARTUP=1 或使用 --profile-startup 参数启动时生效，
+未启用时 phase() / mark() 几乎没有开销。install() 需要在导入其他模块之前调用。
+"""
+
+import builtins
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+ENABLED = os.environ.get("MANOSABA_PROFILE_STARTUP") == "1" or "--profile-startup" in sys.argv
+
+# 报告中列出的导入条数
+_TOP_IMPORTS = 20
+
+_start = time.perf_counter()
+_original_import = builtins.__import__
+_local = threading.local()
+# 模块名 -> (累计耗时, 自身耗时)，只记录首次导入
+_imports: Dict[str, Tuple[float, float]] = {}
+_phases: List[Tuple[str, float, float]] = []
+_marks: List[Tuple[str, float]] = []
+_reported = False
+
+
+def _resolve_relative(name: str, globals, level: int) -> str:
+    """相对导入还原成完整模块名"""
+    package = (globals or {}).get("__package__") or ""
+    base = package.rsplit(".", level - 1)[0] if level > 1 else package
+    return f"{base}.{name}" if name else base
+
+
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    """统计首次导入的累计和自身耗时（减去嵌套导入的部分）"""
+    key = name if level == 0 else _resolve_relative(name, globals, level)
+    if level == 0 and name in sys.modules:
+        return _original_import(name, globals, locals, fromlist, level)
+
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    stack.append(0.0)
+    loaded_before = len(sys.modules)
+    st = time.perf_counter()
+    try:
+        return _original_import(name, globals, locals, fromlist, level)
+    finally:
+        elapsed = time.perf_counter() - st
+        children = stack.pop()
+        if stack:
+            stack[-1] += elapsed
+        if len(sys.modules) > loaded_before and key not in _imports:
+            _imports[key] = (elapsed, elapsed - children)
+
+
+def install():
+    """开始统计导入耗时（未启用时不做任何事）"""
+    if ENABLED and builtins.__import__ is _original_import:
+        builtins.__import__ = _timed_import
+
+
+def uninstall():
+    builtins.__import__ = _original_import
+
+
+@contextmanager
+def phase(name: str):
+    """统计一个启动阶段的耗时"""
+    if not ENABLED or _reported:
+        yield
+        return
+    st = time.perf_counter()
+    try:
+        yield
+    finally:
+        _phases.append((name, st - _start, time.perf_counter() - st))
+
+
+def mark(name: str):
+    """记录一个时间点（相对程序开始统计的时刻）"""
+    if ENABLED and not _reported:
+        _marks.append((name, time.perf_counter() - _start))
+
+
+def report() -> str:
+    """输出并返回报告，只输出一次，之后停止统计"""
+    global _reported
+    if not ENABLED or _reported:
+        return ""
+    _reported = True
+    uninstall()
+
+    lines = ["===== 启动性能报告 ====="]
+    lines.append("阶段:")
+    for name, offset, elapsed in _phases:
+        lines.append(f"  {name:<24} 开始 {offset * 1000:8.1f}ms  耗时 {elapsed * 1000:8.1f}ms")
+    lines.append("时间点:")
+    for name, offset in _marks:
+        lines.append(f"  {name:<24} {offset * 1000:8.1f}ms")
+    lines.append(f"导入（按累计耗时，前 {_TOP_IMPORTS} 项，共 {len(_imports)} 项）:")
+    lines.append(f"  {'模块':<40} {'累计':>9} {'自身':>9}")
+    for module, (total, own) in sorted(_imports.items(), key=lambda item: item[1][0], reverse=True)[:_TOP_IMPORTS]:
+        lines.append(f"  {module:<40} {total * 1000:8.1f}ms {own * 1000:8.1f}ms")
+    text = "\n".join(lines)
+    print(text)
+    return text
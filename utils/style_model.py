@@ -0,0 +1,106 @@
+"""
+style_model.py
+不可变、带版本号的样式模型。
+
+样式数据变化时版本号递增，StyleModel 按版本重建一次：组件按图层预排序，
+每个组件的各字段预先序列化为 JSON 片段。每次渲染拿到的是 ComponentView，
+写入只进入视图自己的覆盖层，不需要深拷贝整个样式。
+"""
+
+import copy
+import json
+from collections.abc import Mapping
+from types import MappingProxyType
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+def _json_fragment(key: str, value: Any) -> str:
+    """单个字段的 JSON 片段 "key": value"""
+    return f"{json.dumps(key, ensure_ascii=False)}: {json.dumps(value, ensure_ascii=False)}"
+
+
+class StyleComponent:
+    """组件的只读基础数据和缓存的 JSON 片段"""
+
+    __slots__ = ("data", "_fragments")
+
+    def __init__(self, data: Dict[str, Any]):
+        self.data = MappingProxyType(copy.deepcopy(data))
+        self._fragments: Optional[Dict[str, str]] = None
+
+    def fragments(self) -> Dict[str, str]:
+        """按字段缓存的 JSON 片段（首次序列化时生成）"""
+        if self._fragments is None:
+            self._fragments = {key: _json_fragment(key, value) for key, value in self.data.items()}
+        return self._fragments
+
+
+class ComponentView(Mapping):
+    """
+    组件的单次渲染视图
+    读取时覆盖层优先，写入只进覆盖层；序列化时没被覆盖的字段直接复用缓存片段
+    注意：基础数据中的列表/字典不要原地修改，需要修改时整体赋值
+    """
+
+    __slots__ = ("_base", "_overrides")
+
+    def __init__(self, base: StyleComponent):
+        self._base = base
+        self._overrides: Dict[str, Any] = {}
+
+    def __getitem__(self, key):
+        if key in self._overrides:
+            return self._overrides[key]
+        return self._base.data[key]
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self._overrides
+        for key in self._base.data:
+            if key not in self._overrides:
+                yield key
+
+    def __len__(self) -> int:
+        return len(self._overrides) + sum(1 for key in self._base.data if key not in self._overrides)
+
+    def __contains__(self, key) -> bool:
+        return key in self._overrides or key in self._base.data
+
+    def __setitem__(self, key: str, value: Any):
+        self._overrides[key] = value
+
+    def pop(self, key: str, *default):
+        """只能移除覆盖层中的字段"""
+        return self._overrides.pop(key, *default)
+
+    def to_json(self) -> str:
+        """序列化为 JSON 对象"""
+        parts = [frag for key, frag in self._base.fragments().items() if key not in self._overrides]
+        parts.extend(_json_fragment(key, value) for key, value in self._overrides.items())
+        return "{" + ", ".join(parts) + "}"
+
+
+class StyleModel:
+    """某个样式在某个版本下的不可变快照"""
+
+    def __init__(self, name: str, style: Dict[str, Any], version: int):
+        self.name = name
+        self.version = version
+        components = (style or {}).get("image_components", []) or []
+        self.components: Tuple[StyleComponent, ...] = tuple(
+            StyleComponent(component)
+            for component in sorted(components, key=lambda x: x.get("layer", 0))
+        )
+
+    def preview_components(self) -> List[ComponentView]:
+        """按图层排序的组件视图列表，每次调用都是新的覆盖层"""
+        return [ComponentView(component) for component in self.components]
+
+
+def components_to_json(components) -> bytes:
+    """组件列表序列化为 UTF-8 JSON，ComponentView 复用缓存片段"""
+    parts = [
+        component.to_json() if isinstance(component, ComponentView)
+        else json.dumps(component, ensure_ascii=False)
+        for component in components
+    ]
+    return ("[" + ", ".join(parts) + "]").encode("utf-8")
@@ -0,0 +1,121 @@
+"""
+warmup.py
+启动预热：窗口显示后在后台完成首次渲染原本要做的准备工作，
+包括初始化SDL和渲染器、打开样式用到的字体、解码当前样式各组件的图片，以及解码最常用的emoji。
+
+每一步都在前台渲染空闲时执行（见 utils.render_gate），用户触发的渲染优先；
+预热结果放在C++端的字体缓存和解码图片缓存里，渲染时直接命中。
+"""
+
+import json
+import os
+import threading
+from collections import Counter
+from typing import Any, Callable, Iterable, List, NamedTuple, Optional
+
+from utils.render_gate import background_step
+
+# 使用次数文件最多保留的emoji种类
+_USAGE_LIMIT = 200
+
+
+class WarmupStep(NamedTuple):
+    """预热中的一步"""
+    name: str
+    run: Callable[[], Any]
+
+
+class EmojiUsage:
+    """合成内容中各emoji的使用次数，用于挑选启动时预热的emoji"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._counts: Optional[Counter] = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> Counter:
+        if self._counts is None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._counts = Counter({str(k): int(v) for k, v in json.load(f).items()})
+            except FileNotFoundError:
+                self._counts = Counter()
+            except Exception as e:
+                print(f"emoji使用记录读取失败: {e}")
+                self._counts = Counter()
+        return self._counts
+
+    def record(self, emojis: Iterable[str]):
+        """记录一次合成用到的emoji并保存"""
+        with self._lock:
+            counts = self._load()
+            counts.update(emojis)
+            if len(counts) > _USAGE_LIMIT:
+                self._counts = counts = Counter(dict(counts.most_common(_USAGE_LIMIT)))
+            data = dict(counts)
+        self._save(data)
+
+    def most_common(self, n: int) -> List[str]:
+        with self._lock:
+            return [emoji for emoji, _ in self._load().most_common(n)]
+
+    def _save(self, data):
+        tmp_path = f"{self.path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"emoji使用记录保存失败: {e}")
+
+
+class StartupWarmup:
+    """在后台线程按顺序执行预热步骤，前台渲染时暂停"""
+
+    def __init__(self):
+        self._thread: Optional[threading.Thread] = None
+        self._cancel = threading.Event()
+
+    def start(self, steps: List[WarmupStep],
+              on_progress: Optional[Callable[[int, int, Optional[str]], None]] = None):
+        """
+        开始预热，之前的预热会被取消
+        on_progress(已完成步数, 总步数, 结束原因)，结束原因为 None 表示仍在进行
+        """
+        self.cancel()
+        self._cancel = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, args=(steps, self._cancel, on_progress),
+            name="startup-warmup", daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        """停止当前预热"""
+        self._cancel.set()
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @staticmethod
+    def _run(steps: List[WarmupStep], cancel: threading.Event, on_progress):
+        done = failed = 0
+        total = len(steps)
+        for step in steps:
+            with background_step(cancel) as ready:
+                if not ready:
+                    return
+                try:
+                    step.run()
+                except Exception as e:
+                    failed += 1
+                    print(f"预热 {step.name} 失败: {e}")
+            done += 1
+            if on_progress:
+                on_progress(done, total, None)
+
+        if on_progress and not cancel.is_set():
+            on_progress(done, total, f"完成（{failed} 项失败）" if failed else "完成")
+
+
+STARTUP_WARMUP = StartupWarmup()